@@ -3,33 +3,106 @@
 from flask import Flask
 
 from config import Config
-from db import db
-from core import RuleEngine
+from db import db, ensure_schema, read_router
+from core import FSMConfig, RuleEngine, TriggerDebouncer, set_default_config
+from evaluation import set_alignment_weight
+from helpers import session_timeouts
+from helpers.assets import asset_url
+from helpers.fleet import RobotSessionRegistry
+from helpers.responses import init_compression
+from jobs import register_commands
 
 # Ustvari Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
 
-# Inicializiraj bazo
+# Inicializiraj bazo (zapisi) in bralno bazo za analitiko (če je nastavljena)
 db.init_app(app)
+read_router.init_app(app)
 
-# Ustvari tabele
-with app.app_context():
-    db.create_all()
+# Shema: DDL samo, če se verzija v bazi ne ujema (glej db/schema.py).
+# Z gunicorn --preload se to izvede enkrat v masterju, ne v vsakem workerju.
+ensure_schema(app, app.config["SCHEMA_CHECK"])
+
+# Pragovi FSM za vse seje tega procesa
+set_default_config(FSMConfig(
+    max_escalations=app.config["FSM_MAX_ESCALATIONS"],
+    max_success_steps=app.config["FSM_MAX_SUCCESS_STEPS"],
+    explanation_steps=app.config["FSM_EXPLANATION_STEPS"],
+))
+set_alignment_weight(app.config["EVAL_ALIGNMENT_WEIGHT"])
 
 # Naloži pravila iz Excela
 rules = RuleEngine()
 
 # Registriraj blueprinte
-from routes.main import main_bp, init_rules as init_main_rules
-from routes.evaluate import evaluate_bp
+from routes.main import main_bp, init_rules as init_main_rules, init_debouncer
+from routes.evaluate import evaluate_bp, init_rules as init_evaluate_rules
+from routes.assets import assets_bp
+from routes.fleet import fleet_bp, init_registry
 
-# Nastavi rules engine v main blueprintu
+# Nastavi rules engine v blueprintih
 init_main_rules(rules)
+init_evaluate_rules(rules)
+
+# Združevanje ponovljenih triggerjev pred FSM
+debouncer = TriggerDebouncer(app.config["TRIGGER_DEBOUNCE_SECONDS"], app.config["TRIGGER_DEBOUNCE_WINDOWS"])
+init_debouncer(debouncer)
+
+# Register živih sej robotov flote
+registry = RobotSessionRegistry(
+    rules,
+    debouncer,
+    capacity=app.config["FLEET_REGISTRY_CAPACITY"],
+    snapshot_interval=app.config["FSM_SNAPSHOT_INTERVAL"],
+)
+init_registry(registry)
+session_timeouts.init_pending_repeats(registry.take_pending_repeats)
+
+# Toplo stanje iz prejšnjega zagona (indeks podobnosti, Markov, register flote).
+# Modul naloži NumPy, zato ga uvozimo samo, ko je vklopljen.
+if app.config["WARM_STATE_DIR"]:
+    from helpers import warm_state
+    warm_state.init_app(app, rules, registry)
 
 # Registriraj blueprinte
 app.register_blueprint(main_bp)
 app.register_blueprint(evaluate_bp)
+app.register_blueprint(assets_bp)
+app.register_blueprint(fleet_bp)
+
+# asset_url() v predlogah vrne URL do minificirane datoteke s hashem
+app.jinja_env.globals["asset_url"] = asset_url
+
+# Stiskanje JSON/HTML odgovorov glede na Accept-Encoding
+init_compression(app)
+
+# CLI ukazi (flask close-stale-sessions, ...)
+register_commands(app)
+
+# Timeout neaktivnih sej - nit se zažene ob prvem zahtevku v vsakem workerju
+if app.config["SESSION_TIMEOUT_ENABLED"]:
+    session_timeouts.init_scheduler(app.config["SESSION_TIMEOUT_SECONDS"])
+
+    @app.before_request
+    def _start_session_timeouts():
+        session_timeouts.ensure_worker_started(app)
+
+# Indeks podobnih sej - vektorji in scenariji se posodabljajo v ozadju
+if app.config["SIMILARITY_REFRESH_SECONDS"] > 0:
+    from helpers import similarity
+
+    @app.before_request
+    def _start_similarity_refresh():
+        similarity.ensure_worker_started(app)
+
+# Empirični Markov model - števci se prištevajo v ozadju, GET /api/markov samo bere
+if app.config["MARKOV_REFRESH_SECONDS"] > 0:
+    from helpers import markov
+
+    @app.before_request
+    def _start_markov_refresh():
+        markov.ensure_worker_started(app, rules)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+# asgi.py - ASGI vstopna točka (asinhrone route flote in evalvacije, ostalo prek Flask)
+
+"""
+Zagon:
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+    uvicorn asgi:application --workers 2
+
+Vsak worker drži na stotine hkratnih zahtevkov robotov na eni zanki
+dogodkov (glej routes/aio.py). Register sej robotov je asinhron
+(helpers/fleet_aio.py), zato sinhroni /api/fleet v tem načinu ni v uporabi.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, rules, debouncer
+from db.aio import aio_db
+from helpers import session_timeouts
+from helpers.fleet_aio import AsyncRobotSessionRegistry
+from routes.aio import AsyncApp
+
+aio_db.init_app(app)
+
+# Evalvacija, rollupi zaključenih sej in Flask route - ne blokirajo zanke
+executor = ThreadPoolExecutor(app.config["ASYNC_WORKER_THREADS"], thread_name_prefix="asgi-worker")
+
+registry = AsyncRobotSessionRegistry(
+    app,
+    rules,
+    debouncer,
+    capacity=app.config["FLEET_REGISTRY_CAPACITY"],
+    snapshot_interval=app.config["FSM_SNAPSHOT_INTERVAL"],
+    executor=executor,
+)
+session_timeouts.init_pending_repeats(registry.take_pending_repeats)
+
+# Ozadinske niti se v Flask načinu zaženejo ob prvem zahtevku (before_request);
+# route flote tu Flask ne kličejo, zato jih zaženemo ob zagonu workerja.
+on_startup = []
+if app.config["SESSION_TIMEOUT_ENABLED"]:
+    on_startup.append(session_timeouts.ensure_worker_started)
+if app.config["WARM_STATE_DIR"] and app.config["WARM_STATE_INTERVAL_SECONDS"] > 0:
+    from helpers import warm_state
+    on_startup.append(warm_state.ensure_worker_started)
+
+if app.config["SIMILARITY_REFRESH_SECONDS"] > 0:
+    from helpers import similarity
+    on_startup.append(similarity.ensure_worker_started)
+if app.config["MARKOV_REFRESH_SECONDS"] > 0:
+    from helpers import markov
+    on_startup.append(lambda flask_app: markov.ensure_worker_started(flask_app, rules))
+
+application = AsyncApp(app, registry, executor, on_startup)
@@ -22,3 +22,75 @@ class Config:
         SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "robot_fsm.db")
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Ločena baza za branja pregleda sej in analitike (db/routing.py): replika ali
+    # SQLite kopija (flask refresh-analytics-copy). Prazno = vse na primarni bazi.
+    ANALYTICS_DATABASE_URL = os.environ.get("ANALYTICS_DATABASE_URL", "")
+    ANALYTICS_MAX_STALENESS_SECONDS = float(os.environ.get("ANALYTICS_MAX_STALENESS_SECONDS", "300"))
+    ANALYTICS_STALENESS_CHECK_SECONDS = 5.0
+
+    # Preverjanje sheme ob zagonu: "auto" (DDL samo ob spremembi verzije),
+    # "always" (vedno create_all) ali "skip" (shema je že pripravljena)
+    SCHEMA_CHECK = os.environ.get("SCHEMA_CHECK", "auto")
+
+    # Zapiranje neaktivnih sej (helpers/session_timeouts.py)
+    SESSION_TIMEOUT_ENABLED = os.environ.get("SESSION_TIMEOUT_ENABLED", "1") == "1"
+    SESSION_TIMEOUT_SECONDS = int(os.environ.get("SESSION_TIMEOUT_SECONDS", "900"))   # 15 min
+    SESSION_TIMEOUT_TICK_SECONDS = int(os.environ.get("SESSION_TIMEOUT_TICK_SECONDS", "15"))
+    SESSION_TIMEOUT_SWEEP_EVERY = 20     # rezervni pregled baze vsakih N tikov
+    SESSION_TIMEOUT_BATCH = 500          # največ sej v enem UPDATE/DELETE
+
+    # Pragovi FSM (core/fsm.py FSMConfig) - preizkusimo jih s `flask sweep-fsm`
+    FSM_MAX_ESCALATIONS = int(os.environ.get("FSM_MAX_ESCALATIONS", "3"))
+    FSM_MAX_SUCCESS_STEPS = int(os.environ.get("FSM_MAX_SUCCESS_STEPS", "5"))
+    FSM_EXPLANATION_STEPS = int(os.environ.get("FSM_EXPLANATION_STEPS", "2"))
+
+    # Delež poravnave z expected_triggers v oceni scenarija (sprememba zahteva `flask reevaluate`)
+    EVAL_ALIGNMENT_WEIGHT = float(os.environ.get("EVAL_ALIGNMENT_WEIGHT", "0.3"))
+
+    # Posnetek FSM v bazo vsakih N korakov (rekonstrukcija predvaja samo rep loga)
+    FSM_SNAPSHOT_INTERVAL = int(os.environ.get("FSM_SNAPSHOT_INTERVAL", "20"))
+
+    # Odgovori (helpers/responses.py): "auto" uporabi orjson, če je nameščen, "stdlib" vedno json
+    JSON_ENCODER = os.environ.get("JSON_ENCODER", "auto")
+    COMPRESS_ENABLED = os.environ.get("COMPRESS_ENABLED", "1") == "1"
+    COMPRESS_MIN_SIZE = 1024     # manjših odgovorov ne stiskamo
+    COMPRESS_LEVEL = 6
+
+    # Zgrajene statične datoteke (static/dist) prek CDN ali sprednjega strežnika;
+    # prazno = route /assets/ v aplikaciji
+    ASSET_URL_BASE = os.environ.get("ASSET_URL_BASE", "")
+
+    # Združevanje ponovljenih triggerjev (core/debounce.py): ponovitev istega triggerja
+    # v oknu (sekunde) od njegovega zadnjega sprejetega dogodka se ne pošlje v FSM, le poveča repeat_count
+    TRIGGER_DEBOUNCE_SECONDS = float(os.environ.get("TRIGGER_DEBOUNCE_SECONDS", "1.0"))
+    TRIGGER_DEBOUNCE_WINDOWS = {          # daljša okna za šumne senzorske triggerje
+        "User face stressed": 3.0,
+        "long time being still": 5.0,
+        "Long silence after robot prompt": 5.0,
+        "User looks away to another person": 2.0,
+    }
+
+    # Arbitraža hkratnih dogodkov (POST /trigger/batch): koliko najpomembnejših gre v FSM
+    TRIGGER_ARBITRATION_TOP_K = int(os.environ.get("TRIGGER_ARBITRATION_TOP_K", "1"))
+
+    # Flota robotov (/api/fleet, helpers/fleet.py): živi FSM-ji v registru procesa (LRU)
+    FLEET_REGISTRY_CAPACITY = int(os.environ.get("FLEET_REGISTRY_CAPACITY", "10000"))
+    # Vozlišča flote ("a,b,c") in ime tega vozlišča; robot pripada natanko enemu.
+    # Prazno = eno vozlišče, ki sprejme vse robote.
+    FLEET_NODES = [n.strip() for n in os.environ.get("FLEET_NODES", "").split(",") if n.strip()]
+    FLEET_NODE = os.environ.get("FLEET_NODE", "")
+
+    # Posnetek toplega stanja procesa (helpers/warm_state.py); prazno = izklopljeno
+    SIMILARITY_REFRESH_SECONDS = int(os.environ.get("SIMILARITY_REFRESH_SECONDS", "60"))    # 0 = samo `flask refresh-similarity`
+    MARKOV_REFRESH_SECONDS = int(os.environ.get("MARKOV_REFRESH_SECONDS", "60"))    # 0 = samo `flask refresh-markov`
+    WARM_STATE_DIR = os.environ.get("WARM_STATE_DIR", "")
+    WARM_STATE_INTERVAL_SECONDS = int(os.environ.get("WARM_STATE_INTERVAL_SECONDS", "300"))    # 0 = samo ob izhodu workerja
+
+    # ASGI način (asgi.py, db/aio.py): asinhrona baza za route flote in evalvacije.
+    # Prazno = ista baza kot SQLALCHEMY_DATABASE_URI z asinhronim gonilnikom.
+    ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", "")
+    ASYNC_DB_POOL_SIZE = int(os.environ.get("ASYNC_DB_POOL_SIZE", "20"))
+    ASYNC_DB_MAX_OVERFLOW = int(os.environ.get("ASYNC_DB_MAX_OVERFLOW", "80"))
+    # Niti za izračun evalvacije, rollupe zaključenih sej in ostale (Flask) route
+    ASYNC_WORKER_THREADS = int(os.environ.get("ASYNC_WORKER_THREADS", "8"))
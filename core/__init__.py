@@ -12,8 +12,27 @@ from .fsm import (
     FEEDBACK_INTENT,
     MAX_ESCALATIONS,
     MAX_SUCCESS_STEPS,
+    EXPLANATION_STEPS,
+    FSMConfig,
+    set_default_config,
+    STATE_INFO,
+)
+from .rules_loader import RuleEngine, RULES, PRIORITY_ORDER, UNKNOWN_INTENT, UNKNOWN_TEXT, rules_version
+from .replay import iter_replay, replay, check_consistency
+from .debounce import TriggerDebouncer
+from .arbitration import TriggerArbiter, TriggerEvent
+from .outcomes import OutcomeAnalyzer
+from .classification import (
+    TriggerIndex,
+    TriggerClass,
+    classify_intent,
+    default_index,
+    GROUP_POSITIVE,
+    GROUP_NEUTRAL,
+    GROUP_NEGATIVE,
+    GROUP_FEEDBACK,
+    GROUP_UNKNOWN,
 )
-from .rules_loader import RuleEngine, RULES, PRIORITY_ORDER
 
 __all__ = [
     "RobotFSM",
@@ -27,12 +46,30 @@ __all__ = [
     "FEEDBACK_INTENT",
     "MAX_ESCALATIONS",
     "MAX_SUCCESS_STEPS",
+    "EXPLANATION_STEPS",
+    "FSMConfig",
+    "set_default_config",
+    "STATE_INFO",
     "RuleEngine",
     "RULES",
     "PRIORITY_ORDER",
+    "UNKNOWN_INTENT",
+    "UNKNOWN_TEXT",
+    "rules_version",
+    "iter_replay",
+    "replay",
+    "check_consistency",
+    "TriggerDebouncer",
+    "TriggerArbiter",
+    "TriggerEvent",
+    "OutcomeAnalyzer",
+    "TriggerIndex",
+    "TriggerClass",
+    "classify_intent",
+    "default_index",
+    "GROUP_POSITIVE",
+    "GROUP_NEUTRAL",
+    "GROUP_NEGATIVE",
+    "GROUP_FEEDBACK",
+    "GROUP_UNKNOWN",
 ]
-
-
-
-
-
@@ -0,0 +1,97 @@
+# core/arbitration.py - Arbitraža hkratnih triggerjev po prioriteti in zaupanju
+
+"""
+Senzorji v istem tiku pošljejo več dogodkov. Namesto obdelave po vrstnem
+redu prihoda jih arbiter zbere v kopico s ključem
+
+    (-PRIORITY_ORDER[prioriteta pravila], čas prihoda, -zaupanje)
+
+in v FSM pošlje samo zmagovalca (ali top_k). Dogodki z zaupanjem pod
+ConfidenceThrs. pravila se zavržejo, prav tako ponovitve istega triggerja
+v istem tiku. Tako "error" (Critical) prehiti šum nižje prioritete.
+"""
+
+import heapq
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from .rules_loader import PRIORITY_ORDER
+
+DROP_BELOW_THRESHOLD = "below_threshold"
+DROP_DUPLICATE = "duplicate"
+DROP_PREEMPTED = "preempted"
+
+
+@dataclass(order=True)
+class TriggerEvent:
+    sort_key: tuple = field(init=False, repr=False)
+    trigger: str = field(compare=False)
+    confidence: float = field(default=1.0, compare=False)
+    arrival: float = field(default=0.0, compare=False)
+    priority: int = field(default=0, compare=False)
+
+    def __post_init__(self):
+        self.sort_key = (-self.priority, self.arrival, -self.confidence)
+
+    def to_dict(self) -> dict:
+        return {"trigger": self.trigger, "confidence": self.confidence, "priority": self.priority}
+
+
+class TriggerArbiter:
+    """Izbere dogodke tika, ki gredo v FSM."""
+
+    def __init__(self, index, top_k: int = 1):
+        self.index = index
+        self.top_k = max(1, top_k)
+
+    def event(self, trigger: str, confidence: Optional[float] = None, arrival: float = 0.0) -> TriggerEvent:
+        rule = self.index.rule(trigger)
+        # Neznan trigger ima najnižjo prioriteto (0) in nima praga
+        priority = PRIORITY_ORDER.get(rule["priority"], 1) if rule else 0
+        return TriggerEvent(trigger, 1.0 if confidence is None else float(confidence), arrival, priority)
+
+    def parse(self, raw_events) -> List[TriggerEvent]:
+        """
+        Dogodki iz JSON [{"trigger", "confidence", "timestamp"}, ...];
+        brez timestamp je čas prihoda kar položaj v seznamu.
+        Napačen dogodek sproži ValueError s sporočilom za odjemalca.
+        """
+        if not isinstance(raw_events, list) or not raw_events:
+            raise ValueError("Missing events")
+        events = []
+        for position, raw in enumerate(raw_events):
+            if not isinstance(raw, dict) or not raw.get("trigger"):
+                raise ValueError(f"Missing trigger in event {position}")
+            try:
+                events.append(self.event(raw["trigger"], raw.get("confidence"), float(raw.get("timestamp", position))))
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid confidence or timestamp in event {position}")
+        return events
+
+    def arbitrate(self, events: List[TriggerEvent]) -> Tuple[List[TriggerEvent], List[Tuple[TriggerEvent, str]]]:
+        """
+        Vrne (zmagovalci v vrstnem redu obdelave, [(zavržen dogodek, razlog)]).
+        """
+        heap = []
+        dropped = []
+        for event in events:
+            rule = self.index.rule(event.trigger)
+            threshold = rule["confidence_thrs"] if rule else None
+            if threshold is not None and event.confidence < threshold:
+                dropped.append((event, DROP_BELOW_THRESHOLD))
+            else:
+                heapq.heappush(heap, event)
+
+        winners = []
+        seen = set()
+        while heap:
+            event = heapq.heappop(heap)
+            if event.trigger in seen:
+                dropped.append((event, DROP_DUPLICATE))
+            elif len(winners) < self.top_k:
+                winners.append(event)
+                seen.add(event.trigger)
+            else:
+                dropped.append((event, DROP_PREEMPTED))
+                seen.add(event.trigger)
+        return winners, dropped
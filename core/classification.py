@@ -0,0 +1,166 @@
+# core/classification.py - Enoten indeks klasifikacije triggerjev in intentov
+
+"""
+Edini vir resnice za to, ali je intent / trigger pozitiven, nevtralen,
+negativen ali feedback. Uporabljajo ga FSM, grupiranje gumbov v UI in
+evalvacijski API.
+
+TriggerIndex se zgradi enkrat iz pravil RuleEngine in vsakemu triggerju
+priredi (intent, skupino, polarnost, celoštevilsko kodo) ter vnaprej
+izbrano pravilo - iskanje je en dostop do slovarja.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List
+
+from .rules_loader import PRIORITY_ORDER, RULES
+
+GROUP_POSITIVE = "positive"
+GROUP_NEUTRAL = "neutral"
+GROUP_NEGATIVE = "negative"
+GROUP_FEEDBACK = "feedback"
+GROUP_UNKNOWN = "unknown"
+
+# Vrstni red skupin v UI
+UI_GROUPS = (GROUP_POSITIVE, GROUP_NEUTRAL, GROUP_NEGATIVE, GROUP_FEEDBACK)
+
+# Negativni intenti - kažejo težave in povzročajo eskalacije
+NEGATIVE_INTENTS = {
+    "User frustrated / overloaded",
+    "Disengagement risk",
+    "User confused / waiting",  # Dodano: Long silence, long time being still
+}
+
+# Pozitivni intenti - kažejo dobro sodelovanje
+POSITIVE_INTENTS = {
+    "Positive affect",
+}
+
+# Feedback intent - zaključni signal (vendar ne takoj, ampak po več korakih)
+FEEDBACK_INTENT = "Provide action / speech feedback"
+
+# Nevtralni intenti - ne vplivajo na eskalacije, AMPAK se štejejo kot uspešni koraki
+# (uporabnik dela nekaj, kar ni niti pozitivno niti negativno)
+NEUTRAL_INTENTS = {
+    "Attention shift",
+    "Request to speak/help",  # Nevtralen, razen če je "error" trigger
+}
+
+# Pari (trigger, intent), ki so negativni kljub nevtralnemu intentu
+NEGATIVE_TRIGGER_INTENTS = {
+    ("error", "Request to speak/help"),
+}
+
+INTENT_GROUPS: Dict[str, str] = {
+    **{intent: GROUP_POSITIVE for intent in POSITIVE_INTENTS},
+    **{intent: GROUP_NEUTRAL for intent in NEUTRAL_INTENTS},
+    **{intent: GROUP_NEGATIVE for intent in NEGATIVE_INTENTS},
+    FEEDBACK_INTENT: GROUP_FEEDBACK,
+}
+
+POLARITY = {
+    GROUP_POSITIVE: 1,
+    GROUP_NEUTRAL: 0,
+    GROUP_FEEDBACK: 0,
+    GROUP_UNKNOWN: 0,
+    GROUP_NEGATIVE: -1,
+}
+
+
+def classify_intent(intent: str, trigger: str = None) -> str:
+    """
+    Vrne skupino intenta. Če je podan trigger, upošteva še izjeme
+    iz NEGATIVE_TRIGGER_INTENTS.
+    """
+    if trigger is not None and (trigger, intent) in NEGATIVE_TRIGGER_INTENTS:
+        return GROUP_NEGATIVE
+    return INTENT_GROUPS.get(intent, GROUP_UNKNOWN)
+
+
+@dataclass(frozen=True)
+class TriggerClass:
+    trigger: str
+    intent: str
+    group: str
+    polarity: int
+    code: int          # 0 = neznan trigger, 1..n = triggerji po abecedi
+
+
+class TriggerIndex:
+    """Predizračunan indeks trigger -> (intent, skupina, polarnost, koda, pravilo)."""
+
+    def __init__(self, rules: List[Dict]):
+        best = {}
+        for rule in rules:
+            trigger = rule["Trigger"]
+            priority = PRIORITY_ORDER.get(rule.get("Priority", "Low"), 1)
+            # Ob enaki prioriteti obdrži prvo pravilo (kot stabilno sortiranje v select_rule)
+            if trigger not in best or priority > best[trigger][0]:
+                best[trigger] = (priority, rule)
+
+        self.triggers = sorted(best)
+        self._classes = {}
+        self._rules = {}
+        for code, trigger in enumerate(self.triggers, start=1):
+            row = best[trigger][1]
+            intent = row.get("Inferred Intent")
+            group = classify_intent(intent, trigger)
+            self._classes[trigger] = TriggerClass(trigger, intent, group, POLARITY[group], code)
+            self._rules[trigger] = {
+                "trigger": row["Trigger"],
+                "inferred_intent": intent,
+                "priority": row.get("Priority"),
+                "confidence_thrs": row.get("ConfidenceThrs."),
+                "escalated_action": row.get("Escalated Action"),
+                "escalation_count": row.get("escalationCount"),
+                "speech_act": row.get("Robot Speech Act"),
+                "robot_text": row.get("RobotText"),
+            }
+
+        self._groups = {g: [] for g in UI_GROUPS}
+        for trigger in self.triggers:
+            group = self._classes[trigger].group
+            # Neznani intenti gredo v UI med nevtralne
+            self._groups[group if group in self._groups else GROUP_NEUTRAL].append(trigger)
+
+    def __len__(self):
+        return len(self.triggers)
+
+    def __contains__(self, trigger):
+        return trigger in self._classes
+
+    def get(self, trigger: str) -> TriggerClass:
+        cls = self._classes.get(trigger)
+        if cls is None:
+            return TriggerClass(trigger, "Unknown", GROUP_UNKNOWN, 0, 0)
+        return cls
+
+    def rule(self, trigger: str):
+        """Pravilo z najvišjo prioriteto za trigger ali None (ne spreminjaj vrnjenega slovarja)."""
+        return self._rules.get(trigger)
+
+    def code(self, trigger: str) -> int:
+        cls = self._classes.get(trigger)
+        return cls.code if cls else 0
+
+    def polarity(self, trigger: str) -> int:
+        cls = self._classes.get(trigger)
+        return cls.polarity if cls else 0
+
+    def group(self, trigger: str) -> str:
+        cls = self._classes.get(trigger)
+        return cls.group if cls else GROUP_UNKNOWN
+
+    def groups(self) -> Dict[str, List[str]]:
+        """Triggerji po skupinah za UI (vsaka skupina urejena po abecedi)."""
+        return {g: list(triggers) for g, triggers in self._groups.items()}
+
+    def triggers_with_polarity(self, polarity: int) -> List[str]:
+        return [t for t in self.triggers if self._classes[t].polarity == polarity]
+
+
+@lru_cache(maxsize=1)
+def default_index() -> TriggerIndex:
+    """Indeks nad privzetimi pravili (RULES) za kodo brez dostopa do RuleEngine."""
+    return TriggerIndex(RULES)
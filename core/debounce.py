@@ -0,0 +1,88 @@
+# core/debounce.py - Združevanje ponovljenih triggerjev (debounce) pred FSM
+
+"""
+Senzorji isti trigger sprožijo večkrat na sekundo. Ponovitev triggerja
+znotraj okna od njegovega zadnjega sprejetega dogodka se ne pošlje v FSM
+(ni update_state, ni nove vrstice v logu), ampak se prišteje k
+repeat_count tega dogodka. Vsak trigger ima svoje okno, zato se A, B, A
+(vse v oknu) združi v dva dogodka.
+
+Stanje oken je majhen slovar {"windows": {trigger: okno}} (hrani se v
+Flask seji ali v registru flote), zato debouncer sam nima stanja na sejo -
+samo nastavitve oken in števce za metrike procesa.
+"""
+
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+
+class TriggerDebouncer:
+    """Okna združevanja po triggerjih in števci prejetih / združenih dogodkov."""
+
+    def __init__(self, default_window: float = 0.0, windows: Optional[Dict[str, float]] = None):
+        self.default_window = default_window
+        self.windows = dict(windows or {})
+        self.received = Counter()
+        self.coalesced = Counter()
+        self._lock = threading.Lock()
+
+    def window(self, trigger: str) -> float:
+        return self.windows.get(trigger, self.default_window)
+
+    @staticmethod
+    def open_windows(state: Optional[dict]) -> dict:
+        """{trigger: okno} iz stanja (tudi iz starega piškotka z enim oknom)."""
+        if not state:
+            return {}
+        if "windows" in state:
+            return state["windows"]
+        return {state["trigger"]: state} if "interaction_id" in state else {}
+
+    @classmethod
+    def has_pending(cls, state: Optional[dict]) -> bool:
+        return any(w.get("pending") for w in cls.open_windows(state).values())
+
+    def check(self, state: Optional[dict], trigger: str, now: float) -> int:
+        """
+        Če je trigger ponovitev znotraj svojega okna, jo prišteje v state in
+        vrne skupno število ponovitev dogodka, sicer 0 (dogodek gre v FSM).
+        """
+        window = self.open_windows(state).get(trigger)
+        coalesce = window is not None and now - window.get("at", 0) < self.window(trigger)
+        with self._lock:
+            self.received[trigger] += 1
+            if coalesce:
+                self.coalesced[trigger] += 1
+        if not coalesce:
+            return 0
+        window["pending"] = window.get("pending", 0) + 1
+        window["repeats"] = window.get("repeats", 1) + 1
+        return window["repeats"]
+
+    def accept(self, state: Optional[dict], trigger: str, now: float, interaction_id: int) -> dict:
+        """
+        Stanje po sprejetem dogodku: novo okno za trigger, pretečena okna
+        (brez čakajočih ponovitev - te se zapišejo pred vsakim dogodkom) odpadejo.
+        """
+        windows = {
+            other: window
+            for other, window in self.open_windows(state).items()
+            if other != trigger and (window.get("pending") or now - window.get("at", 0) < self.window(other))
+        }
+        windows[trigger] = {"at": now, "interaction_id": interaction_id, "pending": 0, "repeats": 1}
+        return {"windows": windows}
+
+    def metrics(self) -> dict:
+        with self._lock:
+            received = sum(self.received.values())
+            coalesced = sum(self.coalesced.values())
+            return {
+                "received": received,
+                "accepted": received - coalesced,
+                "coalesced": coalesced,
+                "by_trigger": {
+                    trigger: {"received": count, "coalesced": self.coalesced.get(trigger, 0)}
+                    for trigger, count in self.received.items()
+                },
+            }
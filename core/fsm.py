@@ -3,6 +3,19 @@
 from dataclasses import dataclass, field
 from collections import defaultdict
 
+# Skupine intentov so definirane enkrat v core/classification.py
+from .classification import (
+    NEGATIVE_INTENTS,
+    POSITIVE_INTENTS,
+    FEEDBACK_INTENT,
+    NEUTRAL_INTENTS,
+    GROUP_POSITIVE,
+    GROUP_NEUTRAL,
+    GROUP_NEGATIVE,
+    GROUP_FEEDBACK,
+    classify_intent,
+)
+
 # Osnovna stanja (lahko poimenuješ tudi drugače, samo konsistentno)
 S0_GREETING = "S0_GREETING"               # pozdrav
 S1_EXPLANATION = "S1_EXPLANATION"         # razlaga naloge
@@ -10,31 +23,48 @@ S2_EXERCISE = "S2_EXERCISE"               # izvajanje vaje (cikel)
 S3_BREAK = "S3_BREAK"                     # odmor / preusmeritev pozornosti
 S4_FEEDBACK = "S4_FEEDBACK"               # povratna informacija / zaključek
 
-# Negativni intenti - kažejo težave in povzročajo eskalacije
-NEGATIVE_INTENTS = {
-    "User frustrated / overloaded",
-    "Disengagement risk",
-    "User confused / waiting",  # Dodano: Long silence, long time being still
+# Prikaz stanj v UI (nespremenljivo - ne gradimo ga ob vsakem klicu)
+STATE_INFO = {
+    S0_GREETING: {"name": "Pozdrav", "color": "blue", "icon": "👋"},
+    S1_EXPLANATION: {"name": "Razlaga", "color": "purple", "icon": "📖"},
+    S2_EXERCISE: {"name": "Vaja", "color": "green", "icon": "🎯"},
+    S3_BREAK: {"name": "Odmor", "color": "orange", "icon": "☕"},
+    S4_FEEDBACK: {"name": "Zaključek", "color": "teal", "icon": "✅"},
 }
+UNKNOWN_STATE_INFO = {"name": "Neznano", "color": "gray", "icon": "❓"}
 
-# Pozitivni intenti - kažejo dobro sodelovanje
-POSITIVE_INTENTS = {
-    "Positive affect",
-}
+# Konfiguracija za zaključek (privzete vrednosti FSMConfig)
+MAX_ESCALATIONS = 3          # Po 3 eskalacijah ponudi zaključek
+MAX_SUCCESS_STEPS = 5        # Po 5 uspešnih korakih v S2_EXERCISE → zaključek
+EXPLANATION_STEPS = 2        # Po 2 korakih v S1_EXPLANATION → vaja
 
-# Feedback intent - zaključni signal (vendar ne takoj, ampak po več korakih)
-FEEDBACK_INTENT = "Provide action / speech feedback"
 
-# Nevtralni intenti - ne vplivajo na eskalacije, AMPAK se štejejo kot uspešni koraki
-# (uporabnik dela nekaj, kar ni niti pozitivno niti negativno)
-NEUTRAL_INTENTS = {
-    "Attention shift",
-    "Request to speak/help",  # Nevtralen, razen če je "error" trigger
-}
+@dataclass(frozen=True)
+class FSMConfig:
+    """Pragovi FSM; instanca se lahko deli med več RobotFSM (nespremenljiva)."""
+    max_escalations: int = MAX_ESCALATIONS
+    max_success_steps: int = MAX_SUCCESS_STEPS
+    explanation_steps: int = EXPLANATION_STEPS
 
-# Konfiguracija za zaključek
-MAX_ESCALATIONS = 3          # Po 3 eskalacijah ponudi zaključek
-MAX_SUCCESS_STEPS = 5        # Po 5 uspešnih korakih v S2_EXERCISE → zaključek
+    def to_dict(self) -> dict:
+        return {
+            "max_escalations": self.max_escalations,
+            "max_success_steps": self.max_success_steps,
+            "explanation_steps": self.explanation_steps,
+        }
+
+
+_default_config = FSMConfig()
+
+
+def set_default_config(config: FSMConfig):
+    """Pragovi za nove RobotFSM brez podane konfiguracije (nastavi app.py iz Config)."""
+    global _default_config
+    _default_config = config
+
+
+def default_config() -> FSMConfig:
+    return _default_config
 
 
 @dataclass
@@ -48,6 +78,8 @@ class RobotFSM:
     negative_interactions: int = 0         # Skupno negativnih interakcij
     should_suggest_end: bool = False       # Ali naj robot predlaga zaključek
     end_reason: str = ""                   # Razlog za predlog zaključka
+    # Pragovi niso del stanja (to_dict) - pridejo iz konfiguracije procesa
+    config: FSMConfig = field(default_factory=default_config, repr=False, compare=False)
 
     def to_dict(self):
         return {
@@ -63,10 +95,10 @@ class RobotFSM:
         }
 
     @classmethod
-    def from_dict(cls, data: dict):
+    def from_dict(cls, data: dict, config: FSMConfig = None):
+        fsm = cls() if config is None else cls(config=config)
         if not data:
-            return cls()
-        fsm = cls()
+            return fsm
         fsm.state = data.get("state", S0_GREETING)
         fsm.step_count = data.get("step_count", 0)
         esc = data.get("escalation_counts", {})
@@ -84,10 +116,10 @@ class RobotFSM:
         Logika prehodov med stanji z izboljšano logiko zaključka.
         
         Zaključek se sproži:
-        - Po MAX_ESCALATIONS eskalacijah (predlog zaključka)
-        - Po MAX_SUCCESS_STEPS uspešnih korakih v S2_EXERCISE
+        - Po config.max_escalations eskalacijah (predlog zaključka)
+        - Po config.max_success_steps uspešnih korakih v S2_EXERCISE
         - Ob eksplicitnem feedback intentu (vendar šele po več korakih)
-        - Ob timeout-u (obravnava se v app.py)
+        - Ob timeout-u (obravnava se v helpers/session_timeouts.py)
         
         Args:
             inferred_intent: Intent, ki ga robot "razume" iz triggerja
@@ -98,22 +130,18 @@ class RobotFSM:
         self.should_suggest_end = False
         self.end_reason = ""
 
-        # Spremenljivka za beleženje, ali je bil trenutni trigger negativen
-        is_negative_trigger = False
+        # Skupina po intentu in skupina z upoštevanjem triggerja
+        # (poseben primer: "error" trigger z "Request to speak/help" intentom je negativen)
+        group = classify_intent(inferred_intent)
+        is_negative_trigger = classify_intent(inferred_intent, trigger) == GROUP_NEGATIVE
 
-        # Poseben primer: "error" trigger z "Request to speak/help" intentom
-        # naj se obravnava kot negativen (escalation)
-        if trigger == "error" and inferred_intent == "Request to speak/help":
-            self.negative_interactions += 1
-            self.escalation_counts["Error"] += 1
-            is_negative_trigger = True
         # Štej pozitivne/negativne interakcije
-        elif inferred_intent in POSITIVE_INTENTS:
-            self.positive_interactions += 1
-        elif inferred_intent in NEGATIVE_INTENTS:
+        if is_negative_trigger:
             self.negative_interactions += 1
-            self.escalation_counts[inferred_intent] += 1
-            is_negative_trigger = True
+            key = inferred_intent if group == GROUP_NEGATIVE else "Error"
+            self.escalation_counts[key] += 1
+        elif group == GROUP_POSITIVE:
+            self.positive_interactions += 1
 
         # ----- PREHODI MED STANJI -----
 
@@ -127,15 +155,15 @@ class RobotFSM:
             # Štej korake v razlagi
             self.explanation_steps += 1
             
-            if inferred_intent in POSITIVE_INTENTS:
+            if group == GROUP_POSITIVE:
                 # Pozitiven signal → gremo takoj v vajo
                 next_state = S2_EXERCISE
                 self.explanation_steps = 0  # Reset ob prehodu
-            elif inferred_intent in NEGATIVE_INTENTS or (trigger == "error" and inferred_intent == "Request to speak/help"):
+            elif is_negative_trigger:
                 # Negativen signal → ostanemo v razlagi, dodatna pojasnila
                 next_state = S1_EXPLANATION
-            elif self.explanation_steps >= 2:
-                # Po vsaj 2 korakih v razlagi → gremo v vajo
+            elif self.explanation_steps >= self.config.explanation_steps:
+                # Po vsaj N (privzeto 2) korakih v razlagi → gremo v vajo
                 next_state = S2_EXERCISE
                 self.explanation_steps = 0  # Reset ob prehodu
             else:
@@ -149,23 +177,23 @@ class RobotFSM:
             # - Feedback intenti: uporabnik je končal govor/gibanje
             # Samo negativni intenti (vključno z error triggerjem) se NE štejejo kot uspešni koraki
             is_success_step = (
-                (inferred_intent in POSITIVE_INTENTS or inferred_intent in NEUTRAL_INTENTS or inferred_intent == FEEDBACK_INTENT)
+                group in (GROUP_POSITIVE, GROUP_NEUTRAL, GROUP_FEEDBACK)
                 and not is_negative_trigger  # error trigger se ne šteje
             )
             if is_success_step:
                 self.success_steps += 1
 
-            if inferred_intent in NEGATIVE_INTENTS or (trigger == "error" and inferred_intent == "Request to speak/help"):
+            if is_negative_trigger:
                 next_state = S3_BREAK
-            elif inferred_intent == FEEDBACK_INTENT:
+            elif group == GROUP_FEEDBACK:
                 # Feedback intent se šteje kot uspešen korak, vendar ne zaključi takoj
-                # Zaključi se šele, ko je dosežen MAX_SUCCESS_STEPS
-                if self.success_steps >= MAX_SUCCESS_STEPS:
+                # Zaključi se šele, ko je dosežen config.max_success_steps
+                if self.success_steps >= self.config.max_success_steps:
                     next_state = S4_FEEDBACK
                     self.end_reason = "success_steps"
                 else:
                     next_state = S2_EXERCISE
-            elif self.success_steps >= MAX_SUCCESS_STEPS:
+            elif self.success_steps >= self.config.max_success_steps:
                 # Avtomatski zaključek po N uspešnih korakih
                 next_state = S4_FEEDBACK
                 self.end_reason = "success_steps"
@@ -176,13 +204,15 @@ class RobotFSM:
             # Reset success_steps po odmoru
             self.success_steps = 0
             
-            if inferred_intent in POSITIVE_INTENTS or inferred_intent in NEUTRAL_INTENTS:
+            # Opomba: odločamo po intentu, zato se "error" (nevtralen intent)
+            # iz odmora vrne v vajo - tako kot v zabeleženih sejah
+            if group in (GROUP_POSITIVE, GROUP_NEUTRAL):
                 # Pozitiven ali nevtralen signal → vrnemo se v vajo
                 next_state = S2_EXERCISE
-            elif inferred_intent == FEEDBACK_INTENT:
+            elif group == GROUP_FEEDBACK:
                 # Feedback → zaključek
                 next_state = S4_FEEDBACK
-            elif inferred_intent in NEGATIVE_INTENTS or is_negative_trigger:
+            elif is_negative_trigger:
                 # Še en negativen signal → ostanemo v odmoru
                 next_state = S3_BREAK
             else:
@@ -194,9 +224,9 @@ class RobotFSM:
             next_state = S4_FEEDBACK
 
         # ----- PREVERJANJE ESKALACIJ -----
-        # Predlagaj zaključek samo, če je bil trigger negativen in imamo >= MAX_ESCALATIONS eskalacij
+        # Predlagaj zaključek samo, če je bil trigger negativen in imamo >= max_escalations eskalacij
         total_esc = self.total_escalations()
-        if is_negative_trigger and total_esc >= MAX_ESCALATIONS and not self.is_final():
+        if is_negative_trigger and total_esc >= self.config.max_escalations and not self.is_final():
             self.should_suggest_end = True
             self.end_reason = "max_escalations"
 
@@ -234,15 +264,8 @@ class RobotFSM:
         }
     
     def get_state_info(self) -> dict:
-        """Vrne informacije o trenutnem stanju za vizualizacijo."""
-        state_descriptions = {
-            S0_GREETING: {"name": "Pozdrav", "color": "blue", "icon": "👋"},
-            S1_EXPLANATION: {"name": "Razlaga", "color": "purple", "icon": "📖"},
-            S2_EXERCISE: {"name": "Vaja", "color": "green", "icon": "🎯"},
-            S3_BREAK: {"name": "Odmor", "color": "orange", "icon": "☕"},
-            S4_FEEDBACK: {"name": "Zaključek", "color": "teal", "icon": "✅"},
-        }
-        return state_descriptions.get(self.state, {"name": "Neznano", "color": "gray", "icon": "❓"})
+        """Vrne informacije o trenutnem stanju za vizualizacijo (deljen slovar - ne spreminjaj)."""
+        return STATE_INFO.get(self.state, UNKNOWN_STATE_INFO)
 
 
 
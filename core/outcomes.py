@@ -0,0 +1,163 @@
+# core/outcomes.py - Natančna porazdelitev izidov seje (dinamično programiranje)
+
+"""
+Če uporabnik v vsakem stanju FSM izbere trigger po znani porazdelitvi
+(ocenjeni iz loga), je seja Markovska veriga nad stanjem RobotFSM. Namesto
+simulacije milijonov sej OutcomeAnalyzer korak za korakom prenaša verjetnostno
+maso po dosegljivih stanjih števcev in vrne natančne porazdelitve izidov do
+obzorja (horizon).
+
+Stanje verige je (stanje, explanation_steps, success_steps, eskalacije) -
+samo števci, ki vplivajo na prehode. Spajanje stanj:
+- števci, ki jih stanje ne bere (npr. success_steps v S3_BREAK, ki se ob
+  naslednjem koraku ponastavi), so postavljeni na 0,
+- eskalacije so omejene navzgor (nad max_escalations se obnašanje ne
+  spremeni, porazdelitev ima zadnje vedro "cap+"),
+- triggerji z enakim učinkom (skupina intenta, negativnost) so en dogodek.
+
+Prehode računa RobotFSM.update_state (memoizirano), zato ostaja logika FSM
+na enem mestu. Končno stanje je absorbirajoče (aplikacija takrat sejo zapre).
+"""
+
+from collections import defaultdict
+
+from .classification import GROUP_NEGATIVE, classify_intent
+from .fsm import FSMConfig, RobotFSM, S0_GREETING, S1_EXPLANATION, S2_EXERCISE, S3_BREAK, default_config
+
+ESCALATION_BUCKETS = 10       # eskalacije nad tem so v zadnjem vedru
+OPEN = "open"                 # seja ob obzorju še ni končana
+
+
+def merge_effects(trigger_probs: dict, index) -> tuple:
+    """
+    {trigger: p} -> ((intent, trigger, p), ...): triggerji z enakim učinkom na
+    FSM so združeni, verjetnosti normalizirane. Neznan trigger ima intent "Unknown".
+    """
+    merged = {}
+    total = sum(p for p in trigger_probs.values() if p > 0)
+    if total <= 0:
+        return ()
+    for trigger, p in sorted(trigger_probs.items()):
+        if p <= 0:
+            continue
+        intent = index.get(trigger).intent
+        key = (classify_intent(intent), classify_intent(intent, trigger) == GROUP_NEGATIVE)
+        representative = merged.get(key, (intent, trigger, 0.0))
+        merged[key] = (representative[0], representative[1], representative[2] + p / total)
+    return tuple(merged.values())
+
+
+class OutcomeAnalyzer:
+    """Porazdelitev izidov seje za dane pragove in model triggerjev po stanjih."""
+
+    def __init__(self, state_probs: dict, index, config: FSMConfig = None, escalation_buckets: int = ESCALATION_BUCKETS):
+        """
+        state_probs: {stanje: {trigger: verjetnost}}; stanja brez porazdelitve
+        uporabijo porazdelitev pod ključem None (če obstaja).
+        """
+        self.config = config or default_config()
+        self.cap = max(escalation_buckets, self.config.max_escalations)
+        fallback = merge_effects(state_probs.get(None) or {}, index)
+        self.effects = {
+            state: merge_effects(state_probs.get(state) or {}, index) or fallback
+            for state in (S0_GREETING, S1_EXPLANATION, S2_EXERCISE, S3_BREAK)
+        }
+        self._transitions = {}
+
+    def _canonical(self, state: str, explanation: int, success: int, escalations: int) -> tuple:
+        if state != S1_EXPLANATION:
+            explanation = 0
+        if state != S2_EXERCISE:
+            success = 0
+        return state, explanation, success, min(escalations, self.cap)
+
+    def transitions(self, key: tuple) -> list:
+        """
+        Prehodi iz stanja verige: [(p, naslednje stanje, negativen, predlog
+        zaključka, razlog zaključka)]. Memoizirano.
+        """
+        cached = self._transitions.get(key)
+        if cached is not None:
+            return cached
+        state, explanation, success, escalations = key
+        result = []
+        for intent, trigger, p in self.effects.get(state, ()):
+            fsm = RobotFSM(
+                state=state,
+                explanation_steps=explanation,
+                success_steps=success,
+                escalation_counts=defaultdict(int, {"": escalations}),
+                config=self.config,
+            )
+            fsm.update_state(intent, trigger=trigger)
+            negative = classify_intent(intent, trigger) == GROUP_NEGATIVE
+            nxt = self._canonical(fsm.state, fsm.explanation_steps, fsm.success_steps, fsm.total_escalations())
+            reason = (fsm.end_reason or "final") if fsm.is_final() else None
+            result.append((p, nxt, negative, fsm.should_suggest_end, reason))
+        self._transitions[key] = result
+        return result
+
+    def analyze(self, horizon: int) -> dict:
+        """
+        Natančni izidi do horizon korakov:
+        - finished_by_step[k-1]: verjetnost, da se seja konča v k korakih,
+        - end_reasons: verjetnost po razlogu zaključka (in "open"),
+        - expected_steps: pričakovano število korakov (omejeno z obzorjem),
+        - expected_escalations, expected_suggestions: pričakovano število
+          negativnih korakov in predlogov zaključka (max_escalations),
+        - p_suggest_end: verjetnost vsaj enega predloga zaključka,
+        - escalations: porazdelitev števila eskalacij ob koncu ali obzorju.
+        """
+        alive = {self._canonical(S0_GREETING, 0, 0, 0): 1.0}
+        ended = defaultdict(float)                  # (razlog, eskalacije) -> p
+        finished_by_step = []
+        finished = expected_steps = expected_escalations = expected_suggestions = 0.0
+        visited = set(alive)
+
+        for _ in range(horizon):
+            if not alive:
+                finished_by_step.append(finished)
+                continue
+            step = defaultdict(float)
+            for key, mass in alive.items():
+                expected_steps += mass
+                moves = self.transitions(key)
+                if not moves:                       # stanje brez modela triggerjev
+                    step[key] += mass
+                    continue
+                for p, nxt, negative, suggest, reason in moves:
+                    q = mass * p
+                    if negative:
+                        expected_escalations += q
+                    if suggest:
+                        expected_suggestions += q
+                    if reason is None:
+                        step[nxt] += q
+                    else:
+                        ended[(reason, nxt[3])] += q
+                        finished += q
+            alive = step
+            visited.update(alive)
+            finished_by_step.append(finished)
+
+        end_reasons = defaultdict(float)
+        escalations = [0.0] * (self.cap + 1)
+        for (reason, esc), p in ended.items():
+            end_reasons[reason] += p
+            escalations[esc] += p
+        for key, p in alive.items():
+            end_reasons[OPEN] += p
+            escalations[key[3]] += p
+        threshold = self.config.max_escalations
+        return {
+            "config": self.config.to_dict(),
+            "horizon": horizon,
+            "finished_by_step": finished_by_step,
+            "end_reasons": dict(end_reasons),
+            "expected_steps": expected_steps,
+            "expected_escalations": expected_escalations,
+            "expected_suggestions": expected_suggestions,
+            "p_suggest_end": sum(escalations[threshold:]),
+            "escalations": {(f"{k}+" if k == self.cap else str(k)): p for k, p in enumerate(escalations)},
+            "chain_states": len(visited),
+        }
@@ -0,0 +1,72 @@
+# core/replay.py - Rekonstrukcija FSM iz zabeleženih dogodkov
+
+"""
+FSM je determinističen, zato ga lahko iz zaporedja zabeleženih parov
+(trigger, inferred_intent) vedno znova zgradimo. Funkcije tu ne poznajo
+baze - dobijo navadne vrstice (dict ali objekt z atributi).
+"""
+
+from .fsm import RobotFSM, S4_FEEDBACK
+
+
+def _get(row, key, default=None):
+    if isinstance(row, dict):
+        return row.get(key, default)
+    return getattr(row, key, default)
+
+
+def iter_replay(rows, fsm: RobotFSM = None):
+    """
+    Predvaja vrstice skozi FSM in za vsako vrne (row, state_before, state_after).
+
+    Če vrstica pravi, da je bila seja pred njo že v S4_FEEDBACK, FSM pa ne,
+    je bil vmes prisilni zaključek (force_end ni zabeležen kot interakcija).
+    """
+    fsm = fsm if fsm is not None else RobotFSM()
+    for row in rows:
+        if _get(row, "state_before") == S4_FEEDBACK and not fsm.is_final():
+            fsm.force_end()
+        state_before = fsm.state
+        state_after = fsm.update_state(_get(row, "inferred_intent"), trigger=_get(row, "trigger"))
+        yield row, state_before, state_after
+
+
+def replay(rows, fsm: RobotFSM = None) -> RobotFSM:
+    """Vrne FSM po predvajanju vseh vrstic."""
+    fsm = fsm if fsm is not None else RobotFSM()
+    for _ in iter_replay(rows, fsm):
+        pass
+    return fsm
+
+
+def check_consistency(rows, fsm: RobotFSM = None) -> dict:
+    """
+    Primerja predvajano stanje z zabeleženim (state_before, state_after,
+    escalation_count) za vsak korak.
+    """
+    fsm = fsm if fsm is not None else RobotFSM()
+    mismatches = []
+    steps = 0
+    for row, state_before, state_after in iter_replay(rows, fsm):
+        steps += 1
+        expected = {
+            "state_before": _get(row, "state_before"),
+            "state_after": _get(row, "state_after"),
+            "escalation_count": _get(row, "escalation_count"),
+        }
+        actual = {
+            "state_before": state_before,
+            "state_after": state_after,
+            "escalation_count": fsm.total_escalations(),
+        }
+        diff = {k: {"logged": expected[k], "replayed": actual[k]}
+                for k in expected if expected[k] is not None and expected[k] != actual[k]}
+        if diff:
+            mismatches.append({"step_number": _get(row, "step_number"), "diff": diff})
+
+    return {
+        "steps": steps,
+        "consistent": not mismatches,
+        "mismatches": mismatches,
+        "final_state": fsm.to_dict(),
+    }
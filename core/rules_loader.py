@@ -13,8 +13,14 @@ Vsako pravilo ima:
 - RobotText: dejanski tekst, ki ga robot pove
 """
 
+import hashlib
+import json
 from typing import List, Dict
 
+# Odziv na trigger, za katerega ni pravila
+UNKNOWN_INTENT = "Unknown"
+UNKNOWN_TEXT = "Nisem prepričan, kako naj reagiram na ta trigger."
+
 PRIORITY_ORDER = {
     "Critical": 4,
     "High": 3,
@@ -167,42 +173,51 @@ RULES: List[Dict] = [
 ]
 
 
+def rules_version(rules: List[Dict]) -> str:
+    """Kratek podpis vsebine pravil - ključ za predpomnilnike, odvisne od pravil."""
+    payload = json.dumps(rules, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
 class RuleEngine:
-    def __init__(self):
+    def __init__(self, rules: List[Dict] = None):
+        self.reload(rules if rules is not None else RULES)
+
+    def reload(self, rules: List[Dict]):
+        """
+        Zamenja pravila in ponovno zgradi indeks. Sprememba `version`
+        razveljavi vse predpomnilnike, ki so vezani na pravila.
+        """
+        from .classification import TriggerIndex
+
         # Namesto DataFrame zdaj uporabljamo navaden Python seznam
-        self.rules: List[Dict] = RULES
+        self.rules: List[Dict] = rules
+        # Indeks trigger -> (intent, skupina, polarnost, koda, pravilo)
+        self.index = TriggerIndex(self.rules)
+        self.version = rules_version(self.rules)
 
     def get_triggers(self) -> list:
         """
         Vrne seznam unikatnih triggerjev, ki jih UI uporabi za gumbe.
         """
-        return sorted({r["Trigger"] for r in self.rules})
+        return list(self.index.triggers)
 
     def select_rule(self, trigger: str):
         """
         Najde pravilo za izbran trigger.
-        Če jih je več, vzamemo tistega z najvišjo prioriteto.
+        Če jih je več, vzamemo tistega z najvišjo prioriteto (izbrano vnaprej v indeksu).
+        """
+        return self.index.rule(trigger)
+
+    def response(self, trigger: str) -> tuple:
+        """
+        (robot_text, inferred_intent, speech_act, priority) za trigger;
+        brez pravila UNKNOWN_TEXT in UNKNOWN_INTENT.
         """
-        matches = [r for r in self.rules if r["Trigger"] == trigger]
-        if not matches:
-            return None
-
-        matches.sort(
-            key=lambda r: PRIORITY_ORDER.get(r.get("Priority", "Low"), 1),
-            reverse=True,
-        )
-        row = matches[0]
-
-        return {
-            "trigger": row["Trigger"],
-            "inferred_intent": row.get("Inferred Intent"),
-            "priority": row.get("Priority"),
-            "confidence_thrs": row.get("ConfidenceThrs."),
-            "escalated_action": row.get("Escalated Action"),
-            "escalation_count": row.get("escalationCount"),
-            "speech_act": row.get("Robot Speech Act"),
-            "robot_text": row.get("RobotText"),
-        }
+        rule = self.select_rule(trigger)
+        if rule is None:
+            return UNKNOWN_TEXT, UNKNOWN_INTENT, None, None
+        return rule["robot_text"], rule["inferred_intent"], rule["speech_act"], rule["priority"]
 
 
 
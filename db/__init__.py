@@ -1,6 +1,27 @@
 # db/__init__.py - Database modul
 
-from .models import db, SessionLog, InteractionLog
-
-__all__ = ["db", "SessionLog", "InteractionLog"]
+from .models import (
+    db, SchemaInfo, SessionLog, Robot, InteractionLog, FSMSnapshot, SessionEvaluation,
+    SessionRollup, ScenarioRollup, MarkovCounts, SessionVector,
+)
+from .schema import SCHEMA_VERSION, ensure_schema, current_schema_version
+from .routing import read_router, read_session
 
+__all__ = [
+    "db",
+    "SchemaInfo",
+    "SessionLog",
+    "Robot",
+    "InteractionLog",
+    "FSMSnapshot",
+    "SessionEvaluation",
+    "SessionRollup",
+    "ScenarioRollup",
+    "MarkovCounts",
+    "SessionVector",
+    "SCHEMA_VERSION",
+    "ensure_schema",
+    "current_schema_version",
+    "read_router",
+    "read_session",
+]
@@ -0,0 +1,70 @@
+# db/aio.py - Asinhroni engine in seje za ASGI način (asgi.py)
+
+"""
+Isti modeli in tabele (db.metadata) prek asinhronega gonilnika:
+postgresql -> asyncpg, sqlite -> aiosqlite. Engine se ustvari leno v zanki
+dogodkov workerja (po fork-u), zato si procesi povezav ne delijo.
+
+Sinhrone pomožne funkcije s parametrom session (rebuild_fsm,
+load_evaluation_rows ...) se iz asinhrone kode kličejo prek
+AsyncSession.run_sync - logika ostane na enem mestu.
+"""
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_url(url: str):
+    """URL sinhrone baze -> URL z asinhronim gonilnikom (ValueError, če ga ni)."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Asinhroni način ne podpira baze {backend} (podprte: {', '.join(ASYNC_DRIVERS)}).")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+class AsyncDatabase:
+    """Asinhroni engine in tovarna sej (ena instanca na proces)."""
+
+    def __init__(self):
+        self.url = None
+        self.options = {}
+        self.engine = None
+        self.sessionmaker = None
+
+    def init_app(self, app):
+        self.url = async_url(app.config["ASYNC_DATABASE_URL"] or app.config["SQLALCHEMY_DATABASE_URI"])
+        connect_args = {}
+        pool_size, max_overflow = app.config["ASYNC_DB_POOL_SIZE"], app.config["ASYNC_DB_MAX_OVERFLOW"]
+        if self.url.get_backend_name() == "sqlite":
+            # SQLite ima enega pisalca: pri več povezavah čakajo na zaklep z
+            # naraščajočim spanjem (dolg rep zakasnitev), čakanje v bazenu pa je po vrsti
+            connect_args["timeout"] = 30
+            pool_size, max_overflow = 1, 0
+        elif "sslmode" in self.url.query:
+            # asyncpg ne pozna sslmode (libpq) - prevede se v ssl
+            connect_args["ssl"] = self.url.query["sslmode"] not in ("disable", "allow")
+            self.url = self.url.difference_update_query(["sslmode"])
+        self.options = {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_pre_ping": True,
+            "connect_args": connect_args,
+        }
+
+    def session(self):
+        """Nova AsyncSession (uporabi kot `async with aio_db.session() as s`)."""
+        if self.engine is None:
+            self.engine = create_async_engine(self.url, **self.options)
+            self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        return self.sessionmaker()
+
+    async def dispose(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = self.sessionmaker = None
+
+
+aio_db = AsyncDatabase()
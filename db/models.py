@@ -6,12 +6,28 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 
+class SchemaInfo(db.Model):
+    """Ena vrstica z verzijo sheme - ob zagonu preskočimo DDL, če se ujema."""
+    __tablename__ = "schema_info"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class SessionLog(db.Model):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Iskanje odprtih neaktivnih sej brez pregleda cele tabele
+        db.Index("ix_sessions_open_activity", "ended_at", "last_activity_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     ended_at = db.Column(db.DateTime, nullable=True)
+    end_reason = db.Column(db.String(50), nullable=True)          # success_steps / forced / reset / timeout ...
+    last_activity_at = db.Column(db.DateTime, default=datetime.utcnow)
+    robot_id = db.Column(db.String(64), nullable=True, index=True)     # seja robota flote (/api/fleet), sicer NULL
 
     # Uporabniška evalvacija (1-5 Likert)
     rating_supportive = db.Column(db.Integer, nullable=True)      # Robot je podporen
@@ -22,8 +38,21 @@ class SessionLog(db.Model):
     interactions = db.relationship("InteractionLog", backref="session", lazy=True)
 
 
+class Robot(db.Model):
+    """Robot flote; žeton za /api/fleet je shranjen samo kot SHA-256."""
+    __tablename__ = "robots"
+
+    robot_id = db.Column(db.String(64), primary_key=True)
+    token_hash = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class InteractionLog(db.Model):
     __tablename__ = "interactions"
+    __table_args__ = (
+        # En korak seje samo enkrat (rekonstrukcija FSM predvaja korake po step_number)
+        db.Index("uq_interactions_session_step", "session_id", "step_number", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey("sessions.id"), nullable=False)
@@ -41,4 +70,92 @@ class InteractionLog(db.Model):
     priority = db.Column(db.String(50), nullable=True)
 
     escalation_count = db.Column(db.Integer, default=0)
+    repeat_count = db.Column(db.Integer, nullable=False, default=1, server_default="1")  # združene ponovitve (debounce)
+
+
+class FSMSnapshot(db.Model):
+    """Posnetek RobotFSM.to_dict() po vsakih N korakih - rekonstrukcija predvaja samo rep."""
+    __tablename__ = "fsm_snapshots"
+    __table_args__ = (
+        db.UniqueConstraint("session_id", "step_number", name="uq_fsm_snapshots_session_step"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey("sessions.id"), nullable=False, index=True)
+    step_number = db.Column(db.Integer, nullable=False)
+    state = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SessionEvaluation(db.Model):
+    """Shranjena funkcionalna evalvacija seje za določeno verzijo točkovanja."""
+    __tablename__ = "session_evaluations"
+
+    session_id = db.Column(db.Integer, db.ForeignKey("sessions.id"), primary_key=True)
+    scoring_version = db.Column(db.String(64), nullable=False, index=True)
+    step_count = db.Column(db.Integer, nullable=False)       # koliko korakov je zajetih
+    scenario_id = db.Column(db.String(50), nullable=True)
+    confidence = db.Column(db.Float, nullable=True)
+    evaluation = db.Column(db.JSON, nullable=False)
+    evaluated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)   # vodni žig scenarijev v indeksu podobnosti
+
+
+class SessionRollup(db.Model):
+    """Agregati zaključenih sej po urah / dneh (vedro = začetek seje, UTC)."""
+    __tablename__ = "session_rollups"
+    __table_args__ = (
+        db.UniqueConstraint("granularity", "bucket_start", name="uq_session_rollups_bucket"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(8), nullable=False)        # hour / day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+
+    sessions = db.Column(db.Integer, nullable=False, default=0)  # zaključene seje
+    completed = db.Column(db.Integer, nullable=False, default=0) # end_reason = success_steps
+    steps = db.Column(db.Integer, nullable=False, default=0)
+    escalations = db.Column(db.Integer, nullable=False, default=0)
+
+    # Likert ocene: vsota in število (posamezna ocena je lahko prazna)
+    rating_supportive_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_supportive_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_understandable_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_understandable_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_non_intrusive_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_non_intrusive_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ScenarioRollup(db.Model):
+    """Število zaključenih sej po scenariju v vedru."""
+    __tablename__ = "scenario_rollups"
+    __table_args__ = (
+        db.UniqueConstraint("granularity", "bucket_start", "scenario_id", name="uq_scenario_rollups_bucket"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(8), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    scenario_id = db.Column(db.String(50), nullable=False)
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+
+
+class MarkovCounts(db.Model):
+    """Števci empiričnega Markovega modela (NumPy polja) z vodnim žigom zadnje prebrane interakcije."""
+    __tablename__ = "markov_counts"
+
+    name = db.Column(db.String(32), primary_key=True)             # states / triggers
+    watermark = db.Column(db.Integer, nullable=False, default=0)  # največji upoštevan InteractionLog.id
+    labels = db.Column(db.JSON, nullable=False)                   # oznake vrstic/stolpcev
+    counts = db.Column(db.LargeBinary, nullable=False)            # np.save (n x n prehodov + n začetkov)
+    gaps = db.Column(db.JSON, nullable=True)                      # manjkajoči id-ji pod vodnim žigom (še nepotrjeni)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SessionVector(db.Model):
+    """Zgoščen n-gram vektor zaporedja triggerjev/intentov seje (float32) za iskanje podobnih sej."""
+    __tablename__ = "session_vectors"
 
+    session_id = db.Column(db.Integer, db.ForeignKey("sessions.id"), primary_key=True)
+    last_interaction_id = db.Column(db.Integer, nullable=False, index=True)  # vodni žig indeksa
+    step_count = db.Column(db.Integer, nullable=False)
+    vector = db.Column(db.LargeBinary, nullable=False)
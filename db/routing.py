@@ -0,0 +1,177 @@
+# db/routing.py - Branje analitike z ločene baze (replika ali lokalna kopija)
+
+"""
+Zapisi (trigger, ocene, shranjene evalvacije) gredo vedno v primarno bazo
+(db.session). Težka branja pregleda sej in analitičnih opravil gredo prek
+read_session() na ločen engine z lastnim poolom, zato ne tekmujejo z
+INSERT-i v handle_trigger.
+
+ANALYTICS_DATABASE_URL je lahko:
+- replika PostgreSQL (zaostanek iz pg_last_xact_replay_timestamp()),
+- lokalna SQLite kopija, ki jo osvežuje `flask refresh-analytics-copy`
+  (zaostanek = čas od začetka zadnjega kopiranja, mtime datoteke).
+
+Če je zaostanek večji od ANALYTICS_MAX_STALENESS_SECONDS (ali ga ni mogoče
+ugotoviti), read_session() vrne primarno sejo.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from flask import g
+from flask.globals import app_ctx
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import NullPool
+
+from .models import db
+
+COPY_CHUNK_SIZE = 5000
+
+
+def _app_ctx_id() -> int:
+    return id(app_ctx._get_current_object())
+
+
+class ReadRouter:
+    """Engine in seja za branja z omejenim zaostankom."""
+
+    def __init__(self):
+        self.engine = None
+        self.session = None
+        self.max_staleness = 0.0
+        self.check_interval = 5.0
+        self._checked_at = 0.0
+        self._staleness = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        url = app.config["ANALYTICS_DATABASE_URL"]
+        self.max_staleness = app.config["ANALYTICS_MAX_STALENESS_SECONDS"]
+        self.check_interval = app.config["ANALYTICS_STALENESS_CHECK_SECONDS"]
+        if not url:
+            return
+        if url.startswith("sqlite"):
+            # Kopija se zamenja z os.replace - vsaka seja naj odpre trenutno datoteko
+            self.engine = create_engine(url, poolclass=NullPool)
+        else:
+            self.engine = create_engine(url, pool_pre_ping=True)
+        self.session = scoped_session(sessionmaker(bind=self.engine), scopefunc=_app_ctx_id)
+
+        @app.teardown_appcontext
+        def _remove_read_session(exc):
+            self.session.remove()
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine is not None
+
+    def staleness(self):
+        """Zaostanek bralne baze v sekundah (None, če ni znan)."""
+        if self.engine is None:
+            return 0.0
+        if self.engine.dialect.name == "sqlite":
+            path = self.engine.url.database
+            return max(0.0, time.time() - os.path.getmtime(path)) if path and os.path.exists(path) else None
+        if self.engine.dialect.name == "postgresql":
+            try:
+                with self.engine.connect() as conn:
+                    lag = conn.execute(text(
+                        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                    )).scalar()
+            except SQLAlchemyError:
+                return None
+            return float(lag or 0.0)        # NULL: ni replika, ampak primarna baza
+        return 0.0                          # zaostanek drugih replik spremlja njihov strežnik
+
+    def usable(self) -> bool:
+        """Ali je bralna baza dovolj sveža (preveri največ vsakih check_interval sekund)."""
+        if self.engine is None:
+            return False
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if now - self._checked_at >= self.check_interval:
+                    self._staleness = self.staleness()
+                    self._checked_at = now
+        return self._staleness is not None and self._staleness <= self.max_staleness
+
+    def read_session(self):
+        """Seja za branja: bralna baza, če je dovolj sveža, sicer primarna."""
+        if g.get("_reads_on_primary") or not self.usable():
+            return db.session
+        return self.session()
+
+    def use_primary(self) -> bool:
+        """
+        Preostala branja tega zahtevka gredo na primarno bazo (npr. seja, ki je
+        v bralni bazi še ni). Vrne False, če so branja že na primarni.
+        """
+        if g.get("_reads_on_primary") or not self.usable():
+            return False
+        g._reads_on_primary = True
+        return True
+
+    def status(self) -> dict:
+        self.usable()
+        return {
+            "enabled": self.enabled,
+            "dialect": self.engine.dialect.name if self.engine is not None else None,
+            "staleness_seconds": None if self._staleness is None else round(self._staleness, 1),
+            "max_staleness_seconds": self.max_staleness,
+            "serving_reads": self.usable(),
+        }
+
+
+read_router = ReadRouter()
+
+
+def read_session():
+    """Seja za analitična branja (glej ReadRouter)."""
+    return read_router.read_session()
+
+
+def refresh_sqlite_copy(source_engine, target_path: str, chunk_size: int = COPY_CHUNK_SIZE) -> dict:
+    """
+    Naredi konsistentno kopijo primarne baze v SQLite datoteko target_path:
+    zapiše jo v začasno datoteko in jo atomarno zamenja. mtime kopije je
+    čas začetka kopiranja (merilo zaostanka). Vrne {tabela: vrstic}.
+    """
+    started = time.time()
+    tmp_path = f"{target_path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    counts = {}
+    try:
+        if source_engine.dialect.name == "sqlite":
+            # Backup API: posnetek brez zaklepanja pisalcev za ves čas kopiranja
+            source = sqlite3.connect(source_engine.url.database)
+            target = sqlite3.connect(tmp_path)
+            with target:
+                source.backup(target, pages=1024)
+            for table in db.metadata.sorted_tables:
+                counts[table.name] = target.execute(f'SELECT COUNT(*) FROM "{table.name}"').fetchone()[0]
+            source.close()
+            target.close()
+        else:
+            target_engine = create_engine(f"sqlite:///{tmp_path}")
+            db.metadata.create_all(target_engine)
+            with source_engine.connect().execution_options(
+                isolation_level="REPEATABLE READ", stream_results=True, yield_per=chunk_size
+            ) as source, target_engine.begin() as target:
+                for table in db.metadata.sorted_tables:
+                    counts[table.name] = 0
+                    for rows in source.execute(select(table)).mappings().partitions():
+                        target.execute(insert(table), [dict(row) for row in rows])
+                        counts[table.name] += len(rows)
+            target_engine.dispose()
+        os.utime(tmp_path, (started, started))
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return counts
@@ -0,0 +1,131 @@
+# db/schema.py - Preverjanje verzije sheme ob zagonu
+
+"""
+Namesto db.create_all() ob vsakem zagonu workerja preverimo verzijo sheme
+v tabeli schema_info. DDL (create_all + dodajanje manjkajočih stolpcev in
+indeksov) se izvede samo, ko se verzija ne ujema s SCHEMA_VERSION.
+
+SCHEMA_VERSION povečaj ob vsaki spremembi modelov.
+"""
+
+from sqlalchemy import bindparam, delete, func, inspect, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from .models import db, SchemaInfo, InteractionLog, FSMSnapshot
+
+SCHEMA_VERSION = 11
+
+
+def current_schema_version():
+    """Vrne shranjeno verzijo sheme ali None, če tabela še ne obstaja."""
+    try:
+        return db.session.execute(select(SchemaInfo.version).limit(1)).scalar()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+
+
+def ensure_schema(app, mode: str = "auto") -> bool:
+    """
+    Poskrbi, da je shema v bazi na verziji SCHEMA_VERSION.
+
+    Args:
+        mode: "auto" (preveri verzijo, DDL samo ob neujemanju),
+              "always" (vedno izvedi DDL), "skip" (ne dotikaj se baze)
+
+    Returns:
+        True, če je bil izveden DDL.
+    """
+    if mode == "skip":
+        return False
+
+    with app.app_context():
+        if mode != "always" and current_schema_version() == SCHEMA_VERSION:
+            return False
+
+        db.create_all()
+        _add_missing_columns()
+        _renumber_duplicate_steps()
+        _create_missing_indexes()
+
+        info = db.session.get(SchemaInfo, 1)
+        if info is None:
+            info = SchemaInfo(id=1, version=SCHEMA_VERSION)
+            db.session.add(info)
+        info.version = SCHEMA_VERSION
+        db.session.commit()
+        return True
+
+
+def _add_missing_columns():
+    """create_all ne doda novih stolpcev obstoječim tabelam - to naredimo tu."""
+    engine = db.engine
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(dialect=engine.dialect)}"
+                # Obstoječe vrstice dobijo server_default (sicer NULL)
+                if column.server_default is not None:
+                    ddl += f" DEFAULT '{column.server_default.arg}'"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                conn.execute(text(ddl))
+
+
+def _renumber_duplicate_steps():
+    """
+    Starejše baze imajo lahko podvojene (session_id, step_number) (hkratna
+    zahtevka z istim piškotkom) - unikatni indeks jih ne bi ustvaril.
+    Koraki takih sej se oštevilčijo na novo po (step_number, id), njihovi
+    posnetki FSM pa se zbrišejo (rekonstrukcija jih predvaja iz loga).
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    if not inspector.has_table(InteractionLog.__tablename__):
+        return
+    if any(ix["name"] == "uq_interactions_session_step" for ix in inspector.get_indexes(InteractionLog.__tablename__)):
+        return
+
+    with engine.begin() as conn:
+        session_ids = conn.execute(
+            select(InteractionLog.session_id)
+            .group_by(InteractionLog.session_id, InteractionLog.step_number)
+            .having(func.count() > 1)
+            .distinct()
+        ).scalars().all()
+        if not session_ids:
+            return
+
+        rows = conn.execute(
+            select(InteractionLog.id, InteractionLog.session_id)
+            .where(InteractionLog.session_id.in_(session_ids))
+            .order_by(InteractionLog.session_id, InteractionLog.step_number, InteractionLog.id)
+        ).all()
+        params, steps = [], {}
+        for interaction_id, session_id in rows:
+            steps[session_id] = steps.get(session_id, 0) + 1
+            params.append({"_id": interaction_id, "_step": steps[session_id]})
+
+        conn.execute(
+            update(InteractionLog.__table__)
+            .where(InteractionLog.__table__.c.id == bindparam("_id"))
+            .values(step_number=bindparam("_step")),
+            params,
+        )
+        if inspector.has_table(FSMSnapshot.__tablename__):
+            conn.execute(delete(FSMSnapshot).where(FSMSnapshot.session_id.in_(session_ids)))
+
+
+def _create_missing_indexes():
+    """Ustvari indekse, ki so v modelih, a jih v obstoječi bazi še ni."""
+    engine = db.engine
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
@@ -2,11 +2,16 @@
 
 """
 Modul za strokovno evalvacijo sej glede na FSM in vzorce vedenja.
+
+Podmoduli se uvozijo takoj: z gunicorn --preload se naložijo enkrat v
+masterju in so po gc.freeze() deljeni z workerji (copy-on-write).
 """
 
 from .scenarios import REFERENCE_SCENARIOS
-from .categories import INTENT_CATEGORIES
+from .alignment import align_scenarios
 from .functions import (
+    SCORING_REVISION,
+    alignment_weight,
     classify_session,
     calculate_session_stats,
     calculate_scenario_match,
@@ -15,11 +20,12 @@ from .functions import (
     generate_summary,
     get_all_scenarios,
     get_attr,
+    scoring_version,
+    set_alignment_weight,
 )
 
 __all__ = [
     "REFERENCE_SCENARIOS",
-    "INTENT_CATEGORIES",
     "classify_session",
     "calculate_session_stats",
     "calculate_scenario_match",
@@ -28,5 +34,9 @@ __all__ = [
     "generate_summary",
     "get_all_scenarios",
     "get_attr",
+    "scoring_version",
+    "SCORING_REVISION",
+    "alignment_weight",
+    "set_alignment_weight",
+    "align_scenarios",
 ]
-
@@ -0,0 +1,84 @@
+# evaluation/alignment.py - Poravnava zaporedja triggerjev s pričakovanimi zaporedji scenarijev
+
+"""
+Najdaljše skupno podzaporedje (LCS) med triggerji seje in expected_triggers
+vsakega scenarija, izračunano bit-paralelno (Hyyrö):
+
+    U = V & PM[c];  V = (V + U) | (V - U)
+
+Triggerji so kodirani s celimi števili (abeceda pričakovanih triggerjev,
+0 = trigger, ki ga ni v nobenem scenariju). Vsi scenariji so zloženi v eno
+bitno polje, med bloki je varovalni bit, ki ujame prenos seštevanja
+(V - U nikoli ne sposodi, ker je U podmnožica V). Ena zanka čez sejo tako
+poravna sejo z vsemi scenariji hkrati - O(n) operacij nad enim celim številom.
+
+Iz LCS sledi še razdalja urejanja brez zamenjav: d = m + n - 2 * LCS.
+Podobnost je pokritost vzorca LCS / m (m = dolžina expected_triggers):
+dolga seja, ki vsebuje celoten vzorec, ima podobnost 1, medtem ko bi
+2 * LCS / (m + n) z dolžino seje padala proti 0.
+"""
+
+from functools import lru_cache
+
+from .scenarios import REFERENCE_SCENARIOS
+
+
+class ScenarioPatterns:
+    """Predizračunane bitne maske za vse pričakovane sekvence."""
+
+    def __init__(self, scenarios: dict):
+        self.ids = [sid for sid, s in scenarios.items() if s.get("expected_triggers")]
+        alphabet = sorted({t for sid in self.ids for t in scenarios[sid]["expected_triggers"]})
+        self.codes = {trigger: code for code, trigger in enumerate(alphabet, start=1)}
+
+        self.blocks = []          # (odmik, dolžina) bloka vsakega scenarija
+        masks = [0] * (len(alphabet) + 1)
+        offset = 0
+        for sid in self.ids:
+            pattern = scenarios[sid]["expected_triggers"]
+            for position, trigger in enumerate(pattern):
+                masks[self.codes[trigger]] |= 1 << (offset + position)
+            self.blocks.append((offset, len(pattern)))
+            offset += len(pattern) + 1            # + varovalni bit
+        self.masks = masks
+        self.full = sum(((1 << length) - 1) << start for start, length in self.blocks)
+
+    def encode(self, triggers) -> list:
+        codes = self.codes
+        return [codes.get(t, 0) for t in triggers]
+
+    def lcs(self, codes) -> dict:
+        """{scenario_id: LCS} za kodirano zaporedje seje."""
+        masks, full = self.masks, self.full
+        v = full
+        for code in codes:
+            u = v & masks[code]
+            v = ((v + u) | (v - u)) & full
+        return {
+            sid: length - bin((v >> start) & ((1 << length) - 1)).count("1")
+            for sid, (start, length) in zip(self.ids, self.blocks)
+        }
+
+
+@lru_cache(maxsize=1)
+def default_patterns() -> ScenarioPatterns:
+    return ScenarioPatterns(REFERENCE_SCENARIOS)
+
+
+def align_scenarios(triggers, patterns: ScenarioPatterns = None) -> dict:
+    """
+    Poravnava seje z vsemi scenariji:
+    {scenario_id: {"lcs", "distance", "similarity"}}, similarity = LCS / m (pokritost vzorca).
+    """
+    patterns = patterns or default_patterns()
+    n = len(triggers)
+    lengths = dict(zip(patterns.ids, (length for _, length in patterns.blocks)))
+    result = {}
+    for sid, lcs in patterns.lcs(patterns.encode(triggers)).items():
+        m = lengths[sid]
+        result[sid] = {
+            "lcs": lcs,
+            "distance": m + n - 2 * lcs,
+            "similarity": lcs / m if m else 0.0,
+        }
+    return result
@@ -4,26 +4,82 @@
 Funkcije za analizo in evalvacijo sej.
 """
 
+import hashlib
+import json
+from functools import lru_cache
+
+from core.classification import (
+    GROUP_NEGATIVE,
+    GROUP_POSITIVE,
+    INTENT_GROUPS,
+    NEGATIVE_TRIGGER_INTENTS,
+    classify_intent,
+)
+
 from .scenarios import REFERENCE_SCENARIOS
-from .categories import INTENT_CATEGORIES
+from .alignment import align_scenarios
+
+# Povečaj ob vsaki spremembi logike točkovanja v tem modulu.
+# Sprememba REFERENCE_SCENARIOS se v scoring_version() zazna sama.
+SCORING_REVISION = 4
+
+# Delež poravnave z expected_triggers v oceni ujemanja (0 = samo razmerja)
+_alignment_weight = 0.3
+
+
+def set_alignment_weight(weight: float):
+    """Utež poravnave (nastavi app.py iz Config.EVAL_ALIGNMENT_WEIGHT)."""
+    global _alignment_weight
+    _alignment_weight = weight
+    scoring_version.cache_clear()
+
+
+def alignment_weight() -> float:
+    return _alignment_weight
+
+
+@lru_cache(maxsize=1)
+def scoring_version():
+    """
+    Podpis trenutnega točkovanja (revizija + vsebina scenarijev).
+    Shranjene evalvacije z drugačnim podpisom so zastarele.
+    """
+    payload = json.dumps(
+        {
+            "revision": SCORING_REVISION,
+            "alignment_weight": _alignment_weight,
+            "scenarios": REFERENCE_SCENARIOS,
+            "intent_groups": INTENT_GROUPS,
+            "negative_trigger_intents": sorted(NEGATIVE_TRIGGER_INTENTS),
+        },
+        sort_keys=True,
+    )
+    return f"{SCORING_REVISION}-{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]}"
 
 
-def classify_session(interactions):
+def classify_session(interactions, stats=None, alignment=None):
     """
     Klasificira sejo v enega od referenčnih scenarijev.
     Vrne najboljše ujemanje in confidence score.
+
+    Ocena je mešanica ujemanja razmerij (calculate_scenario_match) in
+    poravnave zaporedja triggerjev z expected_triggers (utež alignment_weight()).
     """
     if not interactions:
         return None, 0
     
     # Izračunaj statistiko seje
-    stats = calculate_session_stats(interactions)
+    stats = stats or calculate_session_stats(interactions)
+    alignment = alignment or align_scenarios(stats["triggers"])
     
     best_match = None
     best_score = 0
+    weight = _alignment_weight
     
     for scenario_id, scenario in REFERENCE_SCENARIOS.items():
         score = calculate_scenario_match(stats, scenario)
+        if scenario_id in alignment:
+            score = (1 - weight) * score + weight * alignment[scenario_id]["similarity"] * 100
         if score > best_score:
             best_score = score
             best_match = scenario_id
@@ -46,9 +102,10 @@ def calculate_session_stats(interactions):
     intents = [get_attr(i, "inferred_intent") for i in interactions]
     triggers = [get_attr(i, "trigger") for i in interactions]
     
-    # Štej kategorije
-    positive_count = sum(1 for i in intents if i in INTENT_CATEGORIES["positive"])
-    negative_count = sum(1 for i in intents if i in INTENT_CATEGORIES["negative"])
+    # Štej kategorije (core/classification.py, enako kot FSM)
+    groups = [classify_intent(intent, trigger) for intent, trigger in zip(intents, triggers)]
+    positive_count = groups.count(GROUP_POSITIVE)
+    negative_count = groups.count(GROUP_NEGATIVE)
     total = len(intents)
     
     # Escalations
@@ -194,16 +251,17 @@ def generate_functional_evaluation(interactions):
             "summary": "Seja nima interakcij.",
         }
     
+    # Statistika in poravnava z expected_triggers
+    stats = calculate_session_stats(interactions)
+    alignment = align_scenarios(stats["triggers"])
+    
     # Klasifikacija scenarija
-    scenario_id, confidence = classify_session(interactions)
+    scenario_id, confidence = classify_session(interactions, stats, alignment)
     scenario = REFERENCE_SCENARIOS.get(scenario_id, {})
     
     # FSM metrike
     fsm_metrics = evaluate_fsm_efficiency(interactions)
     
-    # Statistika
-    stats = calculate_session_stats(interactions)
-    
     # Generiraj povzetek
     summary = generate_summary(scenario_id, confidence, fsm_metrics, stats)
     
@@ -222,6 +280,10 @@ def generate_functional_evaluation(interactions):
             "total_steps": stats["total_steps"],
             "max_escalations": stats["max_escalations"],
         },
+        "sequence_alignment": {
+            sid: {**a, "similarity": round(a["similarity"] * 100)}
+            for sid, a in alignment.items()
+        },
         "summary": summary,
     }
 
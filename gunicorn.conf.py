@@ -0,0 +1,46 @@
+# gunicorn.conf.py - Nastavitve gunicorn strežnika
+
+"""
+S preload_app se app.py (pravila, blueprinti, preverjanje sheme) naloži
+enkrat v masterju, workerji pa dobijo pomnilnik prek fork-a (copy-on-write).
+"""
+
+import gc
+import os
+
+bind = "0.0.0.0:" + os.environ.get("PORT", "8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+# Vozlišče flote: en worker z več nitmi, da je register robotov en sam na vozlišče
+threads = int(os.environ.get("GUNICORN_THREADS", "1"))
+
+
+def pre_fork(server, worker):
+    # Objekte iz masterja premaknemo v trajno generacijo, da jih GC v
+    # workerjih ne obiskuje (in s tem ne kopira strani pomnilnika).
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Povezave iz masterja se ne smejo deliti med procesi
+    if preload_app:
+        from app import app
+        from db import db
+
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+        # init_app je toplo stanje obnovil ob zagonu masterja; worker, ki
+        # nastane kasneje, naloži novejši posnetek drugih workerjev
+        if os.environ.get("WARM_STATE_DIR"):
+            from helpers import warm_state
+
+            warm_state.restore_if_newer()
+
+
+def worker_exit(server, worker):
+    # Toplo stanje za naslednji worker (če je WARM_STATE_DIR nastavljen)
+    if os.environ.get("WARM_STATE_DIR"):
+        from helpers import warm_state
+
+        warm_state.save_now()
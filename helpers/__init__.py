@@ -1,20 +1,28 @@
 # helpers/__init__.py - Helpers modul
 
 from .helpers import (
+    current_session,
     get_or_create_session,
+    end_session,
     get_fsm,
     save_fsm,
     get_conversation,
     save_conversation,
+    resume_session,
+    flush_repeats,
     build_trigger_groups,
 )
 
 __all__ = [
+    "current_session",
     "get_or_create_session",
+    "end_session",
     "get_fsm",
     "save_fsm",
     "get_conversation",
     "save_conversation",
+    "resume_session",
+    "flush_repeats",
     "build_trigger_groups",
 ]
 
@@ -0,0 +1,118 @@
+# helpers/assets.py - Minificirane statične datoteke z vsebinskim hashem v imenu
+
+"""
+`flask build-assets` minificira CSS/JS iz static/, jih zapiše v static/dist
+kot <ime>.<hash>.<končnica> (+ .gz različico) in ustvari manifest.json.
+
+V predlogah uporabimo asset_url("css/main.css"), ki vrne URL do verzije
+iz manifesta (ali navaden /static/ URL, če manifesta ni). Ker se ime
+spremeni ob vsaki spremembi vsebine, lahko brskalnik datoteko hrani za
+vedno (Cache-Control: immutable) in je ne preverja ob vsakem ogledu.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from flask import url_for
+
+ASSET_DIRS = ("css", "js")
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+
+_manifest_cache = {"path": None, "mtime": None, "data": {}}
+
+
+def minify_css(source: str) -> str:
+    """Odstrani komentarje in odvečne presledke (presledki v calc() ostanejo)."""
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    source = re.sub(r"\s+", " ", source)
+    source = re.sub(r"\s*([{};,>])\s*", r"\1", source)
+    source = re.sub(r":\s+", ":", source)
+    source = source.replace(";}", "}")
+    return source.strip()
+
+
+def minify_js(source: str) -> str:
+    """
+    Konzervativna minifikacija: odstrani prazne vrstice, zamike in vrstice,
+    ki so samo komentar. Vsebina vrstic (nizi, regexi) ostane nespremenjena.
+    """
+    lines = []
+    for line in source.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("//"):
+            continue
+        lines.append(stripped)
+    return "\n".join(lines) + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def build_assets(static_folder: str) -> dict:
+    """Zgradi static/dist in vrne manifest {izvorno_ime: ime_z_hashem}."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+
+    for subdir in ASSET_DIRS:
+        src_dir = os.path.join(static_folder, subdir)
+        if not os.path.isdir(src_dir):
+            continue
+        for name in sorted(os.listdir(src_dir)):
+            stem, ext = os.path.splitext(name)
+            if ext not in MINIFIERS:
+                continue
+            with open(os.path.join(src_dir, name), "r", encoding="utf-8") as fh:
+                data = MINIFIERS[ext](fh.read()).encode("utf-8")
+
+            digest = hashlib.sha256(data).hexdigest()[:10]
+            hashed = f"{subdir}/{stem}.{digest}{ext}"
+            target = os.path.join(dist, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as fh:
+                fh.write(data)
+            # mtime=0, da je .gz deterministična (enaka vsebina -> enaki bajti)
+            with gzip.GzipFile(target + ".gz", "wb", compresslevel=9, mtime=0) as fh:
+                fh.write(data)
+            manifest[f"{subdir}/{name}"] = hashed
+
+    with open(os.path.join(dist, MANIFEST_NAME), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    _manifest_cache["mtime"] = None
+    return manifest
+
+
+def load_manifest(static_folder: str) -> dict:
+    """Prebere manifest (ponovno samo, če se je datoteka spremenila)."""
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return {}
+    cache = _manifest_cache
+    if cache["path"] != path or cache["mtime"] != mtime:
+        with open(path, "r", encoding="utf-8") as fh:
+            cache["data"] = json.load(fh)
+        cache["path"], cache["mtime"] = path, mtime
+    return cache["data"]
+
+
+def asset_url(filename: str) -> str:
+    """
+    URL statične datoteke - verzija s hashem, če obstaja, sicer navaden /static/.
+    Z ASSET_URL_BASE (CDN ali sprednji strežnik, ki streže static/dist) je URL
+    absoluten in zahtevki za datoteke ne pridejo do workerjev.
+    """
+    from flask import current_app
+
+    hashed = load_manifest(current_app.static_folder).get(filename)
+    if hashed is None:
+        return url_for("static", filename=filename)
+    base = current_app.config.get("ASSET_URL_BASE")
+    if base:
+        return f"{base.rstrip('/')}/{hashed}"
+    return url_for("assets.dist", filename=hashed)
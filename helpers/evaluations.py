@@ -0,0 +1,168 @@
+# helpers/evaluations.py - Shranjene funkcionalne evalvacije sej
+
+"""
+Funkcionalna evalvacija seje se izračuna enkrat in shrani v
+session_evaluations skupaj s podpisom točkovanja (scoring_version).
+Ob spremembi scenarijev ali točkovanja so shranjene vrednosti zastarele
+in jih osveži `flask reevaluate` ali prvi ogled seje.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select
+
+from db import db, InteractionLog, SessionEvaluation
+import evaluation
+
+# Stolpci, ki jih potrebuje evalvacija (brez polne ORM hidracije)
+EVALUATION_COLUMNS = (
+    InteractionLog.trigger,
+    InteractionLog.inferred_intent,
+    InteractionLog.state_after,
+    InteractionLog.escalation_count,
+)
+
+
+def load_evaluation_rows(session_ids, session=None) -> dict:
+    """
+    Vrne {session_id: [vrstica, ...]} v vrstnem redu korakov.
+    session: seja za branje (npr. read_session()), privzeto primarna.
+    """
+    session_ids = list(session_ids)
+    grouped = {sid: [] for sid in session_ids}
+    if not session_ids:
+        return grouped
+    stmt = (
+        select(InteractionLog.session_id, *EVALUATION_COLUMNS)
+        .where(InteractionLog.session_id.in_(session_ids))
+        .order_by(InteractionLog.session_id, InteractionLog.step_number)
+    )
+    for session_id, trigger, intent, state_after, escalation_count in (session or db.session).execute(stmt):
+        grouped[session_id].append({
+            "trigger": trigger,
+            "inferred_intent": intent,
+            "state_after": state_after,
+            "escalation_count": escalation_count,
+        })
+    return grouped
+
+
+def get_stored_evaluation(session_id: int, step_count: int = None, session=None):
+    """
+    Shranjena evalvacija, če je narejena s trenutnim točkovanjem (in, če je
+    podan step_count, nad enakim številom korakov), sicer None.
+    """
+    stmt = select(SessionEvaluation.evaluation).where(
+        SessionEvaluation.session_id == session_id,
+        SessionEvaluation.scoring_version == evaluation.scoring_version(),
+    )
+    if step_count is not None:
+        stmt = stmt.where(SessionEvaluation.step_count == step_count)
+    return (session or db.session).execute(stmt).scalar()
+
+
+def store_evaluations(results, session=None) -> int:
+    """
+    Zapiše evalvacije [(session_id, evaluation_dict), ...] v enem paketu
+    (brez commita). Obstoječe vrstice teh sej se zamenjajo z upsertom, zato
+    sočasen zapis iste seje (dva zahtevka, nit rollupov) ne krši ključa.
+    """
+    results = list(results)
+    if not results:
+        return 0
+    session = session or db.session
+    version = evaluation.scoring_version()
+    now = datetime.utcnow()
+    rows = [
+        {
+            "session_id": sid,
+            "scoring_version": version,
+            "step_count": (ev.get("session_stats") or {}).get("total_steps", 0),
+            "scenario_id": (ev.get("scenario_classification") or {}).get("id"),
+            "confidence": ev.get("confidence"),
+            "evaluation": ev,
+            "evaluated_at": now,
+        }
+        for sid, ev in results
+    ]
+    replaced = [c for c in rows[0] if c != "session_id"]
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(SessionEvaluation)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["session_id"],
+            set_={c: stmt.excluded[c] for c in replaced},
+        )
+        session.execute(stmt, rows)
+        return len(rows)
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+
+        stmt = dialect_insert(SessionEvaluation)
+        stmt = stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in replaced})
+        session.execute(stmt, rows)
+        return len(rows)
+
+    # Ostale baze: DELETE + INSERT (ni varno ob hkratnem zapisu iste seje)
+    session.execute(
+        delete(SessionEvaluation)
+        .where(SessionEvaluation.session_id.in_([row["session_id"] for row in rows]))
+        .execution_options(synchronize_session=False)
+    )
+    session.execute(insert(SessionEvaluation), rows)
+    return len(rows)
+
+
+def get_stored_evaluations(step_counts: dict, session=None) -> dict:
+    """{session_id: evaluacija} za seje {session_id: korakov}, ki imajo veljavno shranjeno evalvacijo."""
+    if not step_counts:
+        return {}
+    stmt = select(SessionEvaluation.session_id, SessionEvaluation.step_count, SessionEvaluation.evaluation).where(
+        SessionEvaluation.session_id.in_(list(step_counts)),
+        SessionEvaluation.scoring_version == evaluation.scoring_version(),
+    )
+    return {
+        sid: result
+        for sid, steps, result in (session or db.session).execute(stmt)
+        if steps == step_counts[sid]
+    }
+
+
+def get_or_compute_evaluations(rows_by_session: dict, session=None) -> dict:
+    """
+    {session_id: evaluacija} za neprazne seje {session_id: vrstice}: shranjene
+    z eno poizvedbo, manjkajoče izračuna in shrani na primarno bazo.
+    """
+    stored = get_stored_evaluations({sid: len(rows) for sid, rows in rows_by_session.items()}, session)
+    computed = [
+        (sid, evaluation.generate_functional_evaluation(rows))
+        for sid, rows in rows_by_session.items()
+        if rows and sid not in stored
+    ]
+    if computed:
+        store_evaluations(computed)
+        db.session.commit()
+    return {**stored, **dict(computed)}
+
+
+def get_or_compute_evaluation(session_id: int, rows=None, step_count: int = None, session=None) -> dict:
+    """
+    Vrne shranjeno (veljavno) evalvacijo ali jo izračuna in shrani.
+    session: seja za branje (npr. read_session()); zapis gre vedno na primarno.
+    """
+    if rows is not None:
+        step_count = len(rows)
+    stored = get_stored_evaluation(session_id, step_count, session)
+    if stored is not None:
+        return stored
+    if rows is None:
+        rows = load_evaluation_rows([session_id], session)[session_id]
+    result = evaluation.generate_functional_evaluation(rows)
+    if rows:
+        store_evaluations([(session_id, result)])
+        db.session.commit()
+    return result
@@ -0,0 +1,372 @@
+# helpers/fleet.py - Seje robotov flote: register v pomnilniku, podprt z bazo
+
+"""
+Roboti pošiljajo triggerje brez piškotkov (/api/fleet). Živ RobotFSM vsakega
+robota hrani RobotSessionRegistry v pomnilniku procesa (LRU do
+FLEET_REGISTRY_CAPACITY robotov), vir resnice pa ostaja baza: InteractionLog
+in posnetki FSM, iz katerih se stanje po izrinjenju ali ponovnem zagonu
+zgradi znova (rebuild_fsm).
+
+Da je stanje robota "vroče" samo na enem mestu, se robot deterministično
+dodeli vozlišču z rendezvous hashingom (owner_node). Tuje vozlišče robota
+zavrne in pove, kdo je lastnik. Pred vsakim zahtevkom register preveri, da
+se zadnji korak seje v bazi ujema s FSM v pomnilniku - če je sejo medtem
+spremenil drug proces (ali jo je zaprl timeout), se stanje naloži znova.
+Zaklep robota velja samo v procesu; če dva workerja hkrati zapišeta isti
+korak, unikatni indeks (session_id, step_number) zavrne drugega, ki se
+uskladi z bazo in triggerje obdela znova.
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from db import db, Robot, SessionLog, InteractionLog
+from core import RobotFSM, TriggerDebouncer
+
+from .fsm_store import rebuild_fsm, save_snapshot_if_due
+from .helpers import end_session, flush_repeats
+from .session_timeouts import touch_session
+
+ROBOT_TOKEN_BYTES = 24
+EVICT_SCAN = 16          # koliko najstarejših vnosov pregleda eno izrinjanje
+PUSH_ATTEMPTS = 3        # ponovitve ob sočasnem zapisu istega koraka v drugem procesu
+
+
+# ----- Avtentikacija -----
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def issue_token(robot_id: str) -> str:
+    """Registrira robota (ali zamenja njegov žeton) in vrne nov žeton. Commita."""
+    token = secrets.token_urlsafe(ROBOT_TOKEN_BYTES)
+    robot = db.session.get(Robot, robot_id)
+    if robot is None:
+        robot = Robot(robot_id=robot_id)
+        db.session.add(robot)
+    robot.token_hash = hash_token(token)
+    db.session.commit()
+    return token
+
+
+def verify_token(stored_hash: str, token: str) -> bool:
+    return bool(stored_hash and token) and hmac.compare_digest(stored_hash, hash_token(token))
+
+
+def authenticate(robot_id: str, token: str) -> bool:
+    if not robot_id or not token:
+        return False
+    stored = db.session.execute(select(Robot.token_hash).where(Robot.robot_id == robot_id)).scalar()
+    return verify_token(stored, token)
+
+
+# ----- Dodelitev vozlišču -----
+
+def owner_node(robot_id: str, nodes) -> str:
+    """
+    Vozlišče, ki mu pripada robot (rendezvous hashing): ob dodajanju ali
+    odstranitvi vozlišča se premaknejo samo roboti tega vozlišča.
+    """
+    def score(node):
+        digest = hashlib.blake2b(f"{node}|{robot_id}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+    return max(nodes, key=score) if nodes else None
+
+
+# ----- Register -----
+
+class RobotSession:
+    """Živo stanje enega robota; zaklep zaporedno obdela njegove zahtevke."""
+
+    __slots__ = ("robot_id", "session_id", "fsm", "debounce", "last_text", "last_speech_act", "lock")
+
+    def __init__(self, robot_id: str):
+        self.robot_id = robot_id
+        self.session_id = None
+        self.fsm = None
+        self.debounce = None
+        self.last_text = None
+        self.last_speech_act = None
+        self.lock = threading.Lock()
+
+    def state(self) -> dict:
+        fsm = self.fsm or RobotFSM()
+        return {
+            "robot_id": self.robot_id,
+            "session_id": self.session_id,
+            "current_state": fsm.state,
+            "step_count": fsm.step_count,
+            "escalation": fsm.total_escalations(),
+            "is_final": fsm.is_final(),
+            "should_suggest_end": fsm.should_suggest_end,
+            "end_reason": fsm.end_reason,
+            "robot_text": self.last_text,
+            "speech_act": self.last_speech_act,
+        }
+
+
+class RobotSessionRegistry:
+    """LRU register živih sej robotov v tem procesu."""
+
+    entry_class = RobotSession
+
+    def __init__(self, rules, debouncer: TriggerDebouncer = None, capacity: int = 10000, snapshot_interval: int = 20):
+        self.rules = rules
+        self.debouncer = debouncer
+        self.capacity = max(1, capacity)
+        self.snapshot_interval = snapshot_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._orphaned_repeats = []       # okna debouncerja izrinjenih vnosov s čakajočimi ponovitvami
+        self.hits = self.loads = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def entry(self, robot_id: str) -> RobotSession:
+        """Vnos robota (nov je prazen - stanje naloži sync)."""
+        with self._lock:
+            entry = self._entries.get(robot_id)
+            if entry is None:
+                entry = self._entries[robot_id] = self.entry_class(robot_id)
+            else:
+                self._entries.move_to_end(robot_id)
+            # Izrini najdlje neuporabljene; vnose v obdelavi preskoči
+            if len(self._entries) > self.capacity:
+                for key in list(islice(self._entries, EVICT_SCAN)):
+                    if len(self._entries) <= self.capacity:
+                        break
+                    if key != robot_id and not self._entries[key].lock.locked():
+                        evicted = self._entries.pop(key)
+                        if TriggerDebouncer.has_pending(evicted.debounce):
+                            self._orphaned_repeats.append(evicted.debounce)
+                        self.evictions += 1
+            return entry
+
+    def take_pending_repeats(self, session_ids=()) -> list:
+        """
+        Okna debouncerja s čakajočimi ponovitvami za podane seje in izrinjenih
+        vnosov - za zapis z flush_repeats (ob zapiranju sej, pred commitom).
+        """
+        wanted = set(session_ids)
+        with self._lock:
+            states, self._orphaned_repeats = self._orphaned_repeats, []
+            states += [
+                entry.debounce
+                for entry in self._entries.values()
+                if entry.session_id in wanted and not entry.lock.locked() and TriggerDebouncer.has_pending(entry.debounce)
+            ]
+        return states
+
+    def _sync(self, entry: RobotSession, create: bool = True, session=None):
+        """
+        Poskrbi, da vnos ustreza bazi, in vrne odprto SessionLog robota
+        (po potrebi novo, če create). Kliče se pod zaklepom vnosa.
+        """
+        s = session or db.session
+        session_obj = s.get(SessionLog, entry.session_id) if entry.session_id is not None else None
+        if session_obj is not None and session_obj.ended_at is None and entry.fsm is not None:
+            steps = s.execute(
+                select(func.max(InteractionLog.step_number)).where(InteractionLog.session_id == session_obj.id)
+            ).scalar() or 0
+            if steps == entry.fsm.step_count:
+                self.hits += 1
+                return session_obj
+        if session_obj is None or session_obj.ended_at is not None:
+            session_obj = s.execute(
+                select(SessionLog)
+                .where(SessionLog.robot_id == entry.robot_id, SessionLog.ended_at.is_(None))
+                .order_by(SessionLog.id.desc())
+                .limit(1)
+            ).scalar()
+
+        self.loads += 1
+        if TriggerDebouncer.has_pending(entry.debounce):
+            flush_repeats(entry.debounce, s)
+        entry.debounce = None
+        if session_obj is None:
+            entry.session_id, entry.fsm = None, RobotFSM()
+            if not create:
+                return None
+            session_obj = SessionLog(robot_id=entry.robot_id)
+            s.add(session_obj)
+            s.flush()
+        else:
+            entry.fsm = rebuild_fsm(session_obj.id, session=s) or RobotFSM()
+        entry.session_id = session_obj.id
+        return session_obj
+
+    def push(self, robot_id: str, triggers, now: float) -> dict:
+        """
+        Obdela triggerje robota po vrsti (pravilo -> FSM -> log) in commita
+        enkrat. Vrne stanje ter seznama obdelanih in združenih triggerjev.
+        """
+        entry = self.entry(robot_id)
+        with entry.lock:
+            for attempt in range(PUSH_ATTEMPTS):
+                try:
+                    return self._push(entry, triggers, now)
+                except IntegrityError:
+                    # Isti korak je medtem zapisal drug proces - _sync naloži njegovo stanje
+                    if attempt == PUSH_ATTEMPTS - 1:
+                        raise
+
+    def _push(self, entry: RobotSession, triggers, now: float, session=None) -> dict:
+        """En poskus push pod zaklepom vnosa."""
+        s = session or db.session
+        processed, coalesced, skipped = [], [], []
+        try:
+            session_obj = self._sync(entry, session=s)
+            for state in self.take_pending_repeats():
+                flush_repeats(state, s)
+            for trigger in triggers:
+                if entry.fsm.is_final():
+                    skipped.append(trigger)
+                elif self.debouncer is not None and self.debouncer.check(entry.debounce, trigger, now):
+                    coalesced.append(trigger)
+                else:
+                    self._apply(entry, session_obj, trigger, now, s)
+                    processed.append(trigger)
+            session_obj.last_activity_at = datetime.utcnow()
+            s.commit()
+        except Exception:
+            s.rollback()
+            entry.session_id = entry.fsm = entry.debounce = None      # naslednji poskus naloži iz baze
+            raise
+        if session_obj.ended_at is None:
+            touch_session(session_obj.id)
+        else:
+            self._ended(session_obj.id)
+        return {**entry.state(), "processed": processed, "coalesced": coalesced, "skipped": skipped}
+
+    def _apply(self, entry: RobotSession, session_obj: SessionLog, trigger: str, now: float, session):
+        text, intent, speech_act, priority = self.rules.response(trigger)
+        fsm = entry.fsm
+        state_before = fsm.state
+        new_state = fsm.update_state(intent, trigger=trigger)
+
+        if TriggerDebouncer.has_pending(entry.debounce):
+            flush_repeats(entry.debounce, session)
+        interaction = InteractionLog(
+            session_id=session_obj.id,
+            step_number=fsm.step_count,
+            state_before=state_before,
+            state_after=new_state,
+            trigger=trigger,
+            inferred_intent=intent,
+            robot_speech_act=speech_act,
+            robot_utterance=text,
+            priority=priority,
+            escalation_count=fsm.total_escalations(),
+        )
+        session.add(interaction)
+        session.flush()
+        if self.debouncer is not None:
+            entry.debounce = self.debouncer.accept(entry.debounce, trigger, now, interaction.id)
+        entry.last_text, entry.last_speech_act = text, speech_act
+        save_snapshot_if_due(session_obj.id, fsm, self.snapshot_interval, session=session)
+
+        if fsm.is_final():
+            self._end_session(session_obj, fsm.end_reason or "final")
+
+    def _end_session(self, session_obj: SessionLog, reason: str) -> bool:
+        """Zaključi sejo v transakciji koraka (z rollupi, kot end_session)."""
+        return end_session(session_obj, reason)
+
+    def _ended(self, session_id: int):
+        """Po commitu zaključene seje (rollupi so že v transakciji)."""
+
+    def state(self, robot_id: str) -> dict:
+        """Trenutno stanje robota (brez ustvarjanja nove seje)."""
+        entry = self.entry(robot_id)
+        with entry.lock:
+            return self._state(entry)
+
+    def _state(self, entry: RobotSession, session=None) -> dict:
+        s = session or db.session
+        self._sync(entry, create=False, session=s)
+        s.commit()
+        return entry.state()
+
+    def end(self, robot_id: str, reason: str = "forced") -> dict:
+        """Prisilno zaključi odprto sejo robota; naslednji trigger začne novo."""
+        entry = self.entry(robot_id)
+        with entry.lock:
+            return self._end(entry, reason)
+
+    def _end(self, entry: RobotSession, reason: str, session=None) -> dict:
+        s = session or db.session
+        session_obj = self._sync(entry, create=False, session=s)
+        ended = False
+        if session_obj is not None:
+            if TriggerDebouncer.has_pending(entry.debounce):
+                flush_repeats(entry.debounce, s)
+            entry.fsm.force_end()
+            ended = self._end_session(session_obj, reason)
+        s.commit()
+        if ended:
+            self._ended(session_obj.id)
+        return entry.state()
+
+    def export(self) -> list:
+        """
+        Vnosi z živo sejo v vrstnem redu LRU (za posnetek toplega stanja).
+        Vnosi v obdelavi se preskočijo.
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+        result = []
+        for entry in entries:
+            if not entry.lock.acquire(blocking=False):
+                continue
+            try:
+                if entry.session_id is not None and entry.fsm is not None:
+                    result.append({
+                        "robot_id": entry.robot_id,
+                        "session_id": entry.session_id,
+                        "fsm": entry.fsm.to_dict(),
+                        "last_text": entry.last_text,
+                        "last_speech_act": entry.last_speech_act,
+                    })
+            finally:
+                entry.lock.release()
+        return result
+
+    def restore(self, items, replace: bool = False) -> int:
+        """
+        Vnosi iz export(); obstoječi vnosi ostanejo (z replace jih zamenjajo
+        novejši iz posnetka). Ujemanje z bazo preveri _sync ob prvem zahtevku
+        robota, zato zastarel vnos ni nevaren.
+        """
+        restored = 0
+        with self._lock:
+            for item in items[-self.capacity:]:
+                if item["robot_id"] in self._entries and not replace:
+                    continue
+                entry = self.entry_class(item["robot_id"])
+                entry.session_id = item["session_id"]
+                entry.fsm = RobotFSM.from_dict(item["fsm"])
+                entry.last_text, entry.last_speech_act = item.get("last_text"), item.get("last_speech_act")
+                self._entries[entry.robot_id] = entry
+                restored += 1
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return restored
+
+    def metrics(self) -> dict:
+        return {
+            "robots": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
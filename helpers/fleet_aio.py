@@ -0,0 +1,103 @@
+# helpers/fleet_aio.py - Asinhroni register sej robotov (ASGI način)
+
+"""
+Enaka pravila kot RobotSessionRegistry (helpers/fleet.py), le da čakanje na
+bazo ne zasede niti: zahtevki robotov v enem procesu se prepletajo na zanki
+dogodkov, zaklep robota je asyncio.Lock.
+
+- Korak (_sync, _push, _apply, _state, _end) je en sam, v RobotSessionRegistry;
+  tu teče prek AsyncSession.run_sync - poizvedbe čakajo na zanki, korak FSM
+  pa teče neposredno v njej (je kratek).
+- Ob zaključku seje se ended_at/end_reason zapišeta v isti transakciji kot
+  zadnji korak (_end_session); rollupi in evalvacija seje (CPU) pa tečejo v
+  bazenu niti (_ended: record_session_ends z aplikacijskim kontekstom). Če proces vmes pade,
+  rollupe popravi `flask rebuild-rollups`.
+"""
+
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from core import TriggerDebouncer
+from db import db, Robot, SessionLog
+
+from .fleet import PUSH_ATTEMPTS, RobotSession, RobotSessionRegistry, verify_token
+from .rollups import record_session_ends
+from .session_timeouts import forget_session
+
+
+class AsyncRobotSession(RobotSession):
+    """Vnos robota z asyncio zaklepom (locked() kot pri threading.Lock)."""
+
+    __slots__ = ()
+
+    def __init__(self, robot_id: str):
+        super().__init__(robot_id)
+        self.lock = asyncio.Lock()
+
+
+async def authenticate(s, robot_id: str, token: str) -> bool:
+    if not robot_id or not token:
+        return False
+    stored = (await s.execute(select(Robot.token_hash).where(Robot.robot_id == robot_id))).scalar()
+    return verify_token(stored, token)
+
+
+class AsyncRobotSessionRegistry(RobotSessionRegistry):
+    """LRU register z asinhronim dostopom do baze; metode prejmejo AsyncSession."""
+
+    entry_class = AsyncRobotSession
+
+    def __init__(self, app, rules, debouncer: TriggerDebouncer = None, capacity: int = 10000,
+                 snapshot_interval: int = 20, executor=None):
+        super().__init__(rules, debouncer, capacity, snapshot_interval)
+        self.app = app
+        self.executor = executor
+        self._background = set()
+
+    async def push(self, s, robot_id: str, triggers, now: float) -> dict:
+        """Kot RobotSessionRegistry.push (ponovi ob sočasnem zapisu istega koraka)."""
+        entry = self.entry(robot_id)
+        async with entry.lock:
+            for attempt in range(PUSH_ATTEMPTS):
+                try:
+                    return await s.run_sync(lambda sync: self._push(entry, triggers, now, sync))
+                except IntegrityError:
+                    if attempt == PUSH_ATTEMPTS - 1:
+                        raise
+
+    async def state(self, s, robot_id: str) -> dict:
+        entry = self.entry(robot_id)
+        async with entry.lock:
+            return await s.run_sync(lambda sync: self._state(entry, sync))
+
+    async def end(self, s, robot_id: str, reason: str = "forced") -> dict:
+        entry = self.entry(robot_id)
+        async with entry.lock:
+            return await s.run_sync(lambda sync: self._end(entry, reason, sync))
+
+    def _end_session(self, session_obj: SessionLog, reason: str) -> bool:
+        """Kot end_session, brez rollupov (te doda _ended po commitu)."""
+        if session_obj.ended_at is not None:
+            return False
+        session_obj.ended_at = datetime.utcnow()
+        session_obj.end_reason = reason
+        forget_session(session_obj.id)
+        return True
+
+    def _ended(self, session_id: int):
+        """Rollupi in evalvacija zaključene seje v bazenu niti (ne blokira zanke)."""
+        def record():
+            with self.app.app_context():
+                try:
+                    record_session_ends([session_id])
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Napaka pri rollupih seje %s", session_id)
+
+        task = asyncio.get_running_loop().run_in_executor(self.executor, record)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
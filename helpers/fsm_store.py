@@ -0,0 +1,124 @@
+# helpers/fsm_store.py - FSM iz InteractionLog (event sourcing) in posnetki
+
+"""
+Stanje FSM živi v piškotku, vir resnice pa je InteractionLog. Vsakih
+FSM_SNAPSHOT_INTERVAL korakov shranimo posnetek to_dict(), zato
+rekonstrukcija predvaja samo vrstice po zadnjem posnetku.
+"""
+
+from sqlalchemy import select
+
+from db import db, SessionLog, InteractionLog, FSMSnapshot
+from core import RobotFSM, replay, check_consistency
+
+# Stolpci, ki jih potrebuje predvajanje (brez polne ORM hidracije)
+REPLAY_COLUMNS = (
+    InteractionLog.step_number,
+    InteractionLog.trigger,
+    InteractionLog.inferred_intent,
+    InteractionLog.state_before,
+    InteractionLog.state_after,
+    InteractionLog.escalation_count,
+)
+
+
+def load_replay_rows(session_id: int, after_step: int = 0, session=None):
+    """Vrne zabeležene korake seje (po after_step) v vrstnem redu."""
+    stmt = (
+        select(*REPLAY_COLUMNS)
+        .where(InteractionLog.session_id == session_id, InteractionLog.step_number > after_step)
+        .order_by(InteractionLog.step_number)
+    )
+    return [row._asdict() for row in (session or db.session).execute(stmt)]
+
+
+def latest_snapshot(session_id: int, session=None):
+    stmt = (
+        select(FSMSnapshot)
+        .where(FSMSnapshot.session_id == session_id)
+        .order_by(FSMSnapshot.step_number.desc())
+        .limit(1)
+    )
+    return (session or db.session).execute(stmt).scalar()
+
+
+def save_snapshot_if_due(session_id: int, fsm: RobotFSM, interval: int, session=None) -> bool:
+    """Doda posnetek v trenutno transakcijo, če je step_count večkratnik intervala."""
+    if interval <= 0 or fsm.step_count == 0 or fsm.step_count % interval != 0:
+        return False
+    (session or db.session).add(FSMSnapshot(session_id=session_id, step_number=fsm.step_count, state=fsm.to_dict()))
+    return True
+
+
+def rebuild_fsm(session_id: int, use_snapshots: bool = True, session=None) -> RobotFSM:
+    """
+    Zgradi RobotFSM seje iz zadnjega posnetka in preostalih vrstic loga.
+    Vrne None, če seja ne obstaja. session: privzeto primarna (db.session).
+    """
+    session = session or db.session
+    session_obj = session.get(SessionLog, session_id)
+    if session_obj is None:
+        return None
+
+    fsm = RobotFSM()
+    after_step = 0
+    if use_snapshots:
+        snapshot = latest_snapshot(session_id, session)
+        if snapshot is not None:
+            fsm = RobotFSM.from_dict(snapshot.state)
+            after_step = snapshot.step_number
+
+    replay(load_replay_rows(session_id, after_step, session), fsm)
+
+    # Prisilni zaključek po zadnjem koraku ni zabeležen kot interakcija
+    if session_obj.end_reason == "forced" and not fsm.is_final():
+        fsm.force_end()
+    return fsm
+
+
+def rebuild_conversation(session_id: int, greeting: dict, limit: int = 20) -> list:
+    """Zadnjih `limit` sporočil pogovora, sestavljenih iz loga (za piškotek)."""
+    stmt = (
+        select(InteractionLog.trigger, InteractionLog.robot_utterance)
+        .where(InteractionLog.session_id == session_id)
+        .order_by(InteractionLog.step_number.desc())
+        .limit(max(1, limit // 2))
+    )
+    rows = list(db.session.execute(stmt))[::-1]
+    conv = [greeting]
+    for trigger, utterance in rows:
+        conv.append({"sender": "user", "text": f"[Trigger] {trigger}"})
+        conv.append({"sender": "robot", "text": utterance})
+    return conv
+
+
+def check_session_consistency(session_id: int) -> dict:
+    """
+    Predvaja celotno sejo od začetka in jo primerja z zabeleženimi
+    state_before/state_after/escalation_count ter s shranjenimi posnetki.
+    """
+    rows = load_replay_rows(session_id)
+    snapshots = {
+        s.step_number: s.state
+        for s in db.session.execute(
+            select(FSMSnapshot).where(FSMSnapshot.session_id == session_id)
+        ).scalars()
+    }
+
+    fsm = RobotFSM()
+    mismatched = []
+    report = check_consistency(_snapshot_probe(rows, fsm, snapshots, mismatched), fsm)
+    report["snapshots_checked"] = len(snapshots)
+    report["snapshot_mismatches"] = mismatched
+    report["consistent"] = report["consistent"] and not mismatched
+    return report
+
+
+def _snapshot_probe(rows, fsm, snapshots, mismatched):
+    """Med predvajanjem primerja FSM s posnetkom po pripadajočem koraku."""
+    for row in rows:
+        yield row
+        # generator se nadaljuje šele, ko je FSM že obdelal vrstico
+        expected = snapshots.get(row["step_number"])
+        if expected is not None and expected != fsm.to_dict():
+            mismatched.append(row["step_number"])
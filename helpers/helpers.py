@@ -1,19 +1,53 @@
 # helpers/helpers.py - Pomožne funkcije za upravljanje seje, FSM in pogovora
 
+from datetime import datetime
+
 from flask import session as flask_session
-from db import db, SessionLog
-from core import RobotFSM
+from sqlalchemy import update
 
+from db import db, SessionLog, InteractionLog
+from core import RobotFSM, TriggerDebouncer
 
-def get_or_create_session():
+from .session_timeouts import touch_session, forget_session
+from .fsm_store import rebuild_fsm, rebuild_conversation
+from .rollups import record_session_ends
+
+GREETING_MESSAGE = {
+    "sender": "robot",
+    "text": "Pozdravljeni! Sem robot za kognitivni trening. "
+            "Začniva – izberi trigger na desni strani.",
+}
+
+
+# Stanje seje v piškotku (brez ocen, ki se lahko oddajo po koncu seje)
+SESSION_COOKIE_KEYS = ("session_id", "fsm_state", "conversation", "debounce")
+
+
+def current_session():
     """
-    Poskrbi, da imamo SessionLog v bazi in ID v Flask sessionu.
+    Odprta SessionLog iz piškotka ali None. Če je bila seja medtem zaključena
+    (timeout, konec FSM), se stanje piškotka počisti - naslednji trigger
+    začne novo sejo z novim FSM in pogovorom.
     """
     sid = flask_session.get("session_id")
-    if sid is not None:
-        session_obj = SessionLog.query.get(sid)
-        if session_obj:
-            return session_obj
+    if sid is None:
+        return None
+    session_obj = db.session.get(SessionLog, sid)
+    if session_obj is not None and session_obj.ended_at is None:
+        touch_session(session_obj.id)
+        return session_obj
+    for key in SESSION_COOKIE_KEYS:
+        flask_session.pop(key, None)
+    return None
+
+
+def get_or_create_session():
+    """
+    Poskrbi, da imamo odprto SessionLog v bazi in ID v Flask sessionu.
+    """
+    session_obj = current_session()
+    if session_obj is not None:
+        return session_obj
 
     # nova seja
     session_obj = SessionLog()
@@ -21,12 +55,34 @@ def get_or_create_session():
     db.session.commit()
 
     flask_session["session_id"] = session_obj.id
+    touch_session(session_obj.id)
     return session_obj
 
 
+def end_session(session_obj: SessionLog, reason: str):
+    """
+    Označi konec seje (brez commita). Nič ne naredi, če je seja že zaključena.
+    """
+    if session_obj.ended_at is not None:
+        return False
+    session_obj.ended_at = datetime.utcnow()
+    session_obj.end_reason = reason
+    forget_session(session_obj.id)
+    # Evalvacija za scenarij v rollupih teče po commitu v ozadju, ne v zahtevku
+    record_session_ends([session_obj.id], defer_scenarios=True)
+    return True
+
+
 def get_fsm():
-    """Vrne FSM iz seje."""
+    """
+    Vrne FSM iz seje. Če piškotek nima stanja, seja pa obstaja v bazi,
+    FSM rekonstruiramo iz InteractionLog.
+    """
     data = flask_session.get("fsm_state")
+    if data is None and flask_session.get("session_id") is not None:
+        fsm = rebuild_fsm(flask_session["session_id"])
+        if fsm is not None:
+            return fsm
     return RobotFSM.from_dict(data)
 
 
@@ -40,17 +96,48 @@ def get_conversation():
     conv = flask_session.get("conversation")
     if conv is None:
         # začetno sporočilo robota
-        conv = [
-            {
-                "sender": "robot",
-                "text": "Pozdravljeni! Sem robot za kognitivni trening. "
-                        "Začniva – izberi trigger na desni strani.",
-            }
-        ]
+        conv = [dict(GREETING_MESSAGE)]
         flask_session["conversation"] = conv
     return conv
 
 
+def resume_session(session_id: int) -> bool:
+    """
+    Prevzame obstoječo sejo (npr. z druge naprave): FSM in pogovor se
+    zgradita iz loga in zapišeta v piškotek.
+    """
+    fsm = rebuild_fsm(session_id)
+    if fsm is None:
+        return False
+    flask_session.clear()
+    flask_session["session_id"] = session_id
+    save_fsm(fsm)
+    flask_session["conversation"] = rebuild_conversation(session_id, dict(GREETING_MESSAGE))
+    touch_session(session_id)
+    return True
+
+
+def flush_repeats(state: dict = None, session=None):
+    """
+    Zapiše združene ponovitve (debounce) v repeat_count dogodkov - en
+    UPDATE na okno s čakajočimi ponovitvami, ne na ponovitev. Brez commita.
+    Brez state se uporabi stanje iz Flask seje.
+    """
+    in_cookie = state is None
+    if in_cookie:
+        state = flask_session.get("debounce")
+    pending = [w for w in TriggerDebouncer.open_windows(state).values() if w.get("pending")]
+    for window in pending:
+        (session or db.session).execute(
+            update(InteractionLog)
+            .where(InteractionLog.id == window["interaction_id"])
+            .values(repeat_count=InteractionLog.repeat_count + window["pending"])
+        )
+        window["pending"] = 0
+    if in_cookie and pending:
+        flask_session["debounce"] = state
+
+
 def save_conversation(conv):
     """Shrani pogovor v sejo."""
     flask_session["conversation"] = conv
@@ -61,46 +148,10 @@ def build_trigger_groups(rules):
     Gumbe razdelimo na pozitivne / nevtralne / negativne / feedback
     na podlagi Inferred Intent iz pravil.
     
-    Grupiranje:
+    Grupiranje (core/classification.py):
     - Pozitivni: Positive affect
-    - Nevtralni: Attention shift, Request to speak/help (razen error)
+    - Nevtralni: Attention shift, Request to speak/help (razen error), neznani intenti
     - Negativni: User frustrated/overloaded, Disengagement risk, User confused/waiting, error
     - Feedback: Provide action / speech feedback
     """
-    positive = []
-    neutral = []
-    negative = []
-    feedback = []
-    
-    # Mapiranje intentov na skupine
-    POSITIVE_INTENTS = {"Positive affect"}
-    NEUTRAL_INTENTS = {"Attention shift", "Request to speak/help"}
-    NEGATIVE_INTENTS = {"User frustrated / overloaded", "Disengagement risk", "User confused / waiting"}
-    FEEDBACK_INTENT = "Provide action / speech feedback"
-
-    for rule in rules.rules:
-        trigger = rule["Trigger"]
-        intent = rule.get("Inferred Intent", "")
-        
-        # Posebni primer: "error" trigger je negativen, čeprav ima Request to speak/help intent
-        if trigger == "error":
-            negative.append(trigger)
-        elif intent == FEEDBACK_INTENT:
-            feedback.append(trigger)
-        elif intent in POSITIVE_INTENTS:
-            positive.append(trigger)
-        elif intent in NEGATIVE_INTENTS:
-            negative.append(trigger)
-        elif intent in NEUTRAL_INTENTS:
-            neutral.append(trigger)
-        else:
-            # Neznani intenti gredo v nevtralne
-            neutral.append(trigger)
-
-    return {
-        "positive": sorted(positive),
-        "neutral": sorted(neutral),
-        "negative": sorted(negative),
-        "feedback": sorted(feedback),
-    }
-
+    return rules.index.groups()
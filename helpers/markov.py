@@ -0,0 +1,444 @@
+# helpers/markov.py - Empirični Markov model prehodov iz InteractionLog
+
+"""
+Dva modela, oba kot NumPy matrika števcev prehodov (n x n) in vektor
+začetkov (n):
+- "states":   state_before -> state_after (stanja iz STATE_INFO),
+- "triggers": trigger -> naslednji trigger v isti seji (kode iz TriggerIndex,
+              0 = neznan trigger).
+Poleg njiju še pravokotna matrika "state_triggers" (stanje x trigger):
+porazdelitev triggerjev po stanju za core/outcomes.py in simulate-sessions.
+
+Števci so shranjeni v markov_counts skupaj z vodnim žigom (največji
+upoštevan InteractionLog.id). refresh_models() prebere samo novejše vrstice
+in jih prišteje; kliče jo ozadinska nit procesa vsakih
+MARKOV_REFRESH_SECONDS (ali `flask refresh-markov`), API pa samo bere
+shranjene števce (load_models). Če se seznam triggerjev spremeni, se model
+"triggers" zgradi na novo.
+
+Vrstica iz transakcije, ki se potrdi za novejšo (večji id že prebran),
+pusti vrzel pod vodnim žigom. Manjkajoči id-ji zadnjih GAP_WINDOW se
+shranijo in ob vsaki posodobitvi preverijo znova. Starejše vrzeli se
+opustijo - `flask rebuild-markov` vse prešteje na novo.
+"""
+
+import io
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import and_, delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from core import STATE_INFO
+from core.fsm import S4_FEEDBACK
+from db import db, InteractionLog, MarkovCounts
+
+STATE_MODEL = "states"
+TRIGGER_MODEL = "triggers"
+STATE_TRIGGER_MODEL = "state_triggers"
+UNKNOWN_TRIGGER = "Unknown"
+
+STATE_LABELS = list(STATE_INFO)
+
+# Koliko id-jev pod vodnim žigom se spremlja kot možne vrzeli
+GAP_WINDOW = 10000
+GAP_QUERY_CHUNK = 500
+
+
+class TransitionModel:
+    """
+    Števci prehodov in začetkov z izpeljanimi verjetnostmi. labels so oznake
+    vrstic in stolpcev ali [vrstice, stolpci] za pravokotno matriko.
+    """
+
+    def __init__(self, name: str, labels, counts=None, starts=None, watermark: int = 0, gaps=()):
+        self.name = name
+        rectangular = bool(labels) and isinstance(labels[0], list)
+        self.labels = list(labels[0] if rectangular else labels)
+        self.columns = list(labels[1]) if rectangular else self.labels
+        shape = (len(self.labels), len(self.columns))
+        self.counts = counts if counts is not None else np.zeros(shape, dtype=np.int64)
+        self.starts = starts if starts is not None else np.zeros(shape[1], dtype=np.int64)
+        self.watermark = watermark
+        self.gaps = sorted(gaps)          # manjkajoči id-ji <= watermark (morda še nepotrjeni)
+
+    @property
+    def layout(self) -> list:
+        """Oznake, kot se shranijo (in primerjajo) v markov_counts.labels."""
+        return self.labels if self.columns is self.labels else [self.labels, self.columns]
+
+    def copy(self) -> "TransitionModel":
+        return TransitionModel(self.name, self.layout, self.counts.copy(), self.starts.copy(), self.watermark, self.gaps)
+
+    # ----- Posodabljanje -----
+
+    def add(self, sources, targets, starts):
+        """Prišteje prehode (polji kod enake dolžine) in začetke sej."""
+        rows, columns = self.counts.shape
+        if len(sources):
+            flat = np.asarray(sources, dtype=np.int64) * columns + np.asarray(targets, dtype=np.int64)
+            self.counts += np.bincount(flat, minlength=rows * columns).reshape(rows, columns)
+        if len(starts):
+            self.starts += np.bincount(np.asarray(starts, dtype=np.int64), minlength=columns)
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.save(buffer, np.vstack([self.counts, self.starts]), allow_pickle=False)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_row(cls, row: MarkovCounts):
+        data = np.load(io.BytesIO(row.counts), allow_pickle=False)
+        return cls(row.name, row.labels, data[:-1].copy(), data[-1].copy(), row.watermark, row.gaps or ())
+
+    # ----- Izračuni -----
+
+    @property
+    def observations(self) -> int:
+        return int(self.counts.sum())
+
+    def probabilities(self) -> np.ndarray:
+        """Matrika prehodnih verjetnosti (vrstice brez podatkov so ničelne)."""
+        totals = self.counts.sum(axis=1, keepdims=True)
+        return np.divide(self.counts, totals, out=np.zeros(self.counts.shape), where=totals > 0)
+
+    def start_distribution(self) -> np.ndarray:
+        total = self.starts.sum()
+        n = len(self.labels)
+        return self.starts / total if total else np.full(n, 1.0 / n)
+
+    def expected_steps(self, target: int) -> np.ndarray:
+        """
+        Pričakovano število korakov do stanja target iz vsakega stanja
+        (fundamentalna matrika absorbirajoče verige, (I - Q) t = 1).
+        Kjer target ni dosežen z verjetnostjo 1, je rezultat inf.
+        """
+        n = len(self.labels)
+        P = self.probabilities()
+        edges = self.counts > 0
+
+        # Stanja, iz katerih vse poti (z verjetnostjo 1) vodijo v target
+        good = np.zeros(n, dtype=bool)
+        good[target] = True
+        while True:                       # dosegljivost nazaj od targeta
+            grown = good | edges[:, good].any(axis=1)
+            if (grown == good).all():
+                break
+            good = grown
+        while True:                       # odstrani stanja s prehodi ven iz množice
+            kept = good & ~edges[:, ~good].any(axis=1)
+            kept[target] = True
+            if (kept == good).all():
+                break
+            good = kept
+
+        result = np.full(n, np.inf)
+        result[target] = 0.0
+        transient = good.copy()
+        transient[target] = False
+        if transient.any():
+            Q = P[np.ix_(transient, transient)]
+            result[transient] = np.linalg.solve(np.eye(len(Q)) - Q, np.ones(len(Q)))
+        return result
+
+    def expected_dwell(self) -> np.ndarray:
+        """Pričakovano število zaporednih korakov v stanju: 1 / (1 - p_ii)."""
+        stay = np.diag(self.probabilities())
+        has_data = self.counts.sum(axis=1) > 0
+        with np.errstate(divide="ignore"):
+            dwell = 1.0 / (1.0 - stay)
+        return np.where(has_data, dwell, np.nan)
+
+    def stationary(self, restart_from=()) -> np.ndarray:
+        """
+        Stacionarna porazdelitev obnovitvene verige: iz stanj brez podatkov
+        in iz restart_from (npr. zaključek) se začne nova seja po
+        porazdelitvi začetkov. Rešitev pi (P - I) = 0, sum(pi) = 1.
+        """
+        n = len(self.labels)
+        P = self.probabilities()
+        restart = self.counts.sum(axis=1) == 0
+        restart[list(restart_from)] = True
+        P[restart] = self.start_distribution()
+
+        A = np.vstack([P.T - np.eye(n), np.ones(n)])
+        b = np.zeros(n + 1)
+        b[-1] = 1.0
+        pi = np.linalg.lstsq(A, b, rcond=None)[0]
+        pi = np.clip(pi, 0.0, None)
+        return pi / pi.sum() if pi.sum() > 0 else pi
+
+
+def trigger_labels(index) -> list:
+    """Oznake modela triggerjev: koda 0 je neznan trigger, nato triggerji indeksa."""
+    return [UNKNOWN_TRIGGER, *index.triggers]
+
+
+# ----- Shranjevanje in inkrementalno posodabljanje -----
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _stored_models(labels: dict) -> dict:
+    """Modeli iz predpomnilnika procesa ali baze; manjkajoči/neskladni so prazni."""
+    stored = dict(db.session.execute(select(MarkovCounts.name, MarkovCounts.watermark)).all())
+    models = {}
+    for name, name_labels in labels.items():
+        cached = _cache.get(name)
+        if cached is not None and cached.layout == name_labels and cached.watermark >= stored.get(name, 0):
+            models[name] = cached
+            continue
+        row = db.session.get(MarkovCounts, name) if name in stored else None
+        if row is not None and row.labels == name_labels:
+            models[name] = TransitionModel.from_row(row)
+        else:
+            models[name] = TransitionModel(name, name_labels)
+    return models
+
+
+def _count(models: dict, index, rows, pending) -> np.ndarray:
+    """
+    Prišteje vrstice (id, korak, stanje pred/po, trigger, prejšnji trigger)
+    modelom; pending(model, ids) vrne masko vrstic, ki jih model še nima.
+    """
+    state_codes = {state: k for k, state in enumerate(STATE_LABELS)}
+    states, triggers = models[STATE_MODEL], models[TRIGGER_MODEL]
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    first = np.fromiter((r[1] == 1 for r in rows), dtype=bool, count=len(rows))
+
+    # Stanja (neznana stanja se preskočijo)
+    before = np.fromiter((state_codes.get(r[2], -1) for r in rows), dtype=np.int64, count=len(rows))
+    after = np.fromiter((state_codes.get(r[3], -1) for r in rows), dtype=np.int64, count=len(rows))
+    new = pending(states, ids) & (before >= 0) & (after >= 0)
+    states.add(before[new], after[new], before[new & first])
+
+    # Triggerji: prehod iz prejšnjega triggerja seje; prvi korak je začetek
+    code = index.code
+    current = np.fromiter((code(r[4]) for r in rows), dtype=np.int64, count=len(rows))
+    prior = np.fromiter((code(r[5]) if r[5] is not None else -1 for r in rows), dtype=np.int64, count=len(rows))
+    new = pending(triggers, ids)
+    pairs = new & (prior >= 0)
+    triggers.add(prior[pairs], current[pairs], current[new & first])
+
+    # Trigger glede na stanje pred njim
+    by_state = models[STATE_TRIGGER_MODEL]
+    new = pending(by_state, ids) & (before >= 0)
+    by_state.add(before[new], current[new], ())
+    return ids
+
+
+def _fold(models: dict, index, after_id: int, chunk_size: int) -> int:
+    """
+    Prišteje vsakemu modelu vrstice iz njegovih vrzeli in vrstice z id >
+    after_id, ki jih še nima, ter posodobi vrzeli. Vrne novi vodni žig.
+    """
+    previous = aliased(InteractionLog)
+    query = (
+        select(
+            InteractionLog.id,
+            InteractionLog.step_number,
+            InteractionLog.state_before,
+            InteractionLog.state_after,
+            InteractionLog.trigger,
+            previous.trigger,
+        )
+        .outerjoin(previous, and_(
+            previous.session_id == InteractionLog.session_id,
+            previous.step_number == InteractionLog.step_number - 1,
+        ))
+    )
+
+    # 1) Vrzeli pod vodnimi žigi - vrstice, ki so se medtem potrdile
+    gaps = sorted(set().union(*(m.gaps for m in models.values())))
+    found = set()
+    for start in range(0, len(gaps), GAP_QUERY_CHUNK):
+        rows = db.session.execute(query.where(InteractionLog.id.in_(gaps[start:start + GAP_QUERY_CHUNK]))).all()
+        if rows:
+            found.update(_count(models, index, rows, lambda m, ids: np.isin(ids, m.gaps)).tolist())
+
+    # 2) Nove vrstice; zadnjih GAP_WINDOW prebranih id-jev za iskanje vrzeli
+    last_id = after_id
+    tail = np.zeros(0, dtype=np.int64)
+    while True:
+        rows = db.session.execute(
+            query.where(InteractionLog.id > last_id).order_by(InteractionLog.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        ids = _count(models, index, rows, lambda m, ids: ids > m.watermark)
+        last_id = int(ids[-1])
+        tail = np.concatenate([tail, ids])
+        tail = tail[tail > last_id - GAP_WINDOW]
+
+    # 3) Nove vrzeli: neprebrani id-ji v oknu pod novim vodnim žigom
+    top = max(last_id, *(m.watermark for m in models.values()))
+    low = top - GAP_WINDOW
+    for model in models.values():
+        start = max(model.watermark, low)
+        missing = np.setdiff1d(np.arange(start + 1, last_id + 1), tail) if last_id > start else ()
+        kept = {g for g in model.gaps if g > low and g not in found}
+        model.gaps = sorted(kept.union(int(g) for g in missing))
+    return top
+
+
+def _model_labels(index) -> dict:
+    triggers = trigger_labels(index)
+    return {STATE_MODEL: STATE_LABELS, TRIGGER_MODEL: triggers, STATE_TRIGGER_MODEL: [STATE_LABELS, triggers]}
+
+
+def load_models(index) -> dict:
+    """Zadnji shranjeni modeli (brez branja loga) - za odgovore API."""
+    with _cache_lock:
+        models = _stored_models(_model_labels(index))
+        _cache.update(models)
+        return models
+
+
+def refresh_models(index, chunk_size: int = 50000) -> dict:
+    """
+    Vrne posodobljene modele (states, triggers, state_triggers). Prebere samo
+    interakcije novejše od vodnega žiga (in vrzeli) ter ob spremembi shrani
+    števce (s commitom).
+    """
+    with _cache_lock:
+        # Na kopijah - predpomnjene modele medtem berejo zahtevki
+        models = {name: model.copy() for name, model in _stored_models(_model_labels(index)).items()}
+        before = {name: (m.watermark, m.gaps) for name, m in models.items()}
+        after_id = min(m.watermark for m in models.values())
+        watermark = _fold(models, index, after_id, chunk_size)
+
+        for model in models.values():
+            model.watermark = max(model.watermark, watermark)
+        changed = [m for name, m in models.items() if (m.watermark, m.gaps) != before[name]]
+        if changed:
+            _save(changed)
+        _cache.update(models)
+        return models
+
+
+def _save(models):
+    now = datetime.utcnow()
+    try:
+        for model in models:
+            row = db.session.get(MarkovCounts, model.name)
+            if row is None:
+                row = MarkovCounts(name=model.name)
+                db.session.add(row)
+            elif row.watermark > model.watermark:
+                continue                      # drug worker je že shranil novejše števce
+            row.labels = model.layout
+            row.counts = model.to_bytes()
+            row.watermark = model.watermark
+            row.gaps = model.gaps
+            row.updated_at = now
+        db.session.commit()
+    except IntegrityError:
+        # Prvo vrstico modela je hkrati vstavil drug worker - naslednja posodobitev jo prepiše
+        db.session.rollback()
+
+
+def cached_models() -> dict:
+    """Kopije modelov v predpomnilniku procesa (za posnetek toplega stanja)."""
+    with _cache_lock:
+        return {name: model.copy() for name, model in _cache.items()}
+
+
+def install_models(models: dict):
+    """Napolni predpomnilnik z modeli iz posnetka (novejši obstoječi ostanejo)."""
+    with _cache_lock:
+        for name, model in models.items():
+            cached = _cache.get(name)
+            if cached is None or cached.watermark < model.watermark:
+                _cache[name] = model
+
+
+def rebuild_models(index, chunk_size: int = 50000) -> dict:
+    """Izbriše shranjene števce in jih prešteje iz celotnega loga."""
+    with _cache_lock:
+        _cache.clear()
+    db.session.execute(delete(MarkovCounts))
+    db.session.commit()
+    return refresh_models(index, chunk_size)
+
+
+# ----- Ozadinska nit (ena na proces) -----
+
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def ensure_worker_started(app, rules):
+    """Zažene nit, ki vsakih MARKOV_REFRESH_SECONDS prišteje nove interakcije (kot pri session_timeouts)."""
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+        thread = threading.Thread(target=_run_worker, args=(app, rules), name="markov-refresh", daemon=True)
+        thread.start()
+
+
+def _run_worker(app, rules):
+    interval = app.config["MARKOV_REFRESH_SECONDS"]
+    while True:
+        with app.app_context():
+            try:
+                refresh_models(rules.index)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Napaka pri posodabljanju Markov modela")
+        time.sleep(interval)
+
+
+# ----- Triggerji po stanjih (model uporabnika za core/outcomes.py) -----
+
+def state_trigger_probabilities(models: dict) -> dict:
+    """
+    Empirična porazdelitev triggerjev po stanju: {state_before: {trigger: p}}
+    ter pod ključem None porazdelitev čez vsa stanja (za stanja brez podatkov).
+    models: iz load_models() ali refresh_models().
+    """
+    model = models[STATE_TRIGGER_MODEL]
+    rows = [*zip(model.labels, model.counts), (None, model.counts.sum(axis=0))]
+    return {
+        state: {trigger: n / total for trigger, n in zip(model.columns, counts.tolist()) if n}
+        for state, counts in rows
+        if (total := int(counts.sum()))
+    }
+
+
+# ----- Odgovori API -----
+
+def _clean(values, digits: int = 4):
+    """NumPy -> seznam za JSON (inf/nan -> None)."""
+    return [round(float(v), digits) if np.isfinite(v) else None for v in values]
+
+
+def state_model_summary(model: TransitionModel) -> dict:
+    target = STATE_LABELS.index(S4_FEEDBACK)
+    return {
+        "labels": model.labels,
+        "observations": model.observations,
+        "watermark": model.watermark,
+        "probabilities": [_clean(row) for row in model.probabilities()],
+        "expected_steps_to_feedback": dict(zip(model.labels, _clean(model.expected_steps(target), 2))),
+        "expected_dwell": dict(zip(model.labels, _clean(model.expected_dwell(), 2))),
+        "stationary": dict(zip(model.labels, _clean(model.stationary(restart_from=[target])))),
+    }
+
+
+def trigger_model_summary(model: TransitionModel) -> dict:
+    return {
+        "labels": model.labels,
+        "observations": model.observations,
+        "watermark": model.watermark,
+        "probabilities": [_clean(row) for row in model.probabilities()],
+        "stationary": dict(zip(model.labels, _clean(model.stationary()))),
+    }
@@ -0,0 +1,155 @@
+# helpers/responses.py - Hitra JSON serializacija in stiskanje odgovorov
+
+"""
+json_response() nadomešča jsonify za velike odgovore:
+- uporabi orjson, če je nameščen, sicer standardni json (kompaktno, UTF-8),
+- datetime vrednosti serializira sam (ni potrebe po isoformat() na vrstico),
+- vrednosti tipa Fragment (vnaprej serializiran JSON, npr. info o stanjih
+  ali metapodatki scenarijev) vstavi neposredno, brez ponovnega kodiranja.
+
+init_compression() doda after_request, ki JSON/HTML odgovore nad pragom
+stisne z gzip ali deflate glede na Accept-Encoding.
+"""
+
+import gzip
+import json
+import zlib
+from datetime import date, datetime
+
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - odvisno od okolja
+    orjson = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/html", "text/plain"}
+
+
+class Fragment:
+    """Vnaprej serializiran JSON (bytes), ki se vstavi kot vrednost na vrhnjem nivoju."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+_stdlib_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_default)
+
+
+def _dumps_stdlib(obj) -> bytes:
+    return _stdlib_encoder.encode(obj).encode("utf-8")
+
+
+def _dumps_orjson(obj) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dumps(obj, encoder: str = "auto") -> bytes:
+    """
+    Serializira obj v JSON bytes. Fragmenti so podprti kot vrednosti
+    slovarja na vrhnjem nivoju.
+    """
+    encode = _dumps_orjson if (orjson is not None and encoder != "stdlib") else _dumps_stdlib
+    if isinstance(obj, dict) and any(isinstance(v, Fragment) for v in obj.values()):
+        parts = []
+        for key, value in obj.items():
+            data = value.data if isinstance(value, Fragment) else encode(value)
+            parts.append(encode(str(key)) + b":" + data)
+        return b"{" + b",".join(parts) + b"}"
+    return encode(obj)
+
+
+def fragment(obj) -> Fragment:
+    """Serializira obj enkrat - rezultat lahko hranimo v modulu in ga večkrat vstavimo."""
+    return Fragment(dumps(obj))
+
+
+def json_response(payload, status: int = 200):
+    """Kot jsonify, le hitreje in s podporo za Fragment."""
+    data = dumps(payload, current_app.config.get("JSON_ENCODER", "auto"))
+    return current_app.response_class(data, status=status, mimetype="application/json")
+
+
+# ----- Stiskanje -----
+
+def _accepted_encodings(header: str) -> dict:
+    """Razčleni Accept-Encoding v {kodiranje: q}."""
+    accepted = {}
+    for item in header.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, params = item.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(header: str, available=("gzip", "deflate")):
+    """
+    Vrne najboljše kodiranje iz available (ali None) glede na Accept-Encoding;
+    ob enakem q ima prednost prvo v available, q=0 pomeni zavrnjeno.
+    """
+    accepted = _accepted_encodings(header or "")
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in available:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return zlib.compress(data, level)
+
+
+def init_compression(app):
+    """Registrira after_request, ki stisne večje JSON/HTML odgovore."""
+
+    @app.after_request
+    def _compress_response(response):
+        config = app.config
+        if not config.get("COMPRESS_ENABLED", True):
+            return response
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code >= 300
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        data = response.get_data()
+        if len(data) < config.get("COMPRESS_MIN_SIZE", 1024):
+            return response
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        response.set_data(compress(data, encoding, config.get("COMPRESS_LEVEL", 6)))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    return app
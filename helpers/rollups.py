@@ -0,0 +1,396 @@
+# helpers/rollups.py - Časovni agregati sej za evalvacijsko nadzorno ploščo
+
+"""
+Trendi (seje na dan, delež uspešnih zaključkov, povprečne eskalacije,
+mešanica scenarijev, povprečne Likert ocene) se berejo iz tabel
+session_rollups in scenario_rollups, ne iz surovih sessions/interactions.
+
+Vedra so urna in dnevna (UTC), seja pa pripada vedru svojega začetka
+(started_at). Tabele se posodabljajo inkrementalno:
+- record_session_ends() ob zaključku seje (end_session, timeout),
+- record_rating() ob (ponovni) uporabniški oceni - prišteje razliko.
+
+Posodobitve so prištevanja (UPSERT col = col + delta), zato hkratni
+workerji ne povozijo drug drugega. rebuild_rollups() (flask rebuild-rollups)
+vse izračuna na novo iz surovih tabel.
+
+Scenarij seje zahteva funkcionalno evalvacijo (CPU). Ob zaključku v
+zahtevku (end_session) se zato takoj prištejejo samo števci, scenarij pa
+po commitu prišteje ozadinska nit procesa. Če proces vmes pade, ga
+popravi `flask rebuild-rollups`.
+"""
+
+import os
+import queue
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from db import db, read_session, SessionLog, InteractionLog, SessionEvaluation, SessionRollup, ScenarioRollup
+from helpers.evaluations import load_evaluation_rows, store_evaluations
+import evaluation
+
+GRANULARITIES = ("hour", "day")
+
+# end_reason, ki šteje kot uspešno zaključena seja
+COMPLETED_REASONS = {"success_steps"}
+
+RATING_FIELDS = ("rating_supportive", "rating_understandable", "rating_non_intrusive")
+
+COUNTER_COLUMNS = (
+    "sessions", "completed", "steps", "escalations",
+    *(f"{field}_{part}" for field in RATING_FIELDS for part in ("sum", "count")),
+)
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """Začetek urnega ali dnevnega vedra za čas ts."""
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# ----- Zapis -----
+
+def _upsert(model, key_columns, counter_columns, rows):
+    """Prišteje števce v vrstice z danim ključem (ustvari jih, če jih ni)."""
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={c: getattr(model, c) + getattr(stmt.excluded, c) for c in counter_columns},
+        )
+        db.session.execute(stmt, rows)
+        return
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+
+        stmt = dialect_insert(model)
+        stmt = stmt.on_duplicate_key_update(
+            {c: getattr(model, c) + stmt.inserted[c] for c in counter_columns}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    # Ostale baze: UPDATE, ob 0 vrsticah INSERT (ni varno ob hkratnem prvem zapisu vedra)
+    for row in rows:
+        key = [getattr(model, c) == row[c] for c in key_columns]
+        updated = db.session.execute(
+            update(model)
+            .where(*key)
+            .values({c: getattr(model, c) + row[c] for c in counter_columns})
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not updated:
+            db.session.execute(insert(model), [row])
+
+
+def _apply(session_deltas, scenario_deltas):
+    """Zapiše zbrane razlike {(granularity, bucket): Counter} v rollup tabele."""
+    _upsert(
+        SessionRollup,
+        ("granularity", "bucket_start"),
+        COUNTER_COLUMNS,
+        [
+            {"granularity": g, "bucket_start": b, **{c: counts.get(c, 0) for c in COUNTER_COLUMNS}}
+            for (g, b), counts in session_deltas.items()
+        ],
+    )
+    _upsert(
+        ScenarioRollup,
+        ("granularity", "bucket_start", "scenario_id"),
+        ("sessions",),
+        [
+            {"granularity": g, "bucket_start": b, "scenario_id": scenario, "sessions": n}
+            for (g, b, scenario), n in scenario_deltas.items()
+        ],
+    )
+
+
+def _session_facts(session_ids):
+    """Za zaključene seje vrne [(id, started_at, end_reason, korakov, eskalacij)]."""
+    stmt = (
+        select(
+            SessionLog.id,
+            SessionLog.started_at,
+            SessionLog.end_reason,
+            func.count(InteractionLog.id),
+            func.coalesce(func.max(InteractionLog.escalation_count), 0),
+        )
+        .join(InteractionLog, InteractionLog.session_id == SessionLog.id)
+        .where(SessionLog.id.in_(session_ids), SessionLog.ended_at.is_not(None))
+        .group_by(SessionLog.id, SessionLog.started_at, SessionLog.end_reason)
+    )
+    return list(db.session.execute(stmt))
+
+
+def _scenarios(facts) -> dict:
+    """
+    Scenarij za vsako sejo iz shranjene evalvacije; manjkajoče ali zastarele
+    evalvacije se izračunajo in shranijo (brez commita).
+    """
+    ids = [f[0] for f in facts]
+    steps = {f[0]: f[3] for f in facts}
+    scenarios = {}
+    stmt = select(SessionEvaluation.session_id, SessionEvaluation.scenario_id, SessionEvaluation.step_count).where(
+        SessionEvaluation.session_id.in_(ids),
+        SessionEvaluation.scoring_version == evaluation.scoring_version(),
+    )
+    for sid, scenario_id, step_count in db.session.execute(stmt):
+        if step_count == steps[sid]:
+            scenarios[sid] = scenario_id
+
+    missing = [sid for sid in ids if sid not in scenarios]
+    if missing:
+        rows = load_evaluation_rows(missing)
+        results = [(sid, evaluation.generate_functional_evaluation(rows[sid])) for sid in missing]
+        store_evaluations(results)
+        for sid, ev in results:
+            scenarios[sid] = (ev.get("scenario_classification") or {}).get("id")
+    return scenarios
+
+
+def _session_deltas(facts, sign: int = 1, scenarios: bool = True):
+    session_deltas = defaultdict(Counter)
+    for sid, started_at, end_reason, steps, escalations in facts:
+        for g in GRANULARITIES:
+            counts = session_deltas[(g, bucket_start(started_at, g))]
+            counts["sessions"] += sign
+            counts["completed"] += sign if end_reason in COMPLETED_REASONS else 0
+            counts["steps"] += sign * steps
+            counts["escalations"] += sign * escalations
+    return session_deltas, _scenario_deltas(facts, sign) if scenarios else Counter()
+
+
+def _scenario_deltas(facts, sign: int = 1):
+    scenario_deltas = Counter()
+    scenarios = _scenarios(facts) if facts else {}
+    for sid, started_at, *_ in facts:
+        if scenarios.get(sid):
+            for g in GRANULARITIES:
+                scenario_deltas[(g, bucket_start(started_at, g), scenarios[sid])] += sign
+    return scenario_deltas
+
+
+def record_session_ends(session_ids, defer_scenarios: bool = False):
+    """
+    Prišteje zaključene seje v rollup tabele (brez commita).
+    Seje brez interakcij se ne štejejo (take se ob zaključku izbrišejo).
+
+    defer_scenarios: scenarij (evalvacija seje) prišteje ozadinska nit po
+    commitu te transakcije - za zahtevke, ki sejo zaključijo.
+    """
+    session_ids = list(session_ids)
+    if not session_ids:
+        return 0
+    facts = _session_facts(session_ids)
+    _apply(*_session_deltas(facts, scenarios=not defer_scenarios))
+    if defer_scenarios and facts:
+        db.session.info.setdefault(DEFERRED_KEY, []).extend(f[0] for f in facts)
+        _ensure_scenario_worker(current_app._get_current_object())
+    return len(facts)
+
+
+# ----- Odloženi scenariji (ozadinska nit, ena na proces) -----
+
+DEFERRED_KEY = "rollups_deferred_scenarios"
+DEFERRED_BATCH = 200
+
+_deferred = queue.Queue()
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_deferred(session):
+    # Šele po commitu so seje v bazi zaključene in vidne niti
+    for session_id in session.info.pop(DEFERRED_KEY, ()):
+        _deferred.put(session_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_deferred(session):
+    session.info.pop(DEFERRED_KEY, None)
+
+
+def _ensure_scenario_worker(app):
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+        threading.Thread(target=_run_scenario_worker, args=(app,), name="rollup-scenarios", daemon=True).start()
+
+
+def _run_scenario_worker(app):
+    while True:
+        session_ids = [_deferred.get()]
+        while len(session_ids) < DEFERRED_BATCH:
+            try:
+                session_ids.append(_deferred.get_nowait())
+            except queue.Empty:
+                break
+        with app.app_context():
+            try:
+                _apply({}, _scenario_deltas(_session_facts(session_ids)))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Napaka pri rollupih scenarijev")
+
+
+def record_rating(session_obj: SessionLog, previous: dict):
+    """
+    Prišteje razliko med novimi ocenami seje in prejšnjimi (previous =
+    {polje: stara vrednost}) - ponovna ocena ne šteje dvakrat. Brez commita.
+    """
+    counts = Counter()
+    for field in RATING_FIELDS:
+        old, new = previous.get(field), getattr(session_obj, field)
+        counts[f"{field}_sum"] += (new or 0) - (old or 0)
+        counts[f"{field}_count"] += (new is not None) - (old is not None)
+    if not any(counts.values()):
+        return
+    started_at = session_obj.started_at or datetime.utcnow()
+    _apply({(g, bucket_start(started_at, g)): counts for g in GRANULARITIES}, {})
+
+
+def rebuild_rollups(chunk_size: int = 1000) -> dict:
+    """Izbriše in na novo izračuna vse agregate iz surovih tabel (brez commita)."""
+    db.session.execute(delete(SessionRollup))
+    db.session.execute(delete(ScenarioRollup))
+
+    session_deltas = defaultdict(Counter)
+    scenario_deltas = Counter()
+    totals = {"sessions": 0, "rated": 0}
+
+    # Zaključene seje v kosih (keyset po id)
+    last_id = 0
+    while True:
+        ids = list(db.session.execute(
+            select(SessionLog.id)
+            .where(SessionLog.id > last_id, SessionLog.ended_at.is_not(None))
+            .order_by(SessionLog.id)
+            .limit(chunk_size)
+        ).scalars())
+        if not ids:
+            break
+        facts = _session_facts(ids)
+        chunk_sessions, chunk_scenarios = _session_deltas(facts)
+        for key, counts in chunk_sessions.items():
+            session_deltas[key].update(counts)
+        scenario_deltas.update(chunk_scenarios)
+        totals["sessions"] += len(facts)
+        last_id = ids[-1]
+
+    # Ocene (tudi nezaključenih sej)
+    rated = db.session.execute(
+        select(SessionLog.started_at, *(getattr(SessionLog, f) for f in RATING_FIELDS))
+        .where(SessionLog.evaluated_at.is_not(None))
+    )
+    for started_at, *ratings in rated:
+        started_at = started_at or datetime.utcnow()
+        totals["rated"] += 1
+        for g in GRANULARITIES:
+            counts = session_deltas[(g, bucket_start(started_at, g))]
+            for field, value in zip(RATING_FIELDS, ratings):
+                if value is not None:
+                    counts[f"{field}_sum"] += value
+                    counts[f"{field}_count"] += 1
+
+    _apply(session_deltas, +scenario_deltas)
+    totals["buckets"] = len(session_deltas)
+    return totals
+
+
+# ----- Branje -----
+
+def choose_granularity(start: datetime, end: datetime) -> str:
+    """Urna vedra za obdobja do dveh dni, sicer dnevna."""
+    return "hour" if end - start <= timedelta(days=2) else "day"
+
+
+def _ratio(numerator, denominator, digits=2):
+    return round(numerator / denominator, digits) if denominator else None
+
+
+def _metrics(counts: dict) -> dict:
+    """Izpeljane metrike iz seštetih števcev."""
+    sessions = counts["sessions"]
+    return {
+        "sessions": sessions,
+        "completed": counts["completed"],
+        "completion_rate": _ratio(counts["completed"], sessions, 3),
+        "avg_steps": _ratio(counts["steps"], sessions),
+        "avg_escalations": _ratio(counts["escalations"], sessions),
+        "ratings": {
+            field.replace("rating_", ""): {
+                "avg": _ratio(counts[f"{field}_sum"], counts[f"{field}_count"]),
+                "count": counts[f"{field}_count"],
+            }
+            for field in RATING_FIELDS
+        },
+    }
+
+
+def query_rollups(start: datetime, end: datetime, granularity: str = None) -> dict:
+    """
+    Trendi za obdobje [start, end) iz rollup tabel.
+
+    Vedra so poravnana na začetek ure / dneva, zato je start zaokrožen navzdol.
+    """
+    granularity = granularity or choose_granularity(start, end)
+    start = bucket_start(start, granularity)
+    columns = [getattr(SessionRollup, c) for c in COUNTER_COLUMNS]
+    session = read_session()
+    rows = session.execute(
+        select(SessionRollup.bucket_start, *columns)
+        .where(
+            SessionRollup.granularity == granularity,
+            SessionRollup.bucket_start >= start,
+            SessionRollup.bucket_start < end,
+        )
+        .order_by(SessionRollup.bucket_start)
+    )
+    scenario_rows = session.execute(
+        select(ScenarioRollup.bucket_start, ScenarioRollup.scenario_id, ScenarioRollup.sessions)
+        .where(
+            ScenarioRollup.granularity == granularity,
+            ScenarioRollup.bucket_start >= start,
+            ScenarioRollup.bucket_start < end,
+            ScenarioRollup.sessions > 0,
+        )
+    )
+    scenarios = defaultdict(dict)
+    for bucket, scenario_id, sessions in scenario_rows:
+        scenarios[bucket][scenario_id] = sessions
+
+    buckets = []
+    totals = Counter()
+    total_scenarios = Counter()
+    for bucket, *values in rows:
+        counts = dict(zip(COUNTER_COLUMNS, values))
+        totals.update(counts)
+        total_scenarios.update(scenarios.get(bucket, {}))
+        buckets.append({"bucket": bucket, **_metrics(counts), "scenarios": scenarios.get(bucket, {})})
+
+    return {
+        "granularity": granularity,
+        "from": start,
+        "to": end,
+        "buckets": buckets,
+        "totals": {**_metrics({c: totals.get(c, 0) for c in COUNTER_COLUMNS}), "scenarios": dict(total_scenarios)},
+    }
@@ -0,0 +1,206 @@
+# helpers/session_timeouts.py - Zapiranje neaktivnih sej (timeout)
+
+"""
+Seje, pri katerih brskalnik preprosto izgine, ostanejo odprte (ended_at IS NULL).
+
+Vsak worker vodi min-heap rokov (deadline, session_id) za seje, ki jih je sam
+videl. Ozadinska nit ob vsakem tiku pobere pretečene roke in jih zapre v
+paketnih UPDATE stavkih (end_reason = "timeout"), prazne seje pa izbriše.
+
+Ker worker ne vidi sej drugih workerjev (ali sej pred ponovnim zagonom), se
+vsakih nekaj tikov izvede še rezervni pregled prek indeksa
+(ended_at, last_activity_at) - samo odprte seje, nikoli cela tabela.
+"""
+
+import heapq
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, exists, or_, select, update
+
+from db import db, SessionLog, InteractionLog
+from .rollups import record_session_ends
+
+
+class SessionTimeoutScheduler:
+    """Min-heap rokov neaktivnosti z lenim brisanjem zastarelih vnosov."""
+
+    def __init__(self, timeout_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        self._heap = []          # (deadline, session_id)
+        self._deadlines = {}     # session_id -> veljavni deadline
+        self._lock = threading.Lock()
+
+    def touch(self, session_id: int, now: float = None):
+        """Zabeleži aktivnost seje (premakne njen rok naprej)."""
+        deadline = (now if now is not None else time.time()) + self.timeout_seconds
+        with self._lock:
+            self._deadlines[session_id] = deadline
+            heapq.heappush(self._heap, (deadline, session_id))
+            # Stari vnosi ostanejo v heapu; občasno ga stisnemo
+            if len(self._heap) > 2 * len(self._deadlines) + 64:
+                self._heap = [(d, sid) for sid, d in self._deadlines.items()]
+                heapq.heapify(self._heap)
+
+    def forget(self, session_id: int):
+        """Seja je zaključena drugje - ne spremljamo je več."""
+        with self._lock:
+            self._deadlines.pop(session_id, None)
+
+    def pop_expired(self, now: float = None) -> list:
+        """Vrne ID-je sej, katerih rok je potekel, in jih odstrani."""
+        now = now if now is not None else time.time()
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, sid = heapq.heappop(self._heap)
+                if self._deadlines.get(sid) == deadline:
+                    del self._deadlines[sid]
+                    expired.append(sid)
+        return expired
+
+    def __len__(self):
+        return len(self._deadlines)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def close_sessions(session_ids, timeout_seconds: float, batch_size: int = 500) -> dict:
+    """
+    Zapre podane seje, če so res neaktivne dlje od timeout_seconds.
+
+    Pogoj na last_activity_at se preveri v bazi, zato seje, ki jih je medtem
+    uporabil drug worker, ostanejo odprte. Prazne seje se izbrišejo.
+    Čakajoče ponovitve (debounce) teh sej se pred tem zapišejo v log.
+    """
+    from .helpers import flush_repeats
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=timeout_seconds)
+    stale = or_(SessionLog.last_activity_at < cutoff, SessionLog.last_activity_at.is_(None))
+    has_interactions = exists().where(InteractionLog.session_id == SessionLog.id)
+
+    closed = deleted = 0
+    for chunk in _chunks(list(session_ids), batch_size):
+        base = (SessionLog.id.in_(chunk), SessionLog.ended_at.is_(None), stale)
+        if pending_repeats is not None:
+            for state in pending_repeats(chunk):
+                flush_repeats(state)
+        deleted += db.session.execute(
+            delete(SessionLog).where(*base, ~has_interactions).execution_options(synchronize_session=False)
+        ).rowcount
+        closed += db.session.execute(
+            update(SessionLog)
+            .where(*base)
+            .values(ended_at=now, end_reason="timeout")
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        record_session_ends(db.session.execute(
+            select(SessionLog.id).where(
+                SessionLog.id.in_(chunk), SessionLog.ended_at == now, SessionLog.end_reason == "timeout"
+            )
+        ).scalars())
+        db.session.commit()
+
+    return {"closed": closed, "deleted": deleted}
+
+
+def find_stale_sessions(timeout_seconds: float, limit: int = 500) -> list:
+    """Rezervni pregled: odprte seje brez aktivnosti (prek indeksa)."""
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    stmt = (
+        select(SessionLog.id)
+        .where(
+            SessionLog.ended_at.is_(None),
+            or_(SessionLog.last_activity_at < cutoff, SessionLog.last_activity_at.is_(None)),
+        )
+        .limit(limit)
+    )
+    return list(db.session.execute(stmt).scalars())
+
+
+def sweep_stale_sessions(timeout_seconds: float, batch_size: int = 500, max_batches: int = 20) -> dict:
+    """Zapira odprte neaktivne seje v paketih, dokler jih ne zmanjka."""
+    totals = {"closed": 0, "deleted": 0}
+    for _ in range(max_batches):
+        ids = find_stale_sessions(timeout_seconds, limit=batch_size)
+        if not ids:
+            break
+        result = close_sessions(ids, timeout_seconds, batch_size)
+        totals["closed"] += result["closed"]
+        totals["deleted"] += result["deleted"]
+        if len(ids) < batch_size:
+            break
+    return totals
+
+
+# ----- Ozadinska nit (ena na proces) -----
+
+scheduler = None
+pending_repeats = None       # session_ids -> okna debouncerja s čakajočimi ponovitvami (register flote)
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def init_scheduler(timeout_seconds: float):
+    """Ustvari globalni scheduler za ta proces."""
+    global scheduler
+    scheduler = SessionTimeoutScheduler(timeout_seconds)
+    return scheduler
+
+
+def init_pending_repeats(source):
+    """Vir čakajočih ponovitev za close_sessions (nastavi app.py: registry.take_pending_repeats)."""
+    global pending_repeats
+    pending_repeats = source
+
+
+def touch_session(session_id: int):
+    if scheduler is not None:
+        scheduler.touch(session_id)
+
+
+def forget_session(session_id: int):
+    if scheduler is not None:
+        scheduler.forget(session_id)
+
+
+def ensure_worker_started(app):
+    """
+    Zažene ozadinsko nit, če v tem procesu še ne teče.
+
+    Kliče se ob zahtevku (ne ob uvozu), da nit nastane v workerju in ne v
+    gunicorn masterju (--preload), kjer bi se ob fork-u izgubila.
+    """
+    global _worker_pid
+    if scheduler is None or _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+        thread = threading.Thread(target=_run_worker, args=(app,), name="session-timeouts", daemon=True)
+        thread.start()
+
+
+def _run_worker(app):
+    tick = app.config["SESSION_TIMEOUT_TICK_SECONDS"]
+    sweep_every = app.config["SESSION_TIMEOUT_SWEEP_EVERY"]
+    batch_size = app.config["SESSION_TIMEOUT_BATCH"]
+    ticks = 0
+    while True:
+        time.sleep(tick)
+        ticks += 1
+        try:
+            with app.app_context():
+                expired = scheduler.pop_expired()
+                if expired:
+                    close_sessions(expired, scheduler.timeout_seconds, batch_size)
+                if ticks % sweep_every == 0:
+                    sweep_stale_sessions(scheduler.timeout_seconds, batch_size)
+        except Exception:
+            app.logger.exception("Napaka pri zapiranju neaktivnih sej")
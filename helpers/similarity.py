@@ -0,0 +1,370 @@
+# helpers/similarity.py - Iskanje podobnih sej prek zgoščenih n-gram vektorjev
+
+"""
+Zaporedje seje (triggerji 1-3-grami, intenti 1-2-grami) se pretvori v
+vektor fiksne dolžine VECTOR_DIM: vsak n-gram se zgosti v koš (s
+predznakom, da se trki izničujejo), števci se logaritemsko stisnejo in
+vektor normira na dolžino 1. Podobnost je kosinus = skalarni produkt.
+
+Vektorji so shranjeni v session_vectors, vsak proces pa ima v pomnilniku
+matriko (N x VECTOR_DIM) in scenarij vsake seje (poravnan z ids).
+refresh_index() prebere samo interakcije z id nad vodnim žigom (največji
+last_interaction_id) in na novo izračuna vektorje sej, ki so se
+spremenile, ter prebere na novo shranjene evalvacije (scenarije). Vrstica,
+potrjena za vrstico z večjim id, ostane pod vodnim žigom; zato se v oknu
+STALE_WINDOW id-jev pod njim na novo izračunajo še seje, katerih shranjeni
+vektor ima manj korakov kot log (kot vrzeli v helpers/markov.py). Kliče jo
+ozadinska nit vsakih SIMILARITY_REFRESH_SECONDS (ali `flask
+refresh-similarity`), poizvedba pa samo bere: en matrični produkt in
+argpartition za top-k.
+"""
+
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from db import db, InteractionLog, SessionEvaluation, SessionVector
+import evaluation
+
+VECTOR_DIM = 128
+TRIGGER_NGRAMS = (1, 2, 3)
+INTENT_NGRAMS = (1, 2)
+
+_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_SIGN_BIT = np.uint64(63)
+
+
+# ----- Vektorji -----
+
+_token_hashes = {}
+
+
+def _hash_tokens(tokens, prefix: str) -> np.ndarray:
+    hashes = np.empty(len(tokens), dtype=np.uint64)
+    for k, token in enumerate(tokens):
+        key = prefix + (token or "")
+        h = _token_hashes.get(key)
+        if h is None:
+            h = _token_hashes[key] = zlib.crc32(key.encode("utf-8")) | (len(key) << 32)
+        hashes[k] = h
+    return hashes
+
+
+def _ngram_hashes(hashes: np.ndarray, n: int) -> np.ndarray:
+    """Zgoščene vrednosti vseh zaporednih n-gramov (vektorizirano)."""
+    count = len(hashes) - n + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.uint64)
+    combined = hashes[:count] ^ np.uint64(n)
+    for offset in range(1, n):
+        combined = combined * _MULTIPLIER + hashes[offset:offset + count]
+    return combined
+
+
+def session_vector(triggers, intents) -> np.ndarray:
+    """Normiran float32 vektor dolžine VECTOR_DIM za zaporedje seje."""
+    trigger_hashes = _hash_tokens(triggers, "t:")
+    intent_hashes = _hash_tokens(intents, "i:")
+    hashes = np.concatenate(
+        [_ngram_hashes(trigger_hashes, n) for n in TRIGGER_NGRAMS]
+        + [_ngram_hashes(intent_hashes, n) for n in INTENT_NGRAMS]
+    )
+    # zmešaj še enkrat, da so zgornji biti (koš, predznak) odvisni od vseh žetonov
+    hashes = hashes * _MULTIPLIER
+    buckets = (hashes >> np.uint64(32)) % np.uint64(VECTOR_DIM)
+    signs = np.where(hashes >> _SIGN_BIT, 1.0, -1.0)
+    vector = np.bincount(buckets.astype(np.int64), weights=signs, minlength=VECTOR_DIM)
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm > 0 else vector).astype(np.float32)
+
+
+# ----- Indeks -----
+
+# Evalvacije, shranjene do toliko pred zadnjo prebrano, se preberejo znova
+# (evaluated_at se nastavi pred commitom, transakcije se potrdijo v poljubnem vrstnem redu)
+LABEL_OVERLAP = timedelta(minutes=5)
+# Koliko id-jev pod vodnim žigom se preveri za pozno potrjene vrstice (kot GAP_WINDOW v markov.py)
+STALE_WINDOW = 10000
+NO_SCENARIO = -1
+
+
+class SimilarityIndex:
+    """Matrika vektorjev vseh sej in njihovi scenariji v pomnilniku procesa."""
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, VECTOR_DIM), dtype=np.float32)
+        self.scenarios = np.empty(0, dtype=np.int32)     # koda scenarija za vsako vrstico
+        self.scenario_codes = {}
+        self.pending_scenarios = {}                      # seje, ki še nimajo vektorja
+        self.positions = {}
+        self.watermark = 0
+        self.labels_watermark = None                     # zadnji prebrani evaluated_at
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_arrays(cls, ids: np.ndarray, matrix: np.ndarray, watermark: int):
+        """Indeks nad obstoječima poljema (npr. preslikanima iz posnetka); scenariji se preberejo ob prvi poizvedbi."""
+        index = cls()
+        index.ids, index.matrix, index.watermark = ids, matrix, watermark
+        index.scenarios = np.full(len(ids), NO_SCENARIO, dtype=np.int32)
+        index.positions = {int(sid): pos for pos, sid in enumerate(ids.tolist())}
+        return index
+
+    def update(self, vectors: dict):
+        """Zamenja ali doda vektorje {session_id: vektor}."""
+        new_ids = []
+        for sid, vector in vectors.items():
+            pos = self.positions.get(sid)
+            if pos is None:
+                new_ids.append(sid)
+            else:
+                self.matrix[pos] = vector
+        if new_ids:
+            start = len(self.ids)
+            codes = [self.pending_scenarios.pop(sid, NO_SCENARIO) for sid in new_ids]
+            self.ids = np.concatenate([self.ids, np.asarray(new_ids, dtype=np.int64)])
+            self.matrix = np.vstack([self.matrix, np.stack([vectors[sid] for sid in new_ids])])
+            self.scenarios = np.concatenate([self.scenarios, np.asarray(codes, dtype=np.int32)])
+            self.positions.update((sid, start + k) for k, sid in enumerate(new_ids))
+
+    def set_scenarios(self, labels: dict):
+        """Nastavi scenarije {session_id: scenario_id ali None}."""
+        for sid, scenario in labels.items():
+            code = NO_SCENARIO if scenario is None else self.scenario_codes.setdefault(scenario, len(self.scenario_codes))
+            pos = self.positions.get(sid)
+            if pos is None:
+                self.pending_scenarios[sid] = code
+            else:
+                self.scenarios[pos] = code
+
+    def query(self, session_id: int, k: int = 10, scenario: str = None):
+        """Top-k [(session_id, kosinus)] za sejo; scenario omeji kandidate."""
+        pos = self.positions.get(session_id)
+        if pos is None or k <= 0 or (scenario is not None and scenario not in self.scenario_codes):
+            return []
+        scores = self.matrix @ self.matrix[pos]
+        scores[pos] = -np.inf
+        if scenario is not None:
+            scores[self.scenarios != self.scenario_codes[scenario]] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+_index = None
+_index_lock = threading.Lock()        # dostop do _index (kratko)
+_refresh_lock = threading.Lock()      # en osveževalec na proces
+
+
+def _read_vectors(session_ids=None) -> dict:
+    stmt = select(SessionVector.session_id, SessionVector.vector)
+    if session_ids is not None:
+        stmt = stmt.where(SessionVector.session_id.in_(session_ids))
+    return {
+        sid: np.frombuffer(data, dtype=np.float32)
+        for sid, data in db.session.execute(stmt)
+        if len(data) == VECTOR_DIM * 4
+    }
+
+
+def _load_index() -> SimilarityIndex:
+    index = SimilarityIndex()
+    vectors = _read_vectors()
+    if vectors:
+        index.update(vectors)
+    index.watermark = db.session.execute(select(func.max(SessionVector.last_interaction_id))).scalar() or 0
+    return index
+
+
+def _current_index() -> SimilarityIndex:
+    """Indeks procesa; ob prvem klicu se prebere iz session_vectors (brez računanja)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = _load_index()
+        index = _index
+    if index.labels_watermark is None:
+        _sync_scenarios(index)
+    return index
+
+
+def _sync_scenarios(index: SimilarityIndex):
+    """Prebere scenarije evalvacij, shranjenih od zadnjega branja (s prekrivanjem)."""
+    stmt = select(
+        SessionEvaluation.session_id,
+        SessionEvaluation.scenario_id,
+        SessionEvaluation.scoring_version,
+        SessionEvaluation.evaluated_at,
+    )
+    if index.labels_watermark is not None:
+        stmt = stmt.where(SessionEvaluation.evaluated_at >= index.labels_watermark - LABEL_OVERLAP)
+    version = evaluation.scoring_version()
+    labels, latest = {}, index.labels_watermark
+    for sid, scenario, scoring_version, evaluated_at in db.session.execute(stmt):
+        labels[sid] = scenario if scoring_version == version else None
+        if evaluated_at is not None and (latest is None or evaluated_at > latest):
+            latest = evaluated_at
+    with _index_lock:
+        index.set_scenarios(labels)
+        index.labels_watermark = latest if latest is not None else datetime.utcnow()
+
+
+def _compute_vectors(session_ids, max_id: int) -> dict:
+    """Vektorji sej iz loga (samo vrstice do max_id); vrne {sid: (vektor, korakov, zadnji id)}."""
+    sequences = {sid: ([], []) for sid in session_ids}
+    stmt = (
+        select(InteractionLog.session_id, InteractionLog.id, InteractionLog.trigger, InteractionLog.inferred_intent)
+        .where(InteractionLog.session_id.in_(session_ids), InteractionLog.id <= max_id)
+        .order_by(InteractionLog.session_id, InteractionLog.step_number)
+    )
+    last_ids = {}
+    for sid, interaction_id, trigger, intent in db.session.execute(stmt):
+        triggers, intents = sequences[sid]
+        triggers.append(trigger)
+        intents.append(intent)
+        last_ids[sid] = max(last_ids.get(sid, 0), interaction_id)
+    return {
+        sid: (session_vector(triggers, intents), len(triggers), last_ids[sid])
+        for sid, (triggers, intents) in sequences.items()
+        if triggers
+    }
+
+
+def _store_vectors(computed: dict):
+    """Zamenja vrstice session_vectors za izračunane seje (brez commita)."""
+    db.session.execute(
+        delete(SessionVector)
+        .where(SessionVector.session_id.in_(list(computed)))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(insert(SessionVector), [
+        {"session_id": sid, "last_interaction_id": last_id, "step_count": steps, "vector": vector.tobytes()}
+        for sid, (vector, steps, last_id) in computed.items()
+    ])
+
+
+def _behind_sessions(low: int, high: int) -> set:
+    """Seje z vrsticami v (low, high], ki jih shranjeni vektor še ne zajema."""
+    if high <= 0:
+        return set()
+    return set(db.session.execute(
+        select(InteractionLog.session_id)
+        .outerjoin(SessionVector, SessionVector.session_id == InteractionLog.session_id)
+        .where(InteractionLog.id > low, InteractionLog.id <= high)
+        .where(or_(SessionVector.session_id.is_(None), SessionVector.step_count < InteractionLog.step_number))
+        .distinct()
+    ).scalars())
+
+
+def refresh_index(chunk_size: int = 1000) -> SimilarityIndex:
+    """
+    Posodobi indeks z interakcijami nad vodnim žigom in pozno potrjenimi pod
+    njim (shrani in commita) ter scenarije.
+    """
+    with _refresh_lock:
+        index = _current_index()
+        max_id = db.session.execute(select(func.max(InteractionLog.id))).scalar() or 0
+        changed = _behind_sessions(index.watermark - STALE_WINDOW, index.watermark)
+        if max_id > index.watermark:
+            changed.update(db.session.execute(
+                select(InteractionLog.session_id)
+                .where(InteractionLog.id > index.watermark, InteractionLog.id <= max_id)
+                .distinct()
+            ).scalars())
+        if changed:
+            changed = sorted(changed)
+            for start in range(0, len(changed), chunk_size):
+                chunk = changed[start:start + chunk_size]
+                computed = _compute_vectors(chunk, max_id)
+                if not computed:
+                    continue
+                vectors = {sid: vector for sid, (vector, _, _) in computed.items()}
+                try:
+                    _store_vectors(computed)
+                    db.session.commit()
+                except IntegrityError:
+                    # Iste seje je hkrati shranil drug worker - vzemi njegove vektorje
+                    db.session.rollback()
+                    vectors = _read_vectors(list(computed))
+                with _index_lock:
+                    index.update(vectors)
+            index.watermark = max(index.watermark, max_id)
+        _sync_scenarios(index)
+        return index
+
+
+def index_arrays():
+    """(ids, matrika, vodni žig) indeksa procesa ali None (za posnetek toplega stanja)."""
+    with _index_lock:
+        if _index is None or not len(_index):
+            return None
+        return _index.ids, _index.matrix, _index.watermark
+
+
+def install_index(index: SimilarityIndex) -> bool:
+    """Namesti indeks iz posnetka, če ga proces še nima ali ima starejšega."""
+    global _index
+    with _index_lock:
+        if _index is not None and _index.watermark >= index.watermark:
+            return False
+        _index = index
+        return True
+
+
+def rebuild_index(chunk_size: int = 1000) -> SimilarityIndex:
+    """Izbriše shranjene vektorje in jih izračuna na novo iz celotnega loga."""
+    global _index
+    with _refresh_lock, _index_lock:
+        _index = None
+        db.session.execute(delete(SessionVector))
+        db.session.commit()
+    return refresh_index(chunk_size)
+
+
+def similar_sessions(session_id: int, k: int = 10, scenario: str = None):
+    """Top-k podobnih sej [(session_id, kosinus)], po želji samo za scenarij (brez pisanja v bazo)."""
+    index = _current_index()
+    with _index_lock:
+        return index.query(session_id, k, scenario)
+
+
+# ----- Ozadinska nit (ena na proces) -----
+
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def ensure_worker_started(app):
+    """Zažene nit, ki vsakih SIMILARITY_REFRESH_SECONDS posodobi indeks (kot pri session_timeouts)."""
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+        thread = threading.Thread(target=_run_worker, args=(app,), name="similarity-refresh", daemon=True)
+        thread.start()
+
+
+def _run_worker(app):
+    interval = app.config["SIMILARITY_REFRESH_SECONDS"]
+    while True:
+        with app.app_context():
+            try:
+                refresh_index()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Napaka pri posodabljanju indeksa podobnih sej")
+        time.sleep(interval)
@@ -0,0 +1,290 @@
+# helpers/warm_state.py - Posnetek toplega stanja procesa (preživi ponovni zagon workerja)
+
+"""
+Ob ponovnem zagonu workerja (gunicorn max_requests, deploy, hladen zagon)
+se izgubi vse, kar je proces zgradil v pomnilniku. WarmState občasno (in ob
+izhodu workerja) zapiše to stanje v WARM_STATE_DIR, ob zagonu aplikacije pa
+ga naloži nazaj:
+- indeks podobnih sej (helpers/similarity.py) - matrika kot .npy, ki se
+  preslika v pomnilnik (mmap, copy-on-write), zato se ob zagonu ne bere
+  cela tabela session_vectors; z --preload si preslikane strani delijo vsi
+  workerji,
+- Markov modela (helpers/markov.py),
+- register sej robotov flote (helpers/fleet.py).
+
+Posnetek je mapa snapshot-<čas>-<pid>; manifest.json (zamenjan atomarno)
+kaže na zadnjo. Manifest vsebuje podpis: verzijo formata, SCHEMA_VERSION,
+verzijo pravil, bazo in VECTOR_DIM. Posnetek z drugačnim podpisom se
+zavrže. Posamezni deli se ob obnovi še preverijo proti bazi (vodni žigi,
+_sync registra), zato zastarel posnetek pomeni le nekaj več dela ob prvem
+zahtevku, nikoli napačnega odgovora.
+
+Z --preload se init_app izvede le v masterju, zato gunicorn post_fork
+pokliče restore_if_newer(): worker, ki ga master zažene kasneje (npr. po
+max_requests), naloži posnetek, novejši od tistega ob zagonu masterja.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import func, select
+
+from db import db, SCHEMA_VERSION, SessionVector
+
+from . import markov, similarity
+
+WARM_STATE_FORMAT = 1
+MANIFEST = "manifest.json"
+LOCK_FILE = ".lock"
+SNAPSHOT_PREFIX = "snapshot-"
+KEEP_SNAPSHOTS = 2
+
+
+class WarmState:
+    """Zapis in obnova toplega stanja procesa v mapi directory."""
+
+    def __init__(self, directory: str, rules, registry=None, keep: int = KEEP_SNAPSHOTS):
+        self.directory = directory
+        self.rules = rules
+        self.registry = registry
+        self.keep = max(1, keep)
+        self.created_at = 0.0                            # zadnji obnovljeni ali zapisani posnetek
+        os.makedirs(directory, exist_ok=True)
+
+    def signature(self) -> dict:
+        """Podpis, ki se mora ujemati, da je posnetek uporaben."""
+        url = db.engine.url.render_as_string(hide_password=True)
+        return {
+            "format": WARM_STATE_FORMAT,
+            "schema_version": SCHEMA_VERSION,
+            "rules_version": self.rules.version,
+            "database": hashlib.sha1(url.encode("utf-8")).hexdigest()[:12],
+            "vector_dim": similarity.VECTOR_DIM,
+        }
+
+    # ----- Zapis -----
+
+    def save(self) -> dict:
+        """Zapiše nov posnetek in ga objavi v manifestu. Vrne opis delov."""
+        signature = self.signature()
+        name = f"{SNAPSHOT_PREFIX}{int(time.time() * 1000)}-{os.getpid()}"
+        target = os.path.join(self.directory, name)
+        os.makedirs(target)
+        parts = {}
+
+        arrays = similarity.index_arrays()
+        if arrays is not None:
+            ids, matrix, watermark = arrays
+            np.save(os.path.join(target, "similarity_ids.npy"), ids)
+            np.save(os.path.join(target, "similarity_matrix.npy"), matrix)
+            parts["similarity"] = {"sessions": len(ids), "watermark": int(watermark)}
+
+        models = markov.cached_models()
+        if models:
+            parts["markov"] = {}
+            for model_name, model in models.items():
+                np.save(os.path.join(target, f"markov_{model_name}.npy"), np.vstack([model.counts, model.starts]))
+                parts["markov"][model_name] = {"labels": model.layout, "watermark": int(model.watermark), "gaps": model.gaps}
+
+        if self.registry is not None:
+            entries = self.registry.export()
+            if entries:
+                with open(os.path.join(target, "registry.json"), "w", encoding="utf-8") as fh:
+                    json.dump(entries, fh, ensure_ascii=False)
+                parts["registry"] = {"robots": len(entries)}
+
+        manifest = {**signature, "snapshot": name, "created_at": time.time(), "pid": os.getpid(), "parts": parts}
+        self.created_at = manifest["created_at"]
+        with self._locked():
+            tmp_path = os.path.join(self.directory, f"{MANIFEST}.tmp-{os.getpid()}")
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(manifest, fh, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(self.directory, MANIFEST))
+            self._cleanup(name)
+        return parts
+
+    def _locked(self):
+        """Zaklep mape - workerji ne čistijo posnetkov drug drugemu med objavo."""
+        return _FileLock(os.path.join(self.directory, LOCK_FILE))
+
+    def _cleanup(self, current: str):
+        # Preslikane datoteke starih posnetkov ostanejo veljavne do konca procesa (unlink)
+        snapshots = sorted(d for d in os.listdir(self.directory) if d.startswith(SNAPSHOT_PREFIX) and d != current)
+        for old in snapshots[:max(0, len(snapshots) - (self.keep - 1))]:
+            shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+
+    # ----- Obnova -----
+
+    def load_manifest(self):
+        """Manifest zadnjega posnetka ali None (ni ga ali ni berljiv)."""
+        try:
+            with open(os.path.join(self.directory, MANIFEST), encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def restore(self, newer_only: bool = False) -> dict:
+        """
+        Naloži zadnji posnetek. Vrne {"status": "restored"|"missing"|"incompatible",
+        ...} z obnovljenimi deli. Z newer_only vrne {"status": "current"}, če
+        posnetek ni novejši od zadnjega obnovljenega ali zapisanega v procesu.
+        Kliče se v kontekstu aplikacije.
+        """
+        manifest = self.load_manifest()
+        if not isinstance(manifest, dict) or "snapshot" not in manifest:
+            return {"status": "missing"}
+        if newer_only and manifest.get("created_at", 0) <= self.created_at:
+            return {"status": "current"}
+        signature = self.signature()
+        mismatched = sorted(k for k, v in signature.items() if manifest.get(k) != v)
+        if mismatched:
+            return {"status": "incompatible", "mismatched": mismatched}
+
+        path = os.path.join(self.directory, manifest["snapshot"])
+        parts = manifest.get("parts", {})
+        restored = {}
+        for part, loader in (
+            ("similarity", self._restore_similarity),
+            ("markov", self._restore_markov),
+            ("registry", lambda path, info: self._restore_registry(path, info, replace=newer_only)),
+        ):
+            if part not in parts:
+                continue
+            try:
+                restored[part] = loader(path, parts[part])
+            except (OSError, ValueError, KeyError) as e:
+                restored[part] = f"skipped: {e.__class__.__name__}"
+        self.created_at = manifest.get("created_at", 0)
+        return {"status": "restored", "snapshot": manifest["snapshot"], "parts": restored}
+
+    def _restore_similarity(self, path: str, info: dict):
+        # Baza z manjšim vodnim žigom je bila medtem zgrajena na novo
+        stored = db.session.execute(select(func.max(SessionVector.last_interaction_id))).scalar() or 0
+        if stored < info["watermark"]:
+            return "stale"
+        ids = np.load(os.path.join(path, "similarity_ids.npy"), mmap_mode="r")
+        matrix = np.load(os.path.join(path, "similarity_matrix.npy"), mmap_mode="c")
+        if len(ids) != info["sessions"] or matrix.shape != (len(ids), similarity.VECTOR_DIM):
+            raise ValueError("shape")
+        index = similarity.SimilarityIndex.from_arrays(np.asarray(ids), matrix, info["watermark"])
+        return len(index) if similarity.install_index(index) else "present"
+
+    def _restore_markov(self, path: str, info: dict):
+        models = {}
+        for name, meta in info.items():
+            data = np.load(os.path.join(path, f"markov_{name}.npy"), allow_pickle=False)
+            models[name] = markov.TransitionModel(name, meta["labels"], data[:-1].copy(), data[-1].copy(), meta["watermark"], meta.get("gaps", ()))
+        markov.install_models(models)
+        return sorted(models)
+
+    def _restore_registry(self, path: str, info: dict, replace: bool = False):
+        if self.registry is None:
+            return 0
+        with open(os.path.join(path, "registry.json"), encoding="utf-8") as fh:
+            return self.registry.restore(json.load(fh), replace=replace)
+
+
+class _FileLock:
+    """Ekskluziven zaklep datoteke (flock) kot kontekst."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fh = None
+
+    def __enter__(self):
+        self.fh = open(self.path, "a")
+        fcntl.flock(self.fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fh, fcntl.LOCK_UN)
+        self.fh.close()
+
+
+# ----- Ena instanca na aplikacijo in ozadinska nit (ena na proces) -----
+
+warm_state = None
+_app = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def init_app(app, rules, registry=None):
+    """
+    Ob zagonu naloži posnetek (z --preload enkrat v masterju, workerji si
+    preslikane strani delijo). Brez WARM_STATE_DIR ne naredi ničesar.
+    """
+    global warm_state, _app
+    directory = app.config["WARM_STATE_DIR"]
+    if not directory:
+        return None
+    warm_state, _app = WarmState(directory, rules, registry), app
+    with app.app_context():
+        try:
+            result = warm_state.restore()
+        except Exception:
+            app.logger.exception("Napaka pri obnovi toplega stanja")
+            result = {"status": "error"}
+    app.logger.info("Toplo stanje: %s", result)
+
+    if app.config["WARM_STATE_INTERVAL_SECONDS"] > 0:
+        @app.before_request
+        def _start_warm_state_saver():
+            ensure_worker_started(app)
+    return result
+
+
+def restore_if_newer():
+    """
+    Obnovi posnetek, če je novejši od stanja procesa (gunicorn post_fork z
+    --preload). Napake samo zabeleži.
+    """
+    if warm_state is None:
+        return None
+    try:
+        with _app.app_context():
+            result = warm_state.restore(newer_only=True)
+    except Exception:
+        _app.logger.exception("Napaka pri obnovi toplega stanja")
+        return None
+    if result["status"] != "current":
+        _app.logger.info("Toplo stanje (worker %s): %s", os.getpid(), result)
+    return result
+
+
+def save_now():
+    """Zapiše posnetek takoj (npr. gunicorn worker_exit). Napake samo zabeleži."""
+    if warm_state is None:
+        return None
+    try:
+        with _app.app_context():
+            return warm_state.save()
+    except Exception:
+        _app.logger.exception("Napaka pri zapisu toplega stanja")
+        return None
+
+
+def ensure_worker_started(app):
+    """Zažene nit za občasni zapis, če v tem procesu še ne teče (kot pri session_timeouts)."""
+    global _worker_pid
+    if warm_state is None or _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+        thread = threading.Thread(target=_run_worker, args=(app,), name="warm-state", daemon=True)
+        thread.start()
+
+
+def _run_worker(app):
+    interval = app.config["WARM_STATE_INTERVAL_SECONDS"]
+    while True:
+        time.sleep(interval)
+        save_now()
@@ -0,0 +1,37 @@
+# jobs/__init__.py - Paketna opravila in CLI ukazi (flask <ukaz>)
+
+
+def register_commands(app):
+    """Registrira CLI ukaze na Flask aplikaciji."""
+    from .maintenance import (
+        close_stale_sessions_command,
+        rebuild_rollups_command,
+        rebuild_markov_command,
+        refresh_markov_command,
+        rebuild_similarity_command,
+        refresh_similarity_command,
+        refresh_analytics_copy_command,
+    )
+    from .replay import replay_command
+    from .reevaluate import reevaluate_command
+    from .assets import build_assets_command
+    from .fleet import register_robot_command
+    from .bulk_import import import_sessions_command, seed_synthetic_command
+    from .sweep import sweep_fsm_command
+    from .simulate import simulate_sessions_command
+
+    app.cli.add_command(close_stale_sessions_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(rebuild_markov_command)
+    app.cli.add_command(refresh_markov_command)
+    app.cli.add_command(rebuild_similarity_command)
+    app.cli.add_command(refresh_similarity_command)
+    app.cli.add_command(refresh_analytics_copy_command)
+    app.cli.add_command(replay_command)
+    app.cli.add_command(reevaluate_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(register_robot_command)
+    app.cli.add_command(import_sessions_command)
+    app.cli.add_command(seed_synthetic_command)
+    app.cli.add_command(sweep_fsm_command)
+    app.cli.add_command(simulate_sessions_command)
@@ -0,0 +1,22 @@
+# jobs/assets.py - Gradnja statičnih datotek (flask build-assets)
+
+import os
+
+import click
+from flask import current_app
+
+from helpers.assets import build_assets
+
+
+@click.command("build-assets")
+def build_assets_command():
+    """Minificira CSS/JS in jih zapiše v static/dist z vsebinskim hashem."""
+    static_folder = current_app.static_folder
+    manifest = build_assets(static_folder)
+    for source, hashed in manifest.items():
+        original = os.path.getsize(os.path.join(static_folder, source))
+        built = os.path.join(static_folder, "dist", hashed)
+        click.echo(
+            f"{source:<20} -> {hashed:<32} {original:>7} B -> {os.path.getsize(built):>7} B "
+            f"(gzip {os.path.getsize(built + '.gz'):>6} B)"
+        )
@@ -0,0 +1,421 @@
+# jobs/bulk_import.py - Paketni uvoz zgodovinskih sej in sintetični podatki
+
+"""
+`flask import-sessions` uvozi seje, posnete zunaj aplikacije, iz NDJSON ali
+CSV datotek. Vrstica je en dogodek (kot pri `flask replay`):
+
+    {"session": "robot-7", "trigger": "greet", "timestamp": "2024-03-01T10:00:00"}
+
+CSV ima enake stolpce (session, trigger, timestamp; neobvezno še
+inferred_intent in robot_id). Vsaka seja gre skozi RuleEngine in RobotFSM,
+zato so state_before/state_after/escalation_count enaki, kot bi jih
+zabeležila aplikacija. Ko FSM doseže končno stanje, se preostali dogodki
+zapišejo v novo sejo (kot v aplikaciji).
+
+`flask seed-synthetic` ustvari sintetične seje: zaporedja triggerjev se
+vzorčijo iz prehodov med zaporednimi expected_triggers scenarijev v
+REFERENCE_SCENARIOS (z nekaj šuma) in tečejo skozi RobotFSM do konca.
+
+Zapisovanje je paketno: seje z enim INSERT ... RETURNING na paket,
+interakcije z executemany (na PostgreSQL s COPY), commit na paket.
+Z --defer-indexes se sekundarni indeksi tabele interactions odstranijo
+in zgradijo šele na koncu. Izpeljane tabele (rollupi, evalvacije) se
+posodobijo z `flask rebuild-rollups` in `flask reevaluate`.
+"""
+
+import csv
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
+
+import click
+from sqlalchemy import func, insert, select
+
+from core import RobotFSM, RuleEngine
+from db import db, SessionLog, InteractionLog
+from evaluation.scenarios import REFERENCE_SCENARIOS
+
+from .replay import DEFAULT_SESSION, open_trace
+
+DEFAULT_BATCH_SIZE = 50000
+IMPORTED_REASON = "imported"
+
+# Stolpci interakcij v vrstnem redu zapisa (tudi za COPY)
+INTERACTION_FIELDS = (
+    "session_id", "step_number", "timestamp", "state_before", "state_after", "trigger",
+    "inferred_intent", "robot_speech_act", "robot_utterance", "priority", "escalation_count", "repeat_count",
+)
+
+
+def copy_field(value) -> str:
+    """
+    Polje za COPY ... (FORMAT csv): None je neobkrožen prazen niz (NULL),
+    niz je vedno v narekovajih (prazen niz ostane prazen niz).
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+# ----- Branje -----
+
+def parse_timestamp(value):
+    """ISO niz ali Unix čas (sekunde) -> naiven UTC datetime; None ostane None."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        return datetime.fromtimestamp(float(value), tz=timezone.utc).replace(tzinfo=None)
+    parsed = datetime.fromisoformat(str(value))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def read_records(path, fmt: str = "auto", stats: dict = None):
+    """Generator zapisov (dict) iz NDJSON ali CSV datoteke (tudi .gz)."""
+    stats = stats if stats is not None else {}
+    stats.setdefault("skipped", 0)
+    if fmt == "auto":
+        fmt = "csv" if path.removesuffix(".gz").endswith(".csv") else "ndjson"
+    with open_trace(path) as fh:
+        if fmt == "csv":
+            yield from csv.DictReader(fh)
+            return
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                stats["skipped"] += 1
+                continue
+            if isinstance(record, dict):
+                yield record
+            else:
+                stats["skipped"] += 1
+
+
+def group_events(records, grouped: bool = False, stats: dict = None):
+    """
+    Združi zapise po seji: generator (ključ seje, robot_id, [(trigger, čas, intent)]).
+
+    Pri grouped (vhod urejen po sejah) se seja izda takoj, ko se ključ
+    zamenja; sicer se seje zberejo v pomnilniku in izdajo na koncu.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("skipped", 0)
+    active = {}
+    previous = None
+    for record in records:
+        trigger = record.get("trigger")
+        if not trigger:
+            stats["skipped"] += 1
+            continue
+        key = str(record.get("session") or record.get("session_id") or DEFAULT_SESSION)
+        if grouped and previous is not None and key != previous and previous in active:
+            yield (previous, *active.pop(previous))
+        previous = key
+        try:
+            timestamp = parse_timestamp(record.get("timestamp"))
+        except ValueError:
+            stats["skipped"] += 1
+            continue
+        entry = active.get(key)
+        if entry is None:
+            entry = active[key] = (record.get("robot_id") or None, [])
+        entry[1].append((trigger, timestamp, record.get("inferred_intent") or None))
+    for key, (robot_id, events) in active.items():
+        yield key, robot_id, events
+
+
+# ----- Seje skozi FSM -----
+
+class SessionBuilder:
+    """Vrstice seje in njenih interakcij, kot bi jih zapisala aplikacija."""
+
+    def __init__(self, rules: RuleEngine):
+        self.rules = rules
+        self._responses = {}
+        self.fsm = None
+        self.session = None
+        self.interactions = None
+
+    def _response(self, trigger):
+        response = self._responses.get(trigger)
+        if response is None:
+            text, intent, speech_act, priority = self.rules.response(trigger)
+            response = self._responses[trigger] = (intent, speech_act, text, priority)
+        return response
+
+    def start(self, started_at: datetime, robot_id: str = None):
+        self.fsm = RobotFSM()
+        self.session = {"started_at": started_at, "last_activity_at": started_at, "robot_id": robot_id}
+        self.interactions = []
+
+    def step(self, trigger: str, timestamp: datetime, intent: str = None) -> bool:
+        """Doda korak; vrne True, če je seja s tem dosegla končno stanje."""
+        default_intent, speech_act, utterance, priority = self._response(trigger)
+        intent = intent or default_intent
+        fsm = self.fsm
+        state_before = fsm.state
+        state_after = fsm.update_state(intent, trigger=trigger)
+        self.interactions.append({
+            "step_number": fsm.step_count,
+            "timestamp": timestamp,
+            "state_before": state_before,
+            "state_after": state_after,
+            "trigger": trigger,
+            "inferred_intent": intent,
+            "robot_speech_act": speech_act,
+            "robot_utterance": utterance,
+            "priority": priority,
+            "escalation_count": fsm.total_escalations(),
+            "repeat_count": 1,
+        })
+        self.session["last_activity_at"] = timestamp
+        return fsm.is_final()
+
+    def finish(self):
+        """Zaključi sejo (končno stanje ali `imported`) in vrne (seja, interakcije)."""
+        session = self.session
+        session["ended_at"] = session["last_activity_at"]
+        session["end_reason"] = (self.fsm.end_reason or "final") if self.fsm.is_final() else IMPORTED_REASON
+        return session, self.interactions
+
+
+def imported_sessions(groups, rules: RuleEngine):
+    """Generator (seja, interakcije) za uvožene skupine dogodkov."""
+    builder = SessionBuilder(rules)
+    now = datetime.utcnow()
+    for _, robot_id, events in groups:
+        events.sort(key=lambda e: e[1] or now)          # stabilno: brez časa ostane vrstni red
+        builder.start(events[0][1] or now, robot_id)
+        for position, (trigger, timestamp, intent) in enumerate(events):
+            if builder.step(trigger, timestamp or now, intent) and position < len(events) - 1:
+                yield builder.finish()
+                builder.start(events[position + 1][1] or now, robot_id)
+        yield builder.finish()
+
+
+def scenario_transitions(scenarios=REFERENCE_SCENARIOS) -> dict:
+    """{scenario_id: (prvi trigger, {trigger: [nasledniki]})} iz expected_triggers."""
+    result = {}
+    for sid, scenario in scenarios.items():
+        pattern = scenario.get("expected_triggers") or []
+        if not pattern:
+            continue
+        following = {}
+        for current, nxt in zip(pattern, pattern[1:] + pattern[:1]):
+            following.setdefault(current, []).append(nxt)
+        result[sid] = (pattern[0], following)
+    return result
+
+
+def synthetic_sessions(count: int, rules: RuleEngine, rng: random.Random, days: float = 90.0,
+                       noise: float = 0.15, max_steps: int = 60):
+    """
+    Generator (seja, interakcije) za `count` sintetičnih sej, začetki
+    enakomerno v zadnjih `days` dneh. Seja teče do končnega stanja FSM
+    ali do max_steps korakov.
+    """
+    transitions = scenario_transitions()
+    scenario_ids = list(transitions)
+    all_triggers = rules.get_triggers()
+    builder = SessionBuilder(rules)
+    end = datetime.utcnow()
+    span = days * 86400.0
+
+    for _ in range(count):
+        first, following = transitions[rng.choice(scenario_ids)]
+        at = end - timedelta(seconds=rng.random() * span)
+        builder.start(at)
+        trigger = first
+        for _ in range(max_steps):
+            if builder.step(trigger, at):
+                break
+            at += timedelta(seconds=rng.uniform(2.0, 20.0))
+            if rng.random() < noise:
+                trigger = rng.choice(all_triggers)
+            else:
+                trigger = rng.choice(following.get(trigger) or [first])
+        yield builder.finish()
+
+
+# ----- Zapisovanje -----
+
+class BulkWriter:
+    """Paketni zapis sej in interakcij z enim commitom na paket."""
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, use_copy: bool = True):
+        self.batch_size = max(1, batch_size)
+        self.dialect = db.engine.dialect
+        self.use_copy = use_copy and self.dialect.name == "postgresql" and self.dialect.driver == "psycopg2"
+        self.insert_sql, self.processors = self._driver_insert()
+        self.sessions = []
+        self.interactions = []
+        self.pending = 0
+        self.totals = {"sessions": 0, "interactions": 0, "commits": 0}
+
+    def add(self, session: dict, interactions: list):
+        self.sessions.append(session)
+        self.interactions.append(interactions)
+        self.pending += len(interactions)
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def _insert_sessions(self, conn) -> list:
+        """Vstavi seje paketa in vrne njihove id-je v vrstnem redu."""
+        table = SessionLog.__table__
+        if self.dialect.name == "sqlite":
+            # Pisalni zaklep velja do commita, zato so id-ji paketa zaporedni
+            conn.execute(insert(table), self.sessions)
+            last = conn.execute(select(func.max(table.c.id))).scalar()
+            return list(range(last - len(self.sessions) + 1, last + 1))
+        if self.dialect.insert_executemany_returning_sort_by_parameter_order:
+            stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+            return list(conn.execute(stmt, self.sessions).scalars())
+        return [conn.execute(insert(table), row).inserted_primary_key[0] for row in self.sessions]
+
+    def _driver_insert(self):
+        """
+        INSERT interakcij v paramstyle gonilnika in pretvorniki tipov po
+        stolpcih - executemany s tuple vrsticami obide obdelavo parametrov
+        v SQLAlchemy po vrstici.
+        """
+        placeholder = {"qmark": "?", "format": "%s", "pyformat": "%s"}.get(self.dialect.paramstyle)
+        if placeholder is None:
+            return None, None
+        table = InteractionLog.__table__
+        quote = self.dialect.identifier_preparer.quote
+        sql = (
+            f"INSERT INTO {quote(table.name)} ({', '.join(quote(f) for f in INTERACTION_FIELDS)}) "
+            f"VALUES ({', '.join([placeholder] * len(INTERACTION_FIELDS))})"
+        )
+        processors = [table.c[f].type.bind_processor(self.dialect) for f in INTERACTION_FIELDS]
+        return sql, processors
+
+    @staticmethod
+    def _convert(values: list, converted) -> list:
+        for k, process in converted:
+            if values[k] is not None:
+                values[k] = process(values[k])
+        return values
+
+    def _insert_interactions(self, conn, rows: list):
+        if self.use_copy:
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write(",".join([copy_field(row[f]) for f in INTERACTION_FIELDS]) + "\n")
+            buffer.seek(0)
+            cursor = conn.connection.driver_connection.cursor()
+            cursor.copy_expert(
+                f"COPY interactions ({', '.join(INTERACTION_FIELDS)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        elif self.insert_sql is not None:
+            values = itemgetter(*INTERACTION_FIELDS)
+            converted = [(k, process) for k, process in enumerate(self.processors) if process is not None]
+            params = []
+            for row in rows:
+                params.append(values(row))
+                if converted:
+                    params[-1] = tuple(self._convert(list(params[-1]), converted))
+            conn.exec_driver_sql(self.insert_sql, params)
+        else:
+            conn.execute(insert(InteractionLog.__table__), rows)
+
+    def flush(self):
+        if not self.sessions:
+            return
+        conn = db.session.connection()
+        ids = self._insert_sessions(conn)
+        rows = []
+        for session_id, interactions in zip(ids, self.interactions):
+            for row in interactions:
+                row["session_id"] = session_id
+            rows.extend(interactions)
+        if rows:
+            self._insert_interactions(conn, rows)
+        db.session.commit()
+        self.totals["sessions"] += len(ids)
+        self.totals["interactions"] += len(rows)
+        self.totals["commits"] += 1
+        self.sessions, self.interactions, self.pending = [], [], 0
+
+
+def deferred_indexes(tables=(InteractionLog.__table__,)):
+    """Sekundarni (neunikatni) indeksi, ki jih lahko med uvozom odstranimo."""
+    return [index for table in tables for index in table.indexes if not index.unique]
+
+
+def write_sessions(sessions, batch_size: int, defer_indexes: bool, use_copy: bool) -> dict:
+    """Zapiše generator (seja, interakcije); po želji brez indeksov med zapisom."""
+    indexes = deferred_indexes() if defer_indexes else []
+    for index in indexes:
+        index.drop(db.engine, checkfirst=True)
+    writer = BulkWriter(batch_size, use_copy)
+    try:
+        for session, interactions in sessions:
+            writer.add(session, interactions)
+        writer.flush()
+    finally:
+        db.session.rollback()
+        for index in indexes:
+            index.create(db.engine, checkfirst=True)
+    return writer.totals
+
+
+def _report(label: str, totals: dict, started: float):
+    elapsed = time.perf_counter() - started
+    rate = totals["interactions"] / elapsed if elapsed > 0 else 0
+    click.echo(
+        f"{label}: {totals['sessions']} sej, {totals['interactions']} interakcij, "
+        f"{totals['commits']} commitov, {elapsed:.1f} s ({rate:,.0f} vrstic/s)"
+    )
+    click.echo("Izpeljane tabele osvežimo z `flask rebuild-rollups` in `flask reevaluate`.")
+
+
+@click.command("import-sessions")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(["auto", "ndjson", "csv"]), default="auto")
+@click.option("--grouped", is_flag=True, help="Vhod je urejen po sejah (konstanten pomnilnik).")
+@click.option("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Interakcij na paket (in commit).")
+@click.option("--defer-indexes", is_flag=True, help="Indekse tabele interactions zgradi šele po uvozu.")
+@click.option("--no-copy", is_flag=True, help="Na PostgreSQL uporabi executemany namesto COPY.")
+def import_sessions_command(paths, fmt, grouped, batch_size, defer_indexes, no_copy):
+    """Uvozi zgodovinske seje iz NDJSON/CSV datotek (paketni zapis)."""
+    started = time.perf_counter()
+    stats = {}
+    rules = RuleEngine()
+
+    def records():
+        for path in paths:
+            yield from read_records(path, fmt, stats)
+
+    sessions = imported_sessions(group_events(records(), grouped, stats), rules)
+    totals = write_sessions(sessions, batch_size, defer_indexes, not no_copy)
+    _report("Uvoženo", totals, started)
+    if stats.get("skipped"):
+        click.echo(f"Preskočenih vrstic: {stats['skipped']}")
+
+
+@click.command("seed-synthetic")
+@click.option("--sessions", "count", type=int, default=10000, help="Število sintetičnih sej.")
+@click.option("--seed", type=int, default=None, help="Seme naključnega generatorja (ponovljivost).")
+@click.option("--days", type=float, default=90.0, help="Začetki sej enakomerno v zadnjih N dneh.")
+@click.option("--noise", type=float, default=0.15, help="Verjetnost naključnega triggerja namesto pričakovanega.")
+@click.option("--max-steps", type=int, default=60, help="Največ korakov na sejo.")
+@click.option("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Interakcij na paket (in commit).")
+@click.option("--defer-indexes", is_flag=True, help="Indekse tabele interactions zgradi šele po uvozu.")
+@click.option("--no-copy", is_flag=True, help="Na PostgreSQL uporabi executemany namesto COPY.")
+def seed_synthetic_command(count, seed, days, noise, max_steps, batch_size, defer_indexes, no_copy):
+    """Ustvari sintetične seje iz REFERENCE_SCENARIOS skozi RobotFSM."""
+    started = time.perf_counter()
+    sessions = synthetic_sessions(count, RuleEngine(), random.Random(seed), days, noise, max_steps)
+    totals = write_sessions(sessions, batch_size, defer_indexes, not no_copy)
+    _report("Ustvarjeno", totals, started)
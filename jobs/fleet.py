@@ -0,0 +1,18 @@
+# jobs/fleet.py - Registracija robotov flote (flask register-robot)
+
+import click
+from flask.cli import with_appcontext
+
+from helpers.fleet import issue_token
+
+
+@click.command("register-robot")
+@click.argument("robot_id")
+@with_appcontext
+def register_robot_command(robot_id):
+    """Registrira robota (ali zamenja žeton) in izpiše nov žeton za /api/fleet."""
+    if len(robot_id) > 64:
+        raise click.BadParameter("ID robota je lahko dolg največ 64 znakov.")
+    token = issue_token(robot_id)
+    click.echo(f"Robot: {robot_id}")
+    click.echo(f"Žeton: {token}")
@@ -0,0 +1,91 @@
+# jobs/maintenance.py - Vzdrževalni ukazi nad bazo
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from db import db
+from helpers.rollups import rebuild_rollups
+from helpers.session_timeouts import sweep_stale_sessions
+
+
+@click.command("close-stale-sessions")
+@click.option("--timeout", type=int, default=None, help="Sekunde neaktivnosti (privzeto SESSION_TIMEOUT_SECONDS).")
+@click.option("--batch-size", type=int, default=None)
+@with_appcontext
+def close_stale_sessions_command(timeout, batch_size):
+    """Zapre vse odprte neaktivne seje in izbriše prazne (npr. za cron)."""
+    timeout = timeout or current_app.config["SESSION_TIMEOUT_SECONDS"]
+    batch_size = batch_size or current_app.config["SESSION_TIMEOUT_BATCH"]
+    result = sweep_stale_sessions(timeout, batch_size, max_batches=10**9)
+    click.echo(f"Zaprtih sej: {result['closed']}, izbrisanih praznih: {result['deleted']}")
+
+
+@click.command("rebuild-rollups")
+@click.option("--chunk-size", type=int, default=1000, help="Sej na poizvedbo.")
+@with_appcontext
+def rebuild_rollups_command(chunk_size):
+    """Na novo izračuna časovne agregate sej (backfill ali popravek po spremembi točkovanja)."""
+    result = rebuild_rollups(chunk_size)
+    db.session.commit()
+    click.echo(f"Sej: {result['sessions']}, ocenjenih: {result['rated']}, veder: {result['buckets']}")
+
+
+@click.command("rebuild-markov")
+@with_appcontext
+def rebuild_markov_command():
+    """Na novo prešteje empirični Markov model prehodov iz celotnega loga."""
+    from core import RuleEngine
+    from helpers.markov import rebuild_models
+
+    models = rebuild_models(RuleEngine().index)
+    for name, model in models.items():
+        click.echo(f"{name}: {model.observations} prehodov, do interakcije #{model.watermark}")
+
+
+@click.command("refresh-markov")
+@with_appcontext
+def refresh_markov_command():
+    """Prišteje Markov modelu interakcije, novejše od vodnega žiga (npr. iz crona, če je MARKOV_REFRESH_SECONDS=0)."""
+    from core import RuleEngine
+    from helpers.markov import refresh_models
+
+    models = refresh_models(RuleEngine().index)
+    for name, model in models.items():
+        click.echo(f"{name}: {model.observations} prehodov, do interakcije #{model.watermark}, vrzeli: {len(model.gaps)}")
+
+
+@click.command("rebuild-similarity")
+@click.option("--chunk-size", type=int, default=1000, help="Sej na poizvedbo.")
+@with_appcontext
+def rebuild_similarity_command(chunk_size):
+    """Na novo izračuna vektorje sej za iskanje podobnih sej."""
+    from helpers.similarity import rebuild_index
+
+    index = rebuild_index(chunk_size)
+    click.echo(f"Vektorjev: {len(index)}, do interakcije #{index.watermark}")
+
+
+@click.command("refresh-similarity")
+@with_appcontext
+def refresh_similarity_command():
+    """Posodobi vektorje sej, spremenjenih od zadnjega izračuna (npr. iz crona, če je SIMILARITY_REFRESH_SECONDS=0)."""
+    from helpers.similarity import refresh_index
+
+    index = refresh_index()
+    click.echo(f"Sej v indeksu: {len(index)}, do interakcije #{index.watermark}")
+
+
+@click.command("refresh-analytics-copy")
+@click.option("--chunk-size", type=int, default=5000, help="Vrstic na paket (pri kopiranju iz ne-SQLite baze).")
+@with_appcontext
+def refresh_analytics_copy_command(chunk_size):
+    """Osveži lokalno SQLite kopijo za analitiko (ANALYTICS_DATABASE_URL), npr. iz crona."""
+    from sqlalchemy.engine import make_url
+    from db.routing import refresh_sqlite_copy
+
+    url = current_app.config["ANALYTICS_DATABASE_URL"]
+    if not url or make_url(url).get_backend_name() != "sqlite":
+        raise click.UsageError("ANALYTICS_DATABASE_URL mora kazati na SQLite datoteko (sqlite:///pot/do/kopije.db).")
+    counts = refresh_sqlite_copy(db.engine, make_url(url).database, chunk_size)
+    click.echo(", ".join(f"{table}: {rows}" for table, rows in counts.items()))
@@ -0,0 +1,104 @@
+# jobs/reevaluate.py - Ponovna evalvacija vseh sej (flask reevaluate)
+
+"""
+Po spremembi REFERENCE_SCENARIOS ali točkovanja v evaluation/functions.py
+ponovno oceni vse shranjene seje.
+
+Seje se berejo iz baze v kosih (keyset po id), kos se razdeli med procese,
+ki poganjajo generate_functional_evaluation, rezultati pa se zapišejo v
+enem paketu na kos. Med tem, ko procesi računajo, glavni proces že bere
+naslednji kos.
+
+Seje in vrstice se berejo z bralne baze (ANALYTICS_DATABASE_URL, glej
+db/routing.py), evalvacije pa se pišejo v primarno bazo.
+
+Vsak kos se potrdi s svojim commitom, zato prekinjen zagon nadaljuje tam,
+kjer je ostal: brez --force se obdelajo samo seje, ki še nimajo evalvacije
+s trenutnim scoring_version.
+"""
+
+import os
+import time
+from multiprocessing import Pool
+
+import click
+from sqlalchemy import and_, exists, func, select
+
+from db import db, read_session, SessionLog, InteractionLog, SessionEvaluation
+from helpers.evaluations import load_evaluation_rows, store_evaluations
+import evaluation
+
+
+def _pending_filter(force: bool):
+    """Seje z vsaj eno interakcijo (in brez veljavne evalvacije, če ni --force)."""
+    conditions = [exists().where(InteractionLog.session_id == SessionLog.id)]
+    if not force:
+        conditions.append(~exists().where(and_(
+            SessionEvaluation.session_id == SessionLog.id,
+            SessionEvaluation.scoring_version == evaluation.scoring_version(),
+        )))
+    return conditions
+
+
+def iter_session_chunks(chunk_size: int, force: bool = False, after_id: int = 0):
+    """Generator kosov [(session_id, [vrstice])] urejenih po id (z bralne baze)."""
+    conditions = _pending_filter(force)
+    last_id = after_id
+    reader = read_session()
+    while True:
+        ids = list(reader.execute(
+            select(SessionLog.id)
+            .where(SessionLog.id > last_id, *conditions)
+            .order_by(SessionLog.id)
+            .limit(chunk_size)
+        ).scalars())
+        if not ids:
+            return
+        rows = load_evaluation_rows(ids, reader)
+        yield [(sid, rows[sid]) for sid in ids]
+        last_id = ids[-1]
+
+
+def _evaluate(item):
+    """Delavec: (session_id, vrstice) -> (session_id, evalvacija)."""
+    session_id, rows = item
+    return session_id, evaluation.generate_functional_evaluation(rows)
+
+
+@click.command("reevaluate")
+@click.option("--workers", type=int, default=None, help="Število procesov (privzeto vsa jedra).")
+@click.option("--chunk-size", type=int, default=500, help="Seje na kos (in na commit).")
+@click.option("--force", is_flag=True, help="Oceni vse seje, tudi tiste z veljavno evalvacijo.")
+@click.option("--after-id", type=int, default=0, help="Začni za to sejo (nadaljevanje pri --force).")
+def reevaluate_command(workers, chunk_size, force, after_id):
+    """Ponovno oceni vse seje in rezultate shrani v session_evaluations."""
+    workers = workers or os.cpu_count() or 1
+    total = read_session().execute(
+        select(func.count()).select_from(SessionLog).where(SessionLog.id > after_id, *_pending_filter(force))
+    ).scalar()
+    click.echo(f"Za evalvacijo: {total} sej, verzija točkovanja {evaluation.scoring_version()}, procesov: {workers}")
+    if not total:
+        return
+
+    started = time.perf_counter()
+    done = 0
+    chunks = iter_session_chunks(chunk_size, force, after_id)
+
+    with Pool(processes=workers) as pool:
+        chunk = next(chunks, None)
+        while chunk is not None:
+            pending = pool.map_async(_evaluate, chunk, chunksize=max(1, len(chunk) // (workers * 4)))
+            # medtem ko procesi računajo, preberemo naslednji kos
+            next_chunk = next(chunks, None)
+
+            store_evaluations(pending.get())
+            db.session.commit()
+
+            done += len(chunk)
+            elapsed = time.perf_counter() - started
+            rate = done / elapsed if elapsed > 0 else 0
+            eta = (total - done) / rate if rate > 0 else 0
+            click.echo(f"  {done}/{total} sej ({rate:,.0f} sej/s, še ~{eta:.0f} s), zadnja seja #{chunk[-1][0]}")
+            chunk = next_chunk
+
+    click.echo(f"Končano: {done} sej v {time.perf_counter() - started:.1f} s")
@@ -0,0 +1,263 @@
+# jobs/replay.py - Hitro predvajanje sledi triggerjev brez HTTP (flask replay)
+
+"""
+Bere NDJSON sledi (ena vrstica = en dogodek) in jih potisne skozi
+RuleEngine + RobotFSM. Vhod in izhod sta tokova (generatorji), zato
+velikost datoteke ne vpliva na porabo pomnilnika.
+
+Vhodna vrstica (ostala polja se ignorirajo):
+    {"session": "robot-7", "trigger": "User face stressed", "timestamp": "..."}
+
+Namesto "session" je lahko "session_id" (izvoz InteractionLog). Vrstice
+brez "trigger" se preskočijo. Datoteke s končnico .gz se berejo sproti.
+
+Ko FSM doseže končno stanje, se seja zaključi (povzetek) in naslednji
+dogodek istega ključa začne novo sejo z novim FSM - kot v aplikaciji in
+pri `flask import-sessions`. Zaporedna seja istega ključa je v "segment".
+
+Izhod (NDJSON):
+    {"type": "transition", "session": ..., "segment": 0, "step": ..., "state_before": ..., ...}
+    {"type": "summary", "session": ..., "segment": 0, "final_state": ..., "evaluation": {...}}
+
+Pri --workers N glavni proces vrstice prebere in razčleni enkrat, dogodke
+pa v paketih razdeli procesom po seji (crc32(session) % N).
+"""
+
+import gzip
+import json
+import os
+import shutil
+import sys
+import time
+import zlib
+from multiprocessing import get_context
+
+import click
+
+from core import RobotFSM, RuleEngine, UNKNOWN_INTENT
+
+DEFAULT_SESSION = "default"
+DISPATCH_BATCH = 2000           # dogodkov v enem paketu za proces (--workers)
+
+
+def open_trace(path):
+    """Odpre sled za branje (navadna ali .gz datoteka, '-' je stdin)."""
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def read_events(path, stats: dict = None):
+    """Generator dogodkov (session, trigger, timestamp) iz NDJSON sledi."""
+    stats = stats if stats is not None else {}
+    stats.setdefault("skipped", 0)
+    with open_trace(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                stats["skipped"] += 1
+                continue
+            trigger = record.get("trigger") if isinstance(record, dict) else None
+            if not trigger:
+                stats["skipped"] += 1
+                continue
+            session = str(record.get("session", record.get("session_id", DEFAULT_SESSION)))
+            yield session, trigger, record.get("timestamp")
+
+
+def replay_events(events, rules: RuleEngine, evaluate: bool = True, grouped: bool = False):
+    """
+    Generator izhodnih zapisov za podane dogodke.
+
+    Args:
+        evaluate: na koncu seje dodaj funkcionalno evalvacijo
+        grouped: vhod je urejen po sejah - povzetek seje se izpiše (in
+                 njeno stanje sprosti) takoj, ko se seja zamenja
+    """
+    if evaluate:
+        from evaluation import generate_functional_evaluation
+
+    active = {}         # session -> (fsm, rows, segment)
+    segments = {}       # session -> število že zaključenih sej tega ključa
+    previous = None
+
+    def summary(session):
+        fsm, rows, segment = active.pop(session)
+        segments[session] = segment + 1
+        record = {
+            "type": "summary",
+            "session": session,
+            "segment": segment,
+            "steps": fsm.step_count,
+            "final_state": fsm.state,
+            "end_reason": fsm.end_reason,
+            "statistics": fsm.get_statistics(),
+        }
+        if evaluate:
+            record["evaluation"] = generate_functional_evaluation(rows)
+        return record
+
+    for session, trigger, timestamp in events:
+        if grouped and previous is not None and session != previous:
+            if previous in active:
+                yield summary(previous)
+            segments.pop(previous, None)
+        previous = session
+
+        entry = active.get(session)
+        if entry is None:
+            entry = active[session] = (RobotFSM(), [] if evaluate else None, segments.get(session, 0))
+        fsm, rows, segment = entry
+
+        rule = rules.select_rule(trigger)
+        inferred_intent = rule["inferred_intent"] if rule else UNKNOWN_INTENT
+
+        state_before = fsm.state
+        state_after = fsm.update_state(inferred_intent, trigger=trigger)
+        escalations = fsm.total_escalations()
+
+        if rows is not None:
+            # samo polja, ki jih uporablja evalvacija
+            rows.append({
+                "trigger": trigger,
+                "inferred_intent": inferred_intent,
+                "state_after": state_after,
+                "escalation_count": escalations,
+            })
+
+        yield {
+            "type": "transition",
+            "session": session,
+            "segment": segment,
+            "step": fsm.step_count,
+            "timestamp": timestamp,
+            "trigger": trigger,
+            "inferred_intent": inferred_intent,
+            "state_before": state_before,
+            "state_after": state_after,
+            "utterance": rule["robot_text"] if rule else None,
+            "escalations": escalations,
+            "should_suggest_end": fsm.should_suggest_end,
+        }
+
+        # Končno stanje zaključi sejo (end_reason se ob naslednjem koraku pobriše)
+        if fsm.is_final():
+            yield summary(session)
+
+    for session in list(active):
+        yield summary(session)
+
+
+def write_records(records, out) -> dict:
+    """Zapiše zapise kot NDJSON in vrne števce."""
+    counts = {"transitions": 0, "sessions": 0}
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for record in records:
+        out.write(dumps(record))
+        out.write("\n")
+        if record["type"] == "transition":
+            counts["transitions"] += 1
+        else:
+            counts["sessions"] += 1
+    return counts
+
+
+def _queued_events(queue):
+    """Dogodki iz paketov v vrsti do None."""
+    while True:
+        batch = queue.get()
+        if batch is None:
+            return
+        yield from batch
+
+
+def run_shard(queue, output, evaluate, grouped, results):
+    """Predvaja dogodke enega sharda iz vrste v svojo izhodno datoteko (teče v podprocesu)."""
+    with open(output, "w", encoding="utf-8") as out:
+        results.put(write_records(replay_events(_queued_events(queue), RuleEngine(), evaluate, grouped), out))
+
+
+def dispatch_events(events, queues):
+    """Razdeli dogodke procesom po seji v paketih DISPATCH_BATCH; na koncu pošlje None."""
+    shards = len(queues)
+    batches = [[] for _ in queues]
+    for event in events:
+        k = zlib.crc32(event[0].encode("utf-8")) % shards
+        batch = batches[k]
+        batch.append(event)
+        if len(batch) >= DISPATCH_BATCH:
+            queues[k].put(batch)
+            batches[k] = []
+    for queue, batch in zip(queues, batches):
+        if batch:
+            queue.put(batch)
+        queue.put(None)
+
+
+@click.command("replay")
+@click.argument("trace", type=click.Path(allow_dash=True))
+@click.option("-o", "--output", type=click.Path(allow_dash=True), default="-", help="Izhodna NDJSON datoteka (privzeto stdout).")
+@click.option("--workers", type=int, default=1, help="Število procesov; seje se razdelijo po shardih (vhod se razčleni enkrat).")
+@click.option("--no-eval", is_flag=True, help="Brez funkcionalne evalvacije ob koncu seje.")
+@click.option("--grouped", is_flag=True, help="Vhod je urejen po sejah (konstanten pomnilnik pri mnogo sejah).")
+def replay_command(trace, output, workers, no_eval, grouped):
+    """Predvaja sled triggerjev skozi RuleEngine in RobotFSM."""
+    started = time.perf_counter()
+    evaluate = not no_eval
+
+    if workers <= 1:
+        stats = {}
+        events = read_events(trace, stats=stats)
+        out = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+        try:
+            counts = write_records(replay_events(events, RuleEngine(), evaluate, grouped), out)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        counts["skipped"] = stats["skipped"]
+    else:
+        if output == "-":
+            raise click.UsageError("--workers > 1 potrebuje izhodno datoteko.")
+        ctx = get_context()
+        parts = [f"{output}.part{k}" for k in range(workers)]
+        queues = [ctx.Queue(maxsize=8) for _ in range(workers)]
+        results = ctx.Queue()
+        processes = [
+            ctx.Process(target=run_shard, args=(queues[k], parts[k], evaluate, grouped, results))
+            for k in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        stats = {}
+        try:
+            dispatch_events(read_events(trace, stats=stats), queues)
+            shard_counts = [results.get() for _ in processes]
+        finally:
+            for process in processes:
+                process.join()
+        if any(process.exitcode for process in processes):
+            raise click.ClickException("Predvajanje v podprocesu ni uspelo.")
+        with open(output, "w", encoding="utf-8") as out:
+            for part in parts:
+                with open(part, "r", encoding="utf-8") as fh:
+                    shutil.copyfileobj(fh, out)
+                os.remove(part)
+        counts = {
+            "transitions": sum(r["transitions"] for r in shard_counts),
+            "sessions": sum(r["sessions"] for r in shard_counts),
+            "skipped": stats["skipped"],
+        }
+
+    elapsed = time.perf_counter() - started
+    rate = counts["transitions"] / elapsed if elapsed > 0 else 0
+    click.echo(
+        f"Prehodov: {counts['transitions']}, sej: {counts['sessions']}, "
+        f"preskočenih vrstic: {counts['skipped']}, čas: {elapsed:.2f} s ({rate:,.0f} prehodov/s)",
+        err=True,
+    )
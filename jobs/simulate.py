@@ -0,0 +1,286 @@
+# jobs/simulate.py - Monte Carlo simulacija sej s sintetičnimi uporabniki (flask simulate-sessions)
+
+"""
+Sintetični uporabniki oddajajo triggerje, ki gredo skozi RuleEngine in
+RobotFSM kot v aplikaciji - v bazo se zapišejo le posodobljeni Markov števci
+(--model markov). Modela uporabnikov:
+- "scenario": uporabnik dobi profil iz REFERENCE_SCENARIOS in sledi
+  zaporedju njegovih expected_triggers (z verjetnostjo noise naključen trigger),
+- "markov": trigger se vzorči iz porazdelitve triggerjev v trenutnem stanju
+  FSM, kot jo kaže log (helpers/markov.state_trigger_probabilities, števci se
+  pred simulacijo posodobijo).
+
+Seje so razdeljene na kose po CHUNK_SIZE; vsaka seja ima svoj tok naključnih
+števil (SeedSequence(seed, spawn_key=(kos, indeks))), zato je rezultat pri
+istem semenu enak ne glede na število procesov. Kosi vrnejo samo agregate
+(histogrami korakov in eskalacij, razlogi zaključka), ki se seštejejo.
+
+Če so podani pragovi, ki se razlikujejo od trenutnih, se ista populacija
+(ista semena) simulira še s trenutnimi pragovi za primerjavo. Ker ima vsaka
+seja svoje seme, dobi isti uporabnik pri obeh pragovih isti profil in iste
+žrebe - primerjava je parna, tudi če se dolžine sej razlikujejo.
+"""
+
+import json
+import os
+import random
+import time
+from bisect import bisect
+from collections import Counter
+from itertools import accumulate
+from multiprocessing import Pool
+
+import click
+import numpy as np
+
+from core import FSMConfig, RobotFSM, RuleEngine, UNKNOWN_INTENT
+from core.fsm import default_config
+
+from .bulk_import import scenario_transitions
+
+CHUNK_SIZE = 5000
+OPEN = "open"                 # seja je dosegla max_steps
+FORCED = "forced"             # uporabnik je sprejel predlog zaključka
+
+# Stanje procesa (nastavi _init_worker)
+_model = None
+_rules = None
+_options = None
+
+
+# ----- Modeli uporabnikov -----
+
+class ScenarioUserModel:
+    """Uporabnik sledi vzorcu expected_triggers naključnega scenarija (s šumom)."""
+
+    name = "scenario"
+
+    def __init__(self, triggers, noise: float = 0.15, profiles=None):
+        self.transitions = scenario_transitions()
+        self.profiles = [p for p in (profiles or self.transitions) if p in self.transitions]
+        if not self.profiles:
+            raise ValueError("Ni scenarijev z expected_triggers.")
+        self.triggers = list(triggers)
+        self.noise = noise
+
+    def new_user(self, rng: random.Random):
+        """(profil, emit), emit(stanje FSM) vrne naslednji trigger."""
+        profile = rng.choice(self.profiles)
+        first, following = self.transitions[profile]
+        previous = None
+
+        def emit(state):
+            nonlocal previous
+            if previous is None:
+                trigger = first
+            elif rng.random() < self.noise:
+                trigger = rng.choice(self.triggers)
+            else:
+                trigger = rng.choice(following.get(previous) or [first])
+            previous = trigger
+            return trigger
+
+        return profile, emit
+
+
+class MarkovUserModel:
+    """Trigger se vzorči iz porazdelitve triggerjev v trenutnem stanju FSM."""
+
+    name = "markov"
+
+    def __init__(self, state_probs: dict):
+        """state_probs: {stanje: {trigger: p}}, None = porazdelitev za ostala stanja."""
+        self.tables = {
+            state: (list(probs), list(accumulate(probs.values())))
+            for state, probs in state_probs.items()
+            if probs
+        }
+        if not self.tables:
+            raise ValueError("Model triggerjev je prazen (ni zabeleženih interakcij).")
+        self.fallback = self.tables.get(None) or next(iter(self.tables.values()))
+
+    def new_user(self, rng: random.Random):
+        def emit(state):
+            triggers, cumulative = self.tables.get(state, self.fallback)
+            return triggers[min(bisect(cumulative, rng.random() * cumulative[-1]), len(triggers) - 1)]
+
+        return self.name, emit
+
+
+# ----- Agregati -----
+
+class SimulationStats:
+    """Sprotni agregati simuliranih sej (brez hranjenja posameznih sej)."""
+
+    def __init__(self, max_steps: int):
+        self.sessions = 0
+        self.suggested = 0
+        self.steps = [0] * (max_steps + 1)
+        self.escalations = Counter()
+        self.end_reasons = Counter()
+        self.profiles = Counter()
+
+    def add(self, profile: str, steps: int, escalations: int, reason: str, suggested: bool):
+        self.sessions += 1
+        self.suggested += suggested
+        self.steps[steps] += 1
+        self.escalations[escalations] += 1
+        self.end_reasons[reason] += 1
+        self.profiles[profile] += 1
+
+    def merge(self, other: "SimulationStats"):
+        self.sessions += other.sessions
+        self.suggested += other.suggested
+        self.steps = [a + b for a, b in zip(self.steps, other.steps)]
+        self.escalations.update(other.escalations)
+        self.end_reasons.update(other.end_reasons)
+        self.profiles.update(other.profiles)
+
+    def _steps_percentile(self, q: float) -> int:
+        target, seen = q * self.sessions, 0
+        for steps, count in enumerate(self.steps):
+            seen += count
+            if count and seen >= target:
+                return steps
+        return 0
+
+    def to_dict(self) -> dict:
+        n = self.sessions or 1
+        return {
+            "sessions": self.sessions,
+            "steps": {
+                "mean": round(sum(k * c for k, c in enumerate(self.steps)) / n, 3),
+                "p50": self._steps_percentile(0.5),
+                "p90": self._steps_percentile(0.9),
+                "p99": self._steps_percentile(0.99),
+                "histogram": {k: c for k, c in enumerate(self.steps) if c},
+            },
+            "escalations": {
+                "mean": round(sum(k * c for k, c in self.escalations.items()) / n, 3),
+                "histogram": dict(sorted(self.escalations.items())),
+            },
+            "end_reasons": {k: round(c / n, 5) for k, c in self.end_reasons.most_common()},
+            "suggested_end": round(self.suggested / n, 5),
+            "profiles": dict(self.profiles.most_common()),
+        }
+
+
+# ----- Simulacija -----
+
+def simulate_session(model, rules: RuleEngine, config: FSMConfig, rng: random.Random,
+                     max_steps: int, accept_end: float = 0.0) -> tuple:
+    """Ena seja: (profil, korakov, eskalacij, razlog zaključka, ali je bil predlagan zaključek)."""
+    profile, emit = model.new_user(rng)
+    fsm = RobotFSM(config=config)
+    suggested = False
+    reason = OPEN
+    for _ in range(max_steps):
+        trigger = emit(fsm.state)
+        rule = rules.select_rule(trigger)
+        fsm.update_state(rule["inferred_intent"] if rule else UNKNOWN_INTENT, trigger=trigger)
+        if fsm.is_final():
+            reason = fsm.end_reason or "final"
+            break
+        if fsm.should_suggest_end:
+            suggested = True
+            if accept_end and rng.random() < accept_end:
+                fsm.force_end()
+                reason = FORCED
+                break
+    return profile, fsm.step_count, fsm.total_escalations(), reason, suggested
+
+
+def session_seeds(seed: int, chunk: int, size: int) -> list:
+    """Neodvisna in ponovljiva semena sej kosa (ista za vse konfiguracije)."""
+    return [
+        int.from_bytes(np.random.SeedSequence(seed, spawn_key=(chunk, index)).generate_state(4).tobytes(), "little")
+        for index in range(size)
+    ]
+
+
+def _init_worker(model, options):
+    global _model, _rules, _options
+    _model, _rules, _options = model, RuleEngine(), options
+
+
+def run_chunk(args) -> list:
+    """Delavec: (kos, sej) -> [SimulationStats za vsak config], ista semena za vse."""
+    chunk, size = args
+    seeds = session_seeds(_options["seed"], chunk, size)
+    results = []
+    for config in _options["configs"]:
+        stats = SimulationStats(_options["max_steps"])
+        for session_seed in seeds:
+            rng = random.Random(session_seed)
+            stats.add(*simulate_session(_model, _rules, config, rng, _options["max_steps"], _options["accept_end"]))
+        results.append(stats)
+    return results
+
+
+@click.command("simulate-sessions")
+@click.option("--sessions", "count", type=int, default=100000, help="Število simuliranih sej.")
+@click.option("--model", type=click.Choice(["scenario", "markov"]), default="scenario", help="Model uporabnika.")
+@click.option("--scenario", "profiles", multiple=True, help="Samo ti profili REFERENCE_SCENARIOS (model scenario).")
+@click.option("--noise", type=float, default=0.15, help="Verjetnost naključnega triggerja (model scenario).")
+@click.option("--accept-end", type=float, default=0.0, help="Verjetnost, da uporabnik sprejme predlog zaključka.")
+@click.option("--max-steps", type=int, default=60, help="Največ korakov na sejo.")
+@click.option("--max-escalations", type=int, default=None, help="Prag FSM za preizkus (privzeto trenutni).")
+@click.option("--max-success-steps", type=int, default=None, help="Prag FSM za preizkus (privzeto trenutni).")
+@click.option("--explanation-steps", type=int, default=None, help="Prag FSM za preizkus (privzeto trenutni).")
+@click.option("--seed", type=int, default=0, help="Seme (enak rezultat ne glede na --workers).")
+@click.option("--workers", type=int, default=None, help="Število procesov (privzeto vsa jedra).")
+@click.option("-o", "--output", type=click.Path(), default=None, help="Celotni agregati kot JSON.")
+def simulate_sessions_command(count, model, profiles, noise, accept_end, max_steps, max_escalations,
+                              max_success_steps, explanation_steps, seed, workers, output):
+    """Simulira seje sintetičnih uporabnikov skozi RuleEngine in RobotFSM (brez zapisa v bazo)."""
+    current = default_config()
+    candidate = FSMConfig(
+        max_escalations=max_escalations or current.max_escalations,
+        max_success_steps=max_success_steps or current.max_success_steps,
+        explanation_steps=explanation_steps or current.explanation_steps,
+    )
+    configs = [candidate] if candidate == current else [candidate, current]
+
+    rules = RuleEngine()
+    try:
+        if model == "markov":
+            from helpers.markov import refresh_models, state_trigger_probabilities
+
+            users = MarkovUserModel(state_trigger_probabilities(refresh_models(rules.index)))
+        else:
+            users = ScenarioUserModel(rules.get_triggers(), noise, list(profiles) or None)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    chunks = [(k, min(CHUNK_SIZE, count - start)) for k, start in enumerate(range(0, count, CHUNK_SIZE))]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunks) or 1))
+    options = {"configs": configs, "seed": seed, "max_steps": max_steps, "accept_end": accept_end}
+    click.echo(f"Sej: {count}, model: {users.name}, kosov: {len(chunks)}, procesov: {workers}")
+
+    started = time.perf_counter()
+    totals = [SimulationStats(max_steps) for _ in configs]
+    with Pool(processes=workers, initializer=_init_worker, initargs=(users, options)) as pool:
+        for results in pool.imap_unordered(run_chunk, chunks):
+            for total, stats in zip(totals, results):
+                total.merge(stats)
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "model": users.name,
+        "seed": seed,
+        "max_steps": max_steps,
+        "results": [{"config": c.to_dict(), **t.to_dict()} for c, t in zip(configs, totals)],
+    }
+    for labelled, result in zip(("preizkus", "trenutni"), report["results"]):
+        c, steps = result["config"], result["steps"]
+        reasons = ", ".join(f"{k} {v:.1%}" for k, v in result["end_reasons"].items())
+        click.echo(
+            f"{labelled if len(configs) > 1 else 'pragovi'} esc={c['max_escalations']} "
+            f"success={c['max_success_steps']} expl={c['explanation_steps']}: korakov povp. {steps['mean']} "
+            f"(p50 {steps['p50']}, p90 {steps['p90']}), eskalacij povp. {result['escalations']['mean']}, "
+            f"predlog zaključka {result['suggested_end']:.1%} | {reasons}"
+        )
+    if output:
+        with open(output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+    click.echo(f"Končano v {elapsed:.1f} s ({count / elapsed:,.0f} sej/s)" if elapsed else "Končano")
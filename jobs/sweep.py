@@ -0,0 +1,260 @@
+# jobs/sweep.py - Preizkus pragov FSM nad zabeleženo zgodovino (flask sweep-fsm)
+
+"""
+Zabeležene seje (trigger + inferred_intent po korakih) se predvajajo skozi
+RobotFSM z vsako kombinacijo pragov iz mreže (FSMConfig). Za vsako
+kombinacijo poročilo pove, kako bi se spremenile dolžine sej, razlogi
+zaključka in klasifikacija scenarijev - glede na predvajanje s trenutnimi
+pragovi (izhodišče).
+
+Seja se v predvajanju konča, ko FSM doseže končno stanje (aplikacija bi jo
+takrat zaključila). Če se zabeležena seja konča prej, obdrži zabeležen
+razlog (timeout, reset, forced ...); če je bila zaključena zaradi FSM, ki pri
+novih pragovih še ne bi končal, je razlog "unfinished".
+
+max_escalations določa samo, kdaj robot predlaga zaključek, zato poročilo
+šteje predloge (seje s predlogom, vseh predlogov). Z --accept-end P
+uporabnik predlog sprejme z verjetnostjo P (kot simulate-sessions): seja se
+konča z razlogom "forced". Žreb je vezan na sejo in korak (--seed), zato je
+pri vseh kombinacijah enak in primerjava ostane parna.
+
+Seje se enkrat preberejo v glavnem procesu, kombinacije pa se razdelijo
+med procese (fork deli prebrane seje brez kopiranja).
+"""
+
+import itertools
+import json
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+import click
+from sqlalchemy import select
+
+from core import FSMConfig, RobotFSM, S4_FEEDBACK
+from core.fsm import default_config
+from db import read_session, SessionLog, InteractionLog
+import evaluation
+
+FSM_END_REASONS = {"success_steps", "final"}
+UNFINISHED = "unfinished"
+OPEN = "open"
+FORCED = "forced"         # uporabnik je sprejel predlog zaključka (--accept-end)
+
+# Seje in izhodišče za procese (nastavi _init_worker ali glavni proces)
+_sessions = None
+_baseline = None
+
+
+def load_sessions(limit: int = None, reader=None) -> list:
+    """
+    Seje z vsaj eno interakcijo: [(zabeležen end_reason, [vrstice])], vrstice
+    so dict s trigger/inferred_intent/state_before/state_after. Bere z bralne baze.
+    """
+    reader = reader or read_session()
+    stmt = select(SessionLog.id, SessionLog.end_reason).order_by(SessionLog.id.desc())
+    if limit:
+        stmt = stmt.limit(limit)
+    reasons = dict(reader.execute(stmt).all())
+
+    grouped = {}
+    interned = {}       # ponovljeni nizi so v pomnilniku enkrat
+    rows = reader.execute(
+        select(
+            InteractionLog.session_id,
+            InteractionLog.trigger,
+            InteractionLog.inferred_intent,
+            InteractionLog.state_before,
+            InteractionLog.state_after,
+        )
+        .where(InteractionLog.session_id >= min(reasons, default=0))
+        .order_by(InteractionLog.session_id, InteractionLog.step_number)
+        .execution_options(yield_per=20000)
+    )
+    for session_id, *values in rows:
+        if session_id not in reasons:
+            continue
+        trigger, intent, state_before, state_after = (interned.setdefault(v, v) for v in values)
+        grouped.setdefault(session_id, []).append({
+            "trigger": trigger,
+            "inferred_intent": intent,
+            "state_before": state_before,
+            "state_after": state_after,
+        })
+    return [(reasons[sid], grouped[sid]) for sid in sorted(grouped)]
+
+
+def accept_draws(seed: int, session: int, steps: int) -> list:
+    """Žrebi sprejema predloga za vsak korak seje (enaki pri vseh kombinacijah pragov)."""
+    rng = random.Random(f"{seed}:{session}")
+    return [rng.random() for _ in range(steps)]
+
+
+def simulate(rows, logged_reason, config: FSMConfig, classify: bool = True, accept_end: float = 0.0, draws=None):
+    """
+    Predvaja sejo s pragovi config do končnega stanja ali konca loga.
+    Vrne (korakov, razlog zaključka, scenarij ali None, predlogov zaključka).
+    draws: žrebi accept_draws() za --accept-end.
+    """
+    fsm = RobotFSM(config=config)
+    steps = []
+    suggestions = 0
+    accepted = False
+    logged_after = None
+    for k, row in enumerate(rows):
+        # Prisilni zaključek med koraki (force_end ni zabeležen kot interakcija)
+        if row["state_before"] == S4_FEEDBACK and logged_after not in (None, S4_FEEDBACK):
+            fsm.force_end()
+            break
+        logged_after = row["state_after"]
+        state_after = fsm.update_state(row["inferred_intent"], trigger=row["trigger"])
+        steps.append({
+            "trigger": row["trigger"],
+            "inferred_intent": row["inferred_intent"],
+            "state_after": state_after,
+            "escalation_count": fsm.total_escalations(),
+        })
+        if fsm.is_final():
+            break
+        if fsm.should_suggest_end:
+            suggestions += 1
+            if accept_end and draws[k] < accept_end:
+                accepted = True
+                break
+
+    if accepted:
+        reason = FORCED
+    elif fsm.is_final():
+        reason = fsm.end_reason or "final"
+    elif logged_reason in FSM_END_REASONS:
+        reason = UNFINISHED
+    else:
+        reason = logged_reason or OPEN
+    scenario = evaluation.classify_session(steps)[0] if classify and steps else None
+    return len(steps), reason, scenario, suggestions
+
+
+def _percentile(sorted_values, q: float):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(config: FSMConfig, results, baseline=None) -> dict:
+    """Povzetek predvajanja [(korakov, razlog, scenarij, predlogov)] za eno kombinacijo."""
+    lengths = sorted(r[0] for r in results)
+    summary = {
+        "config": config.to_dict(),
+        "sessions": len(results),
+        "steps": {
+            "total": sum(lengths),
+            "mean": round(statistics.fmean(lengths), 2) if lengths else 0,
+            "p50": _percentile(lengths, 0.5),
+            "p90": _percentile(lengths, 0.9),
+        },
+        "suggested_end": {
+            "sessions": sum(1 for r in results if r[3]),
+            "total": sum(r[3] for r in results),
+        },
+        "end_reasons": dict(Counter(r[1] for r in results).most_common()),
+        "scenarios": dict(Counter(r[2] for r in results if r[2]).most_common()),
+    }
+    if baseline is not None:
+        summary["changed"] = {
+            "length": sum(1 for r, b in zip(results, baseline) if r[0] != b[0]),
+            "end_reason": sum(1 for r, b in zip(results, baseline) if r[1] != b[1]),
+            "scenario": sum(1 for r, b in zip(results, baseline) if r[2] != b[2]),
+            "suggested": sum(1 for r, b in zip(results, baseline) if bool(r[3]) != bool(b[3])),
+        }
+    return summary
+
+
+def _init_worker(sessions, baseline):
+    global _sessions, _baseline
+    _sessions, _baseline = sessions, baseline
+
+
+def replay_all(config: FSMConfig, classify: bool, accept_end: float, seed: int, sessions) -> list:
+    return [
+        simulate(rows, reason, config, classify, accept_end, accept_draws(seed, k, len(rows)) if accept_end else None)
+        for k, (reason, rows) in enumerate(sessions)
+    ]
+
+
+def run_config(args):
+    """Delavec: (FSMConfig, classify, accept_end, seed) -> povzetek kombinacije."""
+    config, classify, accept_end, seed = args
+    return summarize(config, replay_all(config, classify, accept_end, seed, _sessions), _baseline)
+
+
+def parse_grid(values: str, default: int) -> list:
+    """"2,3,4" -> [2, 3, 4]; prazno -> [default]. Pragovi morajo biti vsaj 1."""
+    if not values:
+        return [default]
+    try:
+        grid = sorted({int(v) for v in values.split(",") if v.strip()})
+    except ValueError:
+        raise click.BadParameter(f"Pričakovan seznam celih števil, dobljeno: {values}")
+    if not grid or grid[0] < 1:
+        raise click.BadParameter(f"Pragovi morajo biti cela števila >= 1, dobljeno: {values}")
+    return grid
+
+
+@click.command("sweep-fsm")
+@click.option("--max-escalations", default="", help="Vrednosti, npr. 2,3,4 (privzeto trenutna).")
+@click.option("--max-success-steps", default="", help="Vrednosti, npr. 3,5,7 (privzeto trenutna).")
+@click.option("--explanation-steps", default="", help="Vrednosti, npr. 1,2,3 (privzeto trenutna).")
+@click.option("--limit", type=int, default=None, help="Samo zadnjih N sej.")
+@click.option("--workers", type=int, default=None, help="Število procesov (privzeto vsa jedra).")
+@click.option("--no-classify", is_flag=True, help="Brez klasifikacije scenarijev (hitreje).")
+@click.option("--accept-end", type=click.FloatRange(0, 1), default=0.0,
+              help="Verjetnost, da uporabnik sprejme predlog zaključka (0 = nikoli).")
+@click.option("--seed", type=int, default=0, help="Seme žrebov za --accept-end.")
+@click.option("-o", "--output", type=click.Path(), default=None, help="Celotno poročilo kot JSON.")
+def sweep_fsm_command(max_escalations, max_success_steps, explanation_steps, limit, workers, no_classify,
+                      accept_end, seed, output):
+    """Predvaja zabeležene seje z mrežo pragov FSM in primerja rezultate s trenutnimi."""
+    current = default_config()
+    grid = [
+        FSMConfig(*values)
+        for values in itertools.product(
+            parse_grid(max_escalations, current.max_escalations),
+            parse_grid(max_success_steps, current.max_success_steps),
+            parse_grid(explanation_steps, current.explanation_steps),
+        )
+    ]
+    classify = not no_classify
+    workers = workers or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    sessions = load_sessions(limit)
+    click.echo(f"Sej: {len(sessions)}, kombinacij: {len(grid)}, procesov: {workers}")
+    if not sessions:
+        return
+
+    baseline = replay_all(current, classify, accept_end, seed, sessions)
+    reports = []
+    with Pool(processes=min(workers, len(grid)), initializer=_init_worker, initargs=(sessions, baseline)) as pool:
+        for report in pool.imap(run_config, [(config, classify, accept_end, seed) for config in grid]):
+            reports.append(report)
+            c, steps, changed = report["config"], report["steps"], report["changed"]
+            suggested = report["suggested_end"]
+            reasons = ", ".join(f"{k} {v}" for k, v in report["end_reasons"].items())
+            click.echo(
+                f"esc={c['max_escalations']} success={c['max_success_steps']} expl={c['explanation_steps']}: "
+                f"korakov povp. {steps['mean']} (p90 {steps['p90']}), predlogov zaključka {suggested['total']} "
+                f"v {suggested['sessions']} sejah, spremenjenih dolžin {changed['length']}, "
+                f"razlogov {changed['end_reason']}, scenarijev {changed['scenario']}, "
+                f"predlogov {changed['suggested']} | {reasons}"
+            )
+
+    if output:
+        with open(output, "w", encoding="utf-8") as fh:
+            json.dump({
+                "baseline": summarize(current, baseline),
+                "combinations": reports,
+            }, fh, ensure_ascii=False, indent=2)
+    click.echo(f"Končano v {time.perf_counter() - started:.1f} s")
@@ -0,0 +1,294 @@
+# routes/aio.py - ASGI aplikacija: asinhrone route za robote in evalvacijo, ostalo prek Flask
+
+"""
+Asinhrono (zanka dogodkov, AsyncSession iz db/aio.py) se strežejo
+zahtevki, ki jih pošilja veliko hkratnih odjemalcev:
+
+    POST /api/fleet/robots/<robot_id>/triggers
+    GET  /api/fleet/robots/<robot_id>
+    POST /api/fleet/robots/<robot_id>/end
+    GET  /api/fleet/registry
+    GET  /api/sessions
+    GET  /api/session/<id>
+    GET  /api/session/<id>/evaluation
+
+Odgovori so enaki kot v Flask routah (routes/fleet.py, routes/evaluate.py);
+poizvedbe so iste funkcije s parametrom session, klicane prek run_sync.
+Izračun evalvacije (CPU) teče v bazenu niti, korak FSM pa v zanki. Branja
+gredo na primarno bazo (ASYNC_DATABASE_URL), ne na ANALYTICS_DATABASE_URL.
+
+Vse ostale poti (UI, /trigger in /trigger/batch s piškotkom, ...) gredo v
+Flask aplikacijo prek a2wsgi.WSGIMiddleware (lasten bazen niti, pretočni
+odgovori). /trigger ostane v Flasku, ker stanje FSM in pogovora hrani v
+podpisanem piškotku Flask seje.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import func, select
+
+from core import TriggerArbiter
+from db import SessionLog, InteractionLog
+from db.aio import aio_db
+from helpers.evaluations import get_stored_evaluation, load_evaluation_rows, store_evaluations
+from helpers.fleet import owner_node
+from helpers.fleet_aio import authenticate
+from helpers.responses import compress, dumps, negotiate_encoding
+from routes.evaluate import (
+    INTERACTIONS_PAGE_MAX,
+    SESSIONS_PAGE_MAX,
+    evaluate_sessions,
+    interactions_page,
+    session_info,
+    session_statistics,
+    sessions_page,
+    sessions_payload,
+    unevaluated_sessions,
+)
+import evaluation
+
+MAX_BODY_BYTES = 1 << 20
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, payload: dict, headers=()):
+        super().__init__(payload.get("error"))
+        self.status, self.payload, self.headers = status, payload, list(headers)
+
+
+class Request:
+    """Najnujnejše iz ASGI scope (glave z malimi črkami)."""
+
+    __slots__ = ("method", "path", "query", "args", "headers", "body")
+
+    def __init__(self, scope, body: bytes):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query = scope.get("query_string", b"")
+        self.args = dict(reversed(parse_qsl(self.query.decode("latin-1"))))     # prva vrednost, kot request.args
+        self.headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", ())}
+        self.body = body
+
+    def int_arg(self, name: str, default=None, minimum: int = 0, maximum: int = None):
+        """Kot _int_arg v routes/evaluate.py; brez vrednosti in privzete vrne None."""
+        try:
+            value = int(self.args[name])
+        except (KeyError, ValueError):
+            value = default
+        if value is None:
+            return None
+        value = max(minimum, value) if minimum is not None else value
+        return min(value, maximum) if maximum is not None else value
+
+    def json(self) -> dict:
+        try:
+            data = json.loads(self.body) if self.body else {}
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+
+class AsyncApp:
+    """ASGI aplikacija nad Flask app z asinhronimi routami za robote in evalvacijo."""
+
+    def __init__(self, app, registry, executor, on_startup=()):
+        self.app = app
+        self.registry = registry
+        self.executor = executor
+        self.on_startup = list(on_startup)      # kliče se v workerju ob lifespan.startup
+        self.wsgi = WSGIMiddleware(app, workers=app.config["ASYNC_WORKER_THREADS"])
+        self.routes = [
+            ("POST", re.compile(r"^/api/fleet/robots/(?P<robot_id>[^/]+)/triggers$"), self.push_triggers),
+            ("GET", re.compile(r"^/api/fleet/robots/(?P<robot_id>[^/]+)$"), self.robot_state),
+            ("POST", re.compile(r"^/api/fleet/robots/(?P<robot_id>[^/]+)/end$"), self.end_robot_session),
+            ("GET", re.compile(r"^/api/fleet/registry$"), self.registry_metrics),
+            ("GET", re.compile(r"^/api/sessions$"), self.list_sessions),
+            ("GET", re.compile(r"^/api/session/(?P<session_id>\d+)$"), self.session_details),
+            ("GET", re.compile(r"^/api/session/(?P<session_id>\d+)/evaluation$"), self.session_evaluation),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        for method, pattern, handler in self.routes:
+            match = pattern.match(scope["path"])
+            if match and scope["method"] == method:
+                return await self._dispatch(scope, receive, send, handler, match.groupdict())
+        return await self.wsgi(scope, receive, send)
+
+    async def _dispatch(self, scope, receive, send, handler, params):
+        body = await self._read_body(receive)
+        if body is None:
+            return await self._send_json(send, 413, {"error": "Request body too large"})
+        request = Request(scope, body)
+        # Seja se poveže šele ob prvi poizvedbi - route brez baze je ne odprejo
+        async with aio_db.session() as s:
+            try:
+                status, payload, headers = 200, await handler(s, request, **params), []
+            except HTTPError as e:
+                status, payload, headers = e.status, e.payload, e.headers
+            except Exception:
+                # Kot Flask: zapis v log in JSON napaka, ne prazen 500 strežnika
+                self.app.logger.exception("Unhandled error in %s %s", scope["method"], scope["path"])
+                await s.rollback()
+                status, payload, headers = 500, {"error": "Internal server error"}, []
+        return await self._send_json(send, status, payload, headers, request.headers.get("accept-encoding", ""))
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                for callback in self.on_startup:
+                    callback(self.app)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # Počakaj na rollupe zaključenih sej, nato zapri povezave
+                await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown, True)
+                await aio_db.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        """Celotno telo zahtevka ali None, če presega MAX_BODY_BYTES."""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    async def _send_json(self, send, status: int, payload, headers=(), accept_encoding: str = ""):
+        data = dumps(payload)
+        headers = [("Content-Type", "application/json"), *headers]
+        # Kot init_compression v helpers/responses.py
+        config = self.app.config
+        if config.get("COMPRESS_ENABLED", True) and 200 <= status < 300:
+            headers.append(("Vary", "Accept-Encoding"))
+            encoding = negotiate_encoding(accept_encoding) if len(data) >= config.get("COMPRESS_MIN_SIZE", 1024) else None
+            if encoding is not None:
+                data = compress(data, encoding, config.get("COMPRESS_LEVEL", 6))
+                headers.append(("Content-Encoding", encoding))
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-length", str(len(data)).encode()),
+                *((k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers),
+            ],
+        })
+        await send({"type": "http.response.body", "body": data})
+
+    # ----- Flota -----
+
+    async def _authorize(self, s, request: Request, robot_id: str):
+        """Kot robot_required v routes/fleet.py."""
+        owner = owner_node(robot_id, self.app.config["FLEET_NODES"])
+        if owner is not None and owner != self.app.config["FLEET_NODE"]:
+            raise HTTPError(421, {"error": "Robot belongs to another node", "owner": owner}, [("X-Fleet-Owner", owner)])
+        header = request.headers.get("authorization", "")
+        token = header[7:] if header.startswith("Bearer ") else None
+        if not await authenticate(s, robot_id, token):
+            raise HTTPError(401, {"error": "Invalid robot credentials"})
+
+    async def push_triggers(self, s, request: Request, robot_id: str):
+        await self._authorize(s, request, robot_id)
+        data = request.json()
+        dropped = []
+        if data.get("trigger"):
+            triggers = [data["trigger"]]
+        else:
+            arbiter = TriggerArbiter(self.registry.rules.index, self.app.config["TRIGGER_ARBITRATION_TOP_K"])
+            try:
+                winners, dropped = arbiter.arbitrate(arbiter.parse(data.get("events")))
+            except ValueError as e:
+                raise HTTPError(400, {"error": str(e)})
+            triggers = [event.trigger for event in winners]
+        result = await self.registry.push(s, robot_id, triggers, time.time())
+        if dropped:
+            result["dropped"] = [{**event.to_dict(), "reason": reason} for event, reason in dropped]
+        return result
+
+    async def robot_state(self, s, request: Request, robot_id: str):
+        await self._authorize(s, request, robot_id)
+        return await self.registry.state(s, robot_id)
+
+    async def end_robot_session(self, s, request: Request, robot_id: str):
+        await self._authorize(s, request, robot_id)
+        return await self.registry.end(s, robot_id)
+
+    async def registry_metrics(self, s, request: Request):
+        return {"pid": os.getpid(), "node": self.app.config["FLEET_NODE"], "mode": "async", **self.registry.metrics()}
+
+    # ----- Pregled sej in evalvacija -----
+
+    async def _evaluation(self, s, session_id: int, steps: int):
+        """Kot get_or_compute_evaluation; izračun v bazenu niti."""
+        result = await s.run_sync(lambda sync: get_stored_evaluation(session_id, steps, session=sync))
+        if result is None:
+            rows = (await s.run_sync(lambda sync: load_evaluation_rows([session_id], session=sync)))[session_id]
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, evaluation.generate_functional_evaluation, rows)
+            if rows:
+                await s.run_sync(lambda sync: store_evaluations([(session_id, result)], session=sync))
+                await s.commit()
+        return result
+
+    async def list_sessions(self, s, request: Request):
+        """Kot GET /api/sessions; manjkajoče evalvacije strani v bazenu niti."""
+        cursor = request.int_arg("cursor", minimum=None)
+        limit = request.int_arg("limit", 50, minimum=1, maximum=SESSIONS_PAGE_MAX)
+        rows = await s.run_sync(lambda sync: sessions_page(cursor, limit, session=sync))
+        computed = []
+        missing = unevaluated_sessions(rows[:limit])
+        if missing:
+            rows_by_session = await s.run_sync(lambda sync: load_evaluation_rows(missing, session=sync))
+            loop = asyncio.get_running_loop()
+            computed = await loop.run_in_executor(self.executor, evaluate_sessions, rows_by_session)
+            await s.run_sync(lambda sync: store_evaluations(computed, session=sync))
+            await s.commit()
+        return sessions_payload(rows, limit, computed)
+
+    async def session_details(self, s, request: Request, session_id: str):
+        """Kot GET /api/session/<id> (z ?include=interactions&offset=&limit=)."""
+        session_id = int(session_id)
+        session_obj = await s.get(SessionLog, session_id)
+        if session_obj is None:
+            raise HTTPError(404, {"error": "Session not found"})
+        info = session_info(session_obj)
+        statistics = await s.run_sync(lambda sync: session_statistics(session_id, session=sync))
+        payload = {
+            "session": info,
+            "statistics": statistics,
+            "functional_evaluation": await self._evaluation(s, session_id, statistics["step_count"]),
+        }
+        if "interactions" in request.args.get("include", "").split(","):
+            offset = request.int_arg("offset", 0)
+            limit = request.int_arg("limit", 200, minimum=1, maximum=INTERACTIONS_PAGE_MAX)
+            payload["interactions"] = await s.run_sync(
+                lambda sync: interactions_page(session_id, statistics["step_count"], offset, limit, session=sync)
+            )
+        return payload
+
+    async def session_evaluation(self, s, request: Request, session_id: str):
+        """Kot GET /api/session/<id>/evaluation v routes/evaluate.py; izračun v bazenu niti."""
+        session_id = int(session_id)
+        if await s.get(SessionLog, session_id) is None:
+            raise HTTPError(404, {"error": "Session not found"})
+        steps = (await s.execute(
+            select(func.count()).select_from(InteractionLog).where(InteractionLog.session_id == session_id)
+        )).scalar()
+        result = await self._evaluation(s, session_id, steps)
+        return {"session_id": session_id, "step_count": steps, "functional_evaluation": result}
@@ -0,0 +1,39 @@
+# routes/assets.py - Strežba zgrajenih statičnih datotek z dolgim predpomnjenjem
+
+import mimetypes
+import os
+
+from flask import Blueprint, current_app, request, send_from_directory
+
+from helpers.assets import DIST_DIR
+from helpers.responses import negotiate_encoding
+
+assets_bp = Blueprint("assets", __name__)
+
+# Ime vsebuje hash vsebine, zato se datoteka na tem URL-ju nikoli ne spremeni
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+
+@assets_bp.route("/assets/<path:filename>", methods=["GET"])
+def dist(filename):
+    """
+    Vrne datoteko iz static/dist. Če brskalnik sprejme gzip in obstaja
+    predstisnjena .gz različica, pošljemo kar njo (brez stiskanja na zahtevek).
+
+    V produkciji naj static/dist streže sprednji strežnik ali CDN
+    (ASSET_URL_BASE, glej README) - ta route je rezerva za razvoj.
+    """
+    directory = os.path.join(current_app.static_folder, DIST_DIR)
+    gz_path = os.path.join(directory, filename + ".gz")
+
+    if negotiate_encoding(request.headers.get("Accept-Encoding"), ("gzip",)) and os.path.isfile(gz_path):
+        response = send_from_directory(directory, filename + ".gz", max_age=31536000)
+        response.headers["Content-Encoding"] = "gzip"
+        # tip vsebine naj bo od izvorne datoteke, ne application/gzip
+        response.mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    else:
+        response = send_from_directory(directory, filename, max_age=31536000)
+
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -1,12 +1,66 @@
 # routes/evaluate.py - Route za pregled sej
 
-from flask import Blueprint, render_template, jsonify
+from datetime import datetime, timedelta, timezone
 
-from db import SessionLog, InteractionLog
-from evaluation import generate_functional_evaluation, classify_session, get_all_scenarios
+from flask import Blueprint, current_app, render_template, jsonify, request
+from sqlalchemy import and_, case, func, select
+
+from db import db, read_router, read_session, SessionLog, InteractionLog, SessionEvaluation, SessionVector
+from helpers import markov
+from helpers.fsm_store import check_session_consistency
+from helpers.evaluations import (
+    get_or_compute_evaluation,
+    get_or_compute_evaluations,
+    load_evaluation_rows,
+    store_evaluations,
+)
+from helpers.responses import json_response, fragment
+from helpers.rollups import GRANULARITIES, query_rollups
+
+# Evalvacijski paket se uvozi takoj - z --preload ga workerji delijo (glej evaluation/__init__.py)
+import evaluation
 
 evaluate_bp = Blueprint("evaluate", __name__)
 
+# Reference na rules engine - nastavi se v app.py
+rules = None
+
+
+def init_rules(rules_engine):
+    """Inicializira rules engine za ta blueprint."""
+    global rules
+    rules = rules_engine
+
+
+# Največje velikosti strani za paginirane API-je
+SESSIONS_PAGE_MAX = 200
+INTERACTIONS_PAGE_MAX = 1000
+SIMILAR_MAX = 50
+OUTCOME_HORIZON_MAX = 1000
+
+# Stolpci za prikaz poteka seje (brez polne ORM hidracije)
+INTERACTION_COLUMNS = (
+    InteractionLog.step_number,
+    InteractionLog.trigger,
+    InteractionLog.inferred_intent,
+    InteractionLog.state_before,
+    InteractionLog.state_after,
+    InteractionLog.robot_utterance,
+    InteractionLog.robot_speech_act.label("speech_act"),
+    InteractionLog.escalation_count,
+    InteractionLog.repeat_count,
+    InteractionLog.timestamp,
+)
+
+
+def _int_arg(name, default, minimum=0, maximum=None):
+    """Celoštevilski query parameter, omejen na [minimum, maximum]."""
+    value = request.args.get(name, default, type=int)
+    if value is None:
+        value = default
+    value = max(minimum, value)
+    return min(value, maximum) if maximum is not None else value
+
 
 @evaluate_bp.route("/evaluate", methods=["GET"])
 def evaluate_page():
@@ -21,13 +75,24 @@ def get_all_sessions():
     """
     Vrne vse seje za analizo (samo tiste z vsaj eno interakcijo).
     """
-    sessions = SessionLog.query.order_by(SessionLog.started_at.desc()).limit(50).all()
-    
+    reader = read_session()
+    sessions = reader.execute(select(SessionLog).order_by(SessionLog.started_at.desc()).limit(50)).scalars().all()
+
+    # Koraki vseh sej z eno poizvedbo (prazne seje odpadejo)
+    by_session = {}
+    for i in reader.execute(
+        select(InteractionLog)
+        .where(InteractionLog.session_id.in_([s.id for s in sessions]))
+        .order_by(InteractionLog.session_id, InteractionLog.step_number)
+    ).scalars():
+        by_session.setdefault(i.session_id, []).append(i)
+
+    # Klasifikacija scenarija (shranjene evalvacije, če so še veljavne) - z iste bralne seje
+    evaluations = get_or_compute_evaluations(by_session, reader)
+
     result = []
     for s in sessions:
-        interactions = InteractionLog.query.filter_by(session_id=s.id).all()
-        
-        # Preskoči prazne seje (brez interakcij)
+        interactions = by_session.get(s.id)
         if not interactions:
             continue
         
@@ -35,13 +100,14 @@ def get_all_sessions():
         escalation_count = max([i.escalation_count for i in interactions], default=0)
         triggers_used = set([i.trigger for i in interactions])
         
-        # Klasifikacija scenarija
-        scenario_id, confidence = classify_session(interactions)
+        functional_evaluation = evaluations[s.id]
+        scenario_id = functional_evaluation["scenario_classification"]["id"]
+        confidence = functional_evaluation["confidence"]
         
         result.append({
             "id": s.id,
-            "started_at": s.started_at.isoformat() if s.started_at else None,
-            "ended_at": s.ended_at.isoformat() if s.ended_at else None,
+            "started_at": s.started_at,
+            "ended_at": s.ended_at,
             "step_count": len(interactions),
             "escalation_count": escalation_count,
             "triggers_used": list(triggers_used),
@@ -51,91 +117,390 @@ def get_all_sessions():
             "scenario_confidence": round(confidence),
         })
     
-    return jsonify(result)
+    return json_response(result)
 
 
-def is_positive_trigger(trigger):
-    """Preveri, ali je trigger pozitiven (uporablja isto logiko kot helpers.py)."""
-    if not trigger:
-        return False
-    lt = trigger.lower()
-    return any(kw in lt for kw in ["smiles", "laughs", "greet", "positive"])
+def sessions_page(cursor, limit, session=None) -> list:
+    """Vrstice strani seznama sej (do limit + 1 - zadnja pove, da je še naslednja stran)."""
+    stmt = (
+        select(
+            SessionLog.id,
+            SessionLog.started_at,
+            SessionLog.ended_at,
+            SessionLog.rating_supportive,
+            func.count(InteractionLog.id).label("step_count"),
+            func.max(InteractionLog.escalation_count).label("escalation_count"),
+            SessionEvaluation.scenario_id,
+            SessionEvaluation.confidence,
+            SessionEvaluation.step_count.label("evaluated_steps"),
+        )
+        .join(InteractionLog, InteractionLog.session_id == SessionLog.id)
+        .outerjoin(SessionEvaluation, and_(
+            SessionEvaluation.session_id == SessionLog.id,
+            SessionEvaluation.scoring_version == evaluation.scoring_version(),
+        ))
+        .group_by(SessionLog.id, SessionEvaluation.session_id)
+        .order_by(SessionLog.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        stmt = stmt.where(SessionLog.id < cursor)
+    return (session or read_session()).execute(stmt).all()
 
 
-def is_negative_trigger(trigger):
-    """Preveri, ali je trigger negativen (uporablja isto logiko kot helpers.py)."""
-    if not trigger:
-        return False
-    lt = trigger.lower()
-    return any(kw in lt for kw in ["stressed", "leans back", "crosses arms", 
-                                    "error", "silence", "still", "away", "frustrated", 
-                                    "overloaded", "disengagement", "decreasing engagement"])
+def unevaluated_sessions(rows) -> list:
+    """ID sej strani, ki nimajo veljavne shranjene evalvacije."""
+    return [r.id for r in rows if r.evaluated_steps != r.step_count]
 
 
-@evaluate_bp.route("/api/session/<int:session_id>", methods=["GET"])
-def get_session_details(session_id):
+def evaluate_sessions(rows_by_session: dict) -> list:
+    """[(session_id, evaluacija)] za {session_id: vrstice} - samo CPU, brez baze."""
+    return [(sid, evaluation.generate_functional_evaluation(rows)) for sid, rows in rows_by_session.items()]
+
+
+def sessions_payload(rows, limit, computed=()) -> dict:
+    """Odgovor /api/sessions iz vrstic sessions_page in na novo izračunanih evalvacij."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    classification = {r.id: (r.scenario_id, r.confidence) for r in rows if r.evaluated_steps == r.step_count}
+    for sid, ev in computed:
+        classification[sid] = (ev["scenario_classification"]["id"], ev["confidence"])
+
+    items = []
+    for r in rows:
+        scenario_id, confidence = classification[r.id]
+        items.append({
+            "id": r.id,
+            "started_at": r.started_at,
+            "ended_at": r.ended_at,
+            "step_count": r.step_count,
+            "escalation_count": r.escalation_count or 0,
+            "completed": r.ended_at is not None,
+            "has_evaluation": r.rating_supportive is not None,
+            "scenario_type": scenario_id,
+            "scenario_confidence": round(confidence or 0),
+        })
+    return {
+        "items": items,
+        "next_cursor": rows[-1].id if has_more and rows else None,
+    }
+
+
+@evaluate_bp.route("/api/sessions", methods=["GET"])
+def list_sessions():
     """
-    Vrne podrobnosti posamezne seje vključno s funkcionalno evalvacijo.
+    Stran seznama sej (samo seje z interakcijami), najnovejše najprej.
+
+    Paginacija s kazalcem: ?cursor=<id zadnje seje prejšnje strani>&limit=50.
+    Odgovor: {"items": [...], "next_cursor": id ali null}. Enak odgovor tudi
+    v ASGI načinu (routes/aio.py).
     """
-    session = SessionLog.query.get(session_id)
-    if not session:
-        return jsonify({"error": "Session not found"}), 404
-    
-    interactions = InteractionLog.query.filter_by(session_id=session_id).order_by(InteractionLog.step_number).all()
-    
-    # Izračunaj statistiko - uporabljamo triggerje (ne intente), kot v glavnem chatu
-    positive_count = sum(1 for i in interactions if is_positive_trigger(i.trigger))
-    negative_count = sum(1 for i in interactions if is_negative_trigger(i.trigger))
-    total = len(interactions)
-    escalation_count = max([i.escalation_count for i in interactions], default=0)
-    triggers_used = set([i.trigger for i in interactions])
-    
-    statistics = {
+    cursor = request.args.get("cursor", type=int)
+    limit = _int_arg("limit", 50, minimum=1, maximum=SESSIONS_PAGE_MAX)
+    rows = sessions_page(cursor, limit)
+
+    # Evalvacije, ki manjkajo ali so zastarele, izračunamo samo za to stran
+    computed = []
+    missing = unevaluated_sessions(rows[:limit])
+    if missing:
+        computed = evaluate_sessions(load_evaluation_rows(missing, read_session()))
+        store_evaluations(computed)
+        db.session.commit()
+    return json_response(sessions_payload(rows, limit, computed))
+
+
+def interactions_page(session_id, total, offset, limit, session=None) -> dict:
+    """Stran korakov seje (samo stolpci, brez ORM objektov)."""
+    rows = (session or read_session()).execute(
+        select(*INTERACTION_COLUMNS)
+        .where(InteractionLog.session_id == session_id)
+        .order_by(InteractionLog.step_number)
+        .offset(offset)
+        .limit(limit)
+    )
+    return {
+        "items": [row._asdict() for row in rows],
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+    }
+
+
+def _interactions_page(session_id, total):
+    """interactions_page glede na ?offset=&limit=."""
+    offset = _int_arg("offset", 0)
+    limit = _int_arg("limit", 200, minimum=1, maximum=INTERACTIONS_PAGE_MAX)
+    return interactions_page(session_id, total, offset, limit)
+
+
+def session_statistics(session_id, session=None) -> dict:
+    """
+    Statistika seje z eno agregatno poizvedbo v bazi.
+    Polarnost triggerja pride iz indeksa (enako kot v FSM in UI).
+    """
+    positive = rules.index.triggers_with_polarity(1)
+    negative = rules.index.triggers_with_polarity(-1)
+    row = (session or read_session()).execute(
+        select(
+            func.count(InteractionLog.id),
+            func.coalesce(func.sum(case((InteractionLog.trigger.in_(positive), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((InteractionLog.trigger.in_(negative), 1), else_=0)), 0),
+            func.coalesce(func.max(InteractionLog.escalation_count), 0),
+            func.count(InteractionLog.trigger.distinct()),
+        ).where(InteractionLog.session_id == session_id)
+    ).one()
+    total, positive_count, negative_count, escalation_count, unique_triggers = row
+    return {
         "step_count": total,
         "positive_interactions": positive_count,
         "negative_interactions": negative_count,
         "total_escalations": escalation_count,
         "positive_ratio": positive_count / total if total > 0 else 0,
-        "unique_triggers": len(triggers_used),
+        "unique_triggers": unique_triggers,
     }
-    
-    # Funkcionalna evalvacija
-    functional_evaluation = generate_functional_evaluation(interactions)
-    
-    # Sestavi odgovor
-    return jsonify({
-        "session": {
-            "id": session.id,
-            "started_at": session.started_at.isoformat() if session.started_at else None,
-            "ended_at": session.ended_at.isoformat() if session.ended_at else None,
-            "completed": session.ended_at is not None,
-            "rating_supportive": session.rating_supportive,
-            "rating_understandable": session.rating_understandable,
-            "rating_non_intrusive": session.rating_non_intrusive,
-            "evaluated_at": session.evaluated_at.isoformat() if session.evaluated_at else None,
-        },
-        "interactions": [
-            {
-                "step_number": i.step_number,
-                "trigger": i.trigger,
-                "inferred_intent": i.inferred_intent,
-                "state_before": i.state_before,
-                "state_after": i.state_after,
-                "robot_utterance": i.robot_utterance,
-                "speech_act": i.robot_speech_act,
-                "escalation_count": i.escalation_count,
-                "timestamp": i.timestamp.isoformat() if i.timestamp else None,
-            }
-            for i in interactions
-        ],
+
+
+def session_info(session_obj: SessionLog) -> dict:
+    """Osnovni podatki seje za /api/session/<id> (datetime serializira json_response)."""
+    return {
+        "id": session_obj.id,
+        "started_at": session_obj.started_at,
+        "ended_at": session_obj.ended_at,
+        "completed": session_obj.ended_at is not None,
+        "rating_supportive": session_obj.rating_supportive,
+        "rating_understandable": session_obj.rating_understandable,
+        "rating_non_intrusive": session_obj.rating_non_intrusive,
+        "evaluated_at": session_obj.evaluated_at,
+    }
+
+
+@evaluate_bp.route("/api/session/<int:session_id>/interactions", methods=["GET"])
+def list_session_interactions(session_id):
+    """
+    Stran korakov seje: ?offset=0&limit=200 (za virtualno drsenje v UI).
+    """
+    count = select(func.count()).select_from(InteractionLog).where(InteractionLog.session_id == session_id)
+    total = read_session().execute(count).scalar()
+    if not total and read_router.use_primary():
+        # nova seja, ki je bralna baza še nima
+        total = read_session().execute(count).scalar()
+    return json_response(_interactions_page(session_id, total))
+
+
+@evaluate_bp.route("/api/session/<int:session_id>", methods=["GET"])
+def get_session_details(session_id):
+    """
+    Vrne podrobnosti posamezne seje vključno s funkcionalno evalvacijo.
+
+    Statistika se izračuna v bazi. Koraki so v odgovoru samo na zahtevo:
+    ?include=interactions&offset=0&limit=200 (stran kot pri .../interactions).
+    Enak odgovor tudi v ASGI načinu (routes/aio.py).
+    """
+    session = read_session().get(SessionLog, session_id)
+    if session is None and read_router.use_primary():
+        session = read_session().get(SessionLog, session_id)
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+
+    statistics = session_statistics(session_id)
+
+    # Funkcionalna evalvacija (shranjena, če je še veljavna; sicer iz stolpcev loga)
+    functional_evaluation = get_or_compute_evaluation(
+        session_id, step_count=statistics["step_count"], session=read_session()
+    )
+
+    payload = {
+        "session": session_info(session),
         "statistics": statistics,
         "functional_evaluation": functional_evaluation,
+    }
+    if "interactions" in request.args.get("include", "").split(","):
+        payload["interactions"] = _interactions_page(session_id, statistics["step_count"])
+    return json_response(payload)
+
+
+@evaluate_bp.route("/api/session/<int:session_id>/evaluation", methods=["GET"])
+def get_session_evaluation(session_id):
+    """Samo funkcionalna evalvacija seje (enak odgovor tudi v ASGI načinu, routes/aio.py)."""
+    exists = read_session().get(SessionLog, session_id) is not None
+    if not exists and read_router.use_primary():
+        exists = read_session().get(SessionLog, session_id) is not None
+    if not exists:
+        return jsonify({"error": "Session not found"}), 404
+    steps = read_session().execute(
+        select(func.count()).select_from(InteractionLog).where(InteractionLog.session_id == session_id)
+    ).scalar()
+    return json_response({
+        "session_id": session_id,
+        "step_count": steps,
+        "functional_evaluation": get_or_compute_evaluation(session_id, step_count=steps, session=read_session()),
     })
 
 
+@evaluate_bp.route("/api/session/<int:session_id>/consistency", methods=["GET"])
+def get_session_consistency(session_id):
+    """
+    Predvaja sejo iz loga in preveri, ali se ujema z zabeleženimi stanji.
+    """
+    if SessionLog.query.get(session_id) is None:
+        return jsonify({"error": "Session not found"}), 404
+    return json_response(check_session_consistency(session_id))
+
+
+# Scenariji se spremenijo le z novo verzijo točkovanja - odgovor serializiramo enkrat
+_scenarios_cache = {"version": None, "json": None}
+
+
+def scenarios_json():
+    cache = _scenarios_cache
+    version = evaluation.scoring_version()
+    if cache["version"] != version:
+        cache["json"], cache["version"] = fragment(evaluation.get_all_scenarios()), version
+    return cache["json"]
+
+
 @evaluate_bp.route("/api/scenarios", methods=["GET"])
 def get_scenarios():
     """
     Vrne vse referenčne scenarije.
     """
-    return jsonify(get_all_scenarios())
+    return current_app.response_class(scenarios_json().data, mimetype="application/json")
+
+
+def _date_arg(name, default):
+    """
+    Datum (YYYY-MM-DD) ali čas v ISO obliki iz query parametra. Čas s
+    časovnim pasom se pretvori v UTC brez pasu (kot v bazi).
+    """
+    value = request.args.get(name)
+    if not value:
+        return default, False
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed, len(value) == 10
+
+
+@evaluate_bp.route("/api/rollups", methods=["GET"])
+def get_rollups():
+    """
+    Trendi sej iz časovnih agregatov (helpers/rollups.py).
+
+    Parametri: ?from=2024-05-01&to=2024-05-31 (datum "to" je vključen)
+    in neobvezno &granularity=hour|day (privzeto glede na dolžino obdobja).
+    """
+    now = datetime.utcnow()
+    try:
+        end, end_is_date = _date_arg("to", now)
+        start, _ = _date_arg("from", end - timedelta(days=30))
+    except ValueError:
+        return jsonify({"error": "Invalid date"}), 400
+    if end_is_date:
+        end += timedelta(days=1)
+
+    granularity = request.args.get("granularity")
+    if granularity not in (None, *GRANULARITIES):
+        return jsonify({"error": "Invalid granularity"}), 400
+    if start >= end:
+        return jsonify({"error": "Empty date range"}), 400
+
+    return json_response(query_rollups(start, end, granularity))
+
+
+@evaluate_bp.route("/api/markov/<name>", methods=["GET"])
+def get_markov_model(name):
+    """
+    Empirični Markov model iz loga: "states" (prehodne verjetnosti,
+    pričakovani koraki do S4_FEEDBACK, zadrževanje v stanju, stacionarna
+    porazdelitev) ali "triggers" (trigger -> naslednji trigger). Števce
+    posodablja ozadinska nit (MARKOV_REFRESH_SECONDS), route jih samo bere.
+    """
+    summaries = {
+        markov.STATE_MODEL: markov.state_model_summary,
+        markov.TRIGGER_MODEL: markov.trigger_model_summary,
+    }
+    if name not in summaries:
+        return jsonify({"error": "Unknown model"}), 404
+    models = markov.load_models(rules.index)
+    return json_response(summaries[name](models[name]))
+
+
+@evaluate_bp.route("/api/outcomes", methods=["GET"])
+def get_outcomes():
+    """
+    Natančna porazdelitev izidov seje (core/outcomes.py) pri triggerjih po
+    stanjih, kot jih kaže log (števci Markov modela "state_triggers"):
+    ?horizon=50 ter neobvezni pragovi max_escalations, max_success_steps,
+    explanation_steps.
+    """
+    from core import FSMConfig, OutcomeAnalyzer
+    from core.fsm import default_config
+
+    current = default_config()
+    config = FSMConfig(
+        max_escalations=_int_arg("max_escalations", current.max_escalations, minimum=1),
+        max_success_steps=_int_arg("max_success_steps", current.max_success_steps, minimum=1),
+        explanation_steps=_int_arg("explanation_steps", current.explanation_steps, minimum=1),
+    )
+    horizon = _int_arg("horizon", 50, minimum=1, maximum=OUTCOME_HORIZON_MAX)
+    state_probs = markov.state_trigger_probabilities(markov.load_models(rules.index))
+    if not state_probs:
+        return jsonify({"error": "No interactions logged"}), 404
+
+    result = OutcomeAnalyzer(state_probs, rules.index, config).analyze(horizon)
+    result["finished_by_step"] = [round(p, 6) for p in result["finished_by_step"]]
+    for key in ("end_reasons", "escalations"):
+        result[key] = {k: round(p, 6) for k, p in result[key].items()}
+    for key in ("expected_steps", "expected_escalations", "expected_suggestions", "p_suggest_end"):
+        result[key] = round(result[key], 6)
+    return json_response(result)
+
+
+@evaluate_bp.route("/api/session/<int:session_id>/similar", methods=["GET"])
+def get_similar_sessions(session_id):
+    """
+    Najbolj podobne pretekle seje po zaporedju triggerjev/intentov:
+    ?k=10&scenario=stressed (scenarij je neobvezen).
+    """
+    from helpers.similarity import similar_sessions
+
+    k = _int_arg("k", 10, minimum=1, maximum=SIMILAR_MAX)
+    matches = similar_sessions(session_id, k, request.args.get("scenario") or None)
+    if not matches:
+        return json_response({"items": []})
+
+    ids = [sid for sid, _ in matches]
+    rows = read_session().execute(
+        select(
+            SessionLog.id,
+            SessionLog.started_at,
+            SessionVector.step_count,
+            SessionEvaluation.scenario_id,
+        )
+        .join(SessionVector, SessionVector.session_id == SessionLog.id)
+        .outerjoin(SessionEvaluation, and_(
+            SessionEvaluation.session_id == SessionLog.id,
+            SessionEvaluation.scoring_version == evaluation.scoring_version(),
+        ))
+        .where(SessionLog.id.in_(ids))
+    )
+    details = {r.id: r for r in rows}
+    return json_response({
+        "items": [
+            {
+                "id": sid,
+                "similarity": round(score, 4),
+                "started_at": details[sid].started_at,
+                "step_count": details[sid].step_count,
+                "scenario_type": details[sid].scenario_id,
+            }
+            for sid, score in matches
+            if sid in details
+        ],
+    })
+
+
+@evaluate_bp.route("/api/read-routing", methods=["GET"])
+def get_read_routing():
+    """Stanje bralne baze za analitiko (db/routing.py): zaostanek in ali streže branja."""
+    return json_response(read_router.status())
@@ -0,0 +1,93 @@
+# routes/fleet.py - API za flote robotov (brez piškotkov)
+
+"""
+Robot se predstavi z ID-jem v poti in žetonom v glavi
+`Authorization: Bearer <žeton>` (žeton izda `flask register-robot`).
+
+Pri več vozliščih (FLEET_NODES) robot pripada natanko enemu; drugo
+vozlišče vrne 421 in lastnika v polju "owner" ter glavi X-Fleet-Owner.
+"""
+
+import os
+import time
+from functools import wraps
+
+from flask import Blueprint, current_app, jsonify, request
+
+from core import TriggerArbiter
+from helpers.fleet import authenticate, owner_node
+from helpers.responses import json_response
+
+fleet_bp = Blueprint("fleet", __name__, url_prefix="/api/fleet")
+
+# Register sej robotov - nastavi se v app.py
+registry = None
+
+
+def init_registry(robot_registry):
+    """Nastavi register sej robotov (helpers/fleet.py)."""
+    global registry
+    registry = robot_registry
+
+
+def robot_required(view):
+    """Preveri lastništvo vozlišča in žeton robota iz poti."""
+    @wraps(view)
+    def wrapper(robot_id, *args, **kwargs):
+        nodes = current_app.config["FLEET_NODES"]
+        owner = owner_node(robot_id, nodes)
+        if owner is not None and owner != current_app.config["FLEET_NODE"]:
+            response = jsonify({"error": "Robot belongs to another node", "owner": owner})
+            response.headers["X-Fleet-Owner"] = owner
+            return response, 421
+
+        header = request.headers.get("Authorization", "")
+        token = header[7:] if header.startswith("Bearer ") else None
+        if not authenticate(robot_id, token):
+            return jsonify({"error": "Invalid robot credentials"}), 401
+        return view(robot_id, *args, **kwargs)
+    return wrapper
+
+
+@fleet_bp.route("/robots/<robot_id>/triggers", methods=["POST"])
+@robot_required
+def push_triggers(robot_id):
+    """
+    En trigger {"trigger": "..."} ali dogodki tika {"events": [...]}, ki gredo
+    skozi arbitražo kot pri /trigger/batch.
+    """
+    data = request.get_json(silent=True) or {}
+    dropped = []
+    if data.get("trigger"):
+        triggers = [data["trigger"]]
+    else:
+        arbiter = TriggerArbiter(registry.rules.index, current_app.config["TRIGGER_ARBITRATION_TOP_K"])
+        try:
+            winners, dropped = arbiter.arbitrate(arbiter.parse(data.get("events")))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        triggers = [event.trigger for event in winners]
+
+    result = registry.push(robot_id, triggers, time.time())
+    if dropped:
+        result["dropped"] = [{**event.to_dict(), "reason": reason} for event, reason in dropped]
+    return json_response(result)
+
+
+@fleet_bp.route("/robots/<robot_id>", methods=["GET"])
+@robot_required
+def robot_state(robot_id):
+    return json_response(registry.state(robot_id))
+
+
+@fleet_bp.route("/robots/<robot_id>/end", methods=["POST"])
+@robot_required
+def end_robot_session(robot_id):
+    """Prisilno zaključi odprto sejo robota."""
+    return json_response(registry.end(robot_id))
+
+
+@fleet_bp.route("/registry", methods=["GET"])
+def registry_metrics():
+    """Velikost in zadetki registra tega procesa."""
+    return json_response({"pid": os.getpid(), "node": current_app.config["FLEET_NODE"], **registry.metrics()})
@@ -1,24 +1,54 @@
 # routes/main.py - Glavne route aplikacije
 
+import copy
+import os
+import time
 from datetime import datetime
 
-from flask import Blueprint, render_template, request, jsonify, session as flask_session
+from flask import Blueprint, current_app, render_template, request, jsonify, session as flask_session
+from markupsafe import Markup
+from sqlalchemy.exc import IntegrityError
 
 from db import db, SessionLog, InteractionLog
-from core import RobotFSM
+from core import RobotFSM, TriggerArbiter
 from helpers import (
+    current_session,
     get_or_create_session,
+    end_session,
     get_fsm,
     save_fsm,
     get_conversation,
     save_conversation,
+    resume_session,
+    flush_repeats,
     build_trigger_groups,
 )
+from helpers.session_timeouts import forget_session
+from helpers.fsm_store import save_snapshot_if_due
+from helpers.rollups import RATING_FIELDS, record_rating
+from helpers.responses import json_response, fragment
+from core import STATE_INFO
+from core.fsm import UNKNOWN_STATE_INFO
 
 main_bp = Blueprint("main", __name__)
 
-# Reference na rules engine - nastavi se v app.py
+# Reference na rules engine in debouncer - nastavi se v app.py
 rules = None
+debouncer = None
+
+# Ponovitve koraka, če je isti korak seje hkrati zapisal drug zahtevek z istim piškotkom
+STEP_ATTEMPTS = 3
+
+# Predrenderiran panel s triggerji; velja, dokler se ne spremeni rules.version
+_trigger_panel_cache = {"version": None, "html": None}
+
+# Info o stanjih je konstanten - serializiramo ga enkrat
+STATE_INFO_JSON = {state: fragment(info) for state, info in STATE_INFO.items()}
+UNKNOWN_STATE_INFO_JSON = fragment(UNKNOWN_STATE_INFO)
+
+
+def state_info_json(fsm: RobotFSM):
+    return STATE_INFO_JSON.get(fsm.state, UNKNOWN_STATE_INFO_JSON)
 
 
 def init_rules(rules_engine):
@@ -27,12 +57,29 @@ def init_rules(rules_engine):
     rules = rules_engine
 
 
+def init_debouncer(trigger_debouncer):
+    """Nastavi združevanje ponovljenih triggerjev (core/debounce.py)."""
+    global debouncer
+    debouncer = trigger_debouncer
+
+
+def render_trigger_panel():
+    """
+    Vrne HTML panela s triggerji. Panel je odvisen samo od pravil, zato se
+    renderira enkrat na verzijo pravil (RuleEngine.reload jo spremeni).
+    """
+    cache = _trigger_panel_cache
+    if cache["version"] != rules.version:
+        html = render_template("_trigger_panel.html", triggers=build_trigger_groups(rules))
+        cache["html"], cache["version"] = Markup(html), rules.version
+    return cache["html"]
+
+
 @main_bp.route("/", methods=["GET"])
 def index():
     # NE ustvarjamo seje ob obisku - seja se ustvari šele ob prvem triggerju
     fsm = get_fsm()
     conv = get_conversation()
-    trigger_groups = build_trigger_groups(rules)
 
     return render_template(
         "index.html",
@@ -42,34 +89,30 @@ def index():
         escalation=fsm.total_escalations(),
         step_count=fsm.step_count,
         statistics=fsm.get_statistics(),
-        triggers=trigger_groups,
+        trigger_panel=render_trigger_panel(),
     )
 
 
-@main_bp.route("/trigger", methods=["POST"])
-def handle_trigger():
-    data = request.get_json()
-    trigger = data.get("trigger")
-
-    if not trigger:
-        return jsonify({"error": "Missing trigger"}), 400
+def _coalesce(trigger: str, now: float):
+    """
+    Ponovitev triggerja v njegovem oknu debouncerja: vrne skupno število
+    ponovitev dogodka (brez FSM prehoda in zapisa v bazo), sicer None.
+    """
+    debounce_state = flask_session.get("debounce")
+    repeats = debouncer.check(debounce_state, trigger, now) if debouncer is not None else 0
+    if not repeats:
+        return None
+    flask_session["debounce"] = debounce_state
+    return repeats
 
-    session_obj = get_or_create_session()
-    fsm = get_fsm()
-    conv = get_conversation()
 
+def _apply_trigger(trigger: str, session_obj: SessionLog, fsm: RobotFSM, conv, now: float):
+    """
+    Pravilo -> FSM prehod -> pogovor -> log (brez commita).
+    Vrne speech act izbranega pravila.
+    """
     # 1) Izberi pravilo
-    rule = rules.select_rule(trigger)
-    if rule is None:
-        robot_text = "Nisem prepričan, kako naj reagiram na ta trigger."
-        inferred_intent = "Unknown"
-        speech_act = None
-        priority = None
-    else:
-        robot_text = rule["robot_text"]
-        inferred_intent = rule["inferred_intent"]
-        speech_act = rule["speech_act"]
-        priority = rule["priority"]
+    robot_text, inferred_intent, speech_act, priority = rules.response(trigger)
 
     # 2) FSM prehod
     state_before = fsm.state
@@ -83,7 +126,8 @@ def handle_trigger():
     save_conversation(conv)
     save_fsm(fsm)
 
-    # 4) Log v bazo
+    # 4) Log v bazo (najprej zapri okno prejšnjega dogodka)
+    flush_repeats()
     interaction = InteractionLog(
         session_id=session_obj.id,
         step_number=step_number,
@@ -97,34 +141,158 @@ def handle_trigger():
         escalation_count=total_escalations,
     )
     db.session.add(interaction)
+    db.session.flush()
+    if debouncer is not None:
+        flask_session["debounce"] = debouncer.accept(flask_session.get("debounce"), trigger, now, interaction.id)
+    session_obj.last_activity_at = datetime.utcnow()
+    save_snapshot_if_due(session_obj.id, fsm, current_app.config["FSM_SNAPSHOT_INTERVAL"])
 
     # če smo v final state, označimo konec seje
-    if fsm.is_final() and session_obj.ended_at is None:
-        session_obj.ended_at = datetime.utcnow()
+    if fsm.is_final():
+        end_session(session_obj, fsm.end_reason or "final")
 
-    db.session.commit()
+    return speech_act
+
+
+def _commit_step(step):
+    """
+    Pokliče step() in commita; vrne njegov rezultat. Če je isti korak seje
+    medtem zapisal drug zahtevek z istim piškotkom (zavihka, dvojni klik),
+    unikatni indeks (session_id, step_number) zavrne zapis: FSM in pogovor
+    se zgradita iz loga in step() se ponovi. Po STEP_ATTEMPTS vrne None.
+    """
+    debounce = copy.deepcopy(flask_session.get("debounce"))
+    for _ in range(STEP_ATTEMPTS):
+        try:
+            result = step()
+            db.session.commit()
+            return result
+        except IntegrityError:
+            db.session.rollback()
+            sid = flask_session.get("session_id")
+            if sid is None or not resume_session(sid):
+                raise
+            # flush_repeats je okna že izpraznil, UPDATE pa je bil preklican
+            flask_session["debounce"] = copy.deepcopy(debounce)
+    return None
+
+
+def _step_conflict():
+    return jsonify({"error": "Session step conflict, retry"}), 409
 
-    # Če naj robot predlaga zaključek (preveč eskalacij)
-    suggest_end_message = None
+
+def _suggest_end(fsm: RobotFSM, conv):
+    """Če naj robot predlaga zaključek (preveč eskalacij), doda sporočilo v pogovor."""
     if fsm.should_suggest_end and fsm.end_reason == "max_escalations":
         suggest_end_message = "Opazil sem, da imaš težave. Želiš, da zaključiva ali nadaljujeva z odmorom?"
         conv.append({"sender": "robot", "text": suggest_end_message, "type": "suggestion"})
         save_conversation(conv)
 
-    return jsonify(
-        {
-            "conversation": conv,
-            "current_state": fsm.state,
-            "state_info": fsm.get_state_info(),
-            "escalation": total_escalations,
-            "step_count": step_number,
-            "statistics": fsm.get_statistics(),
-            "is_final": fsm.is_final(),
-            "should_suggest_end": fsm.should_suggest_end,
-            "end_reason": fsm.end_reason,
-            "speech_act": speech_act,
-        }
-    )
+
+@main_bp.route("/trigger", methods=["POST"])
+def handle_trigger():
+    data = request.get_json()
+    trigger = data.get("trigger")
+
+    if not trigger:
+        return jsonify({"error": "Missing trigger"}), 400
+
+    # Zaključena seja (timeout, konec FSM) počisti piškotek - trigger začne novo
+    session_obj = current_session()
+
+    # Ponovitev istega triggerja v oknu: brez FSM prehoda in brez zapisa v bazo
+    now = time.time()
+    repeats = _coalesce(trigger, now)
+    if repeats is not None:
+        return json_response(_state_payload(get_fsm(), get_conversation(), coalesced=True, repeat_count=repeats))
+
+    session_obj = session_obj or get_or_create_session()
+
+    def step():
+        fsm, conv = get_fsm(), get_conversation()
+        return fsm, conv, _apply_trigger(trigger, session_obj, fsm, conv, now)
+
+    result = _commit_step(step)
+    if result is None:
+        return _step_conflict()
+    fsm, conv, speech_act = result
+
+    _suggest_end(fsm, conv)
+    return json_response(_state_payload(fsm, conv, speech_act=speech_act, coalesced=False, repeat_count=1))
+
+
+@main_bp.route("/trigger/batch", methods=["POST"])
+def handle_trigger_batch():
+    """
+    Dogodki enega tika senzorjev v enem klicu:
+    {"events": [{"trigger": "...", "confidence": 0.8, "timestamp": 1712.3}, ...]}
+
+    Arbiter (core/arbitration.py) zavrže dogodke pod pragom zaupanja in v FSM
+    pošlje samo najpomembnejše (TRIGGER_ARBITRATION_TOP_K). Odgovor je en,
+    združen za cel tik.
+    """
+    data = request.get_json(silent=True) or {}
+    arbiter = TriggerArbiter(rules.index, current_app.config["TRIGGER_ARBITRATION_TOP_K"])
+    try:
+        events = arbiter.parse(data.get("events"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    winners, arbitrated = arbiter.arbitrate(events)
+
+    now = time.time()
+    session_obj = current_session()
+
+    def step():
+        nonlocal session_obj
+        fsm, conv = get_fsm(), get_conversation()
+        speech_act, processed, coalesced, dropped = None, [], [], list(arbitrated)
+        for event in winners:
+            if fsm.is_final():
+                dropped.append((event, "session_final"))
+                continue
+            if _coalesce(event.trigger, now) is not None:
+                coalesced.append(event.to_dict())
+                continue
+            session_obj = session_obj or get_or_create_session()
+            speech_act = _apply_trigger(event.trigger, session_obj, fsm, conv, now)
+            processed.append(event.to_dict())
+        return fsm, conv, speech_act, processed, coalesced, dropped
+
+    result = _commit_step(step)
+    if result is None:
+        return _step_conflict()
+    fsm, conv, speech_act, processed, coalesced, dropped = result
+    if processed:
+        _suggest_end(fsm, conv)
+
+    return json_response(_state_payload(
+        fsm,
+        conv,
+        speech_act=speech_act,
+        arbitration={
+            "processed": processed,
+            "coalesced": coalesced,
+            "dropped": [{**event.to_dict(), "reason": reason} for event, reason in dropped],
+        },
+    ))
+
+
+def _state_payload(fsm: RobotFSM, conv, speech_act=None, **extra):
+    """Odgovor /trigger: stanje FSM in pogovor (tudi za združene ponovitve)."""
+    return {
+        "conversation": conv,
+        "current_state": fsm.state,
+        "state_info": state_info_json(fsm),
+        "escalation": fsm.total_escalations(),
+        "step_count": fsm.step_count,
+        "statistics": fsm.get_statistics(),
+        "is_final": fsm.is_final(),
+        "should_suggest_end": fsm.should_suggest_end,
+        "end_reason": fsm.end_reason,
+        "speech_act": speech_act,
+        **extra,
+    }
 
 
 @main_bp.route("/reset", methods=["POST"])
@@ -136,17 +304,18 @@ def reset():
     # Zaključi staro sejo (če ni zaključena in če ima vsaj eno interakcijo)
     sid = flask_session.get("session_id")
     if sid:
+        flush_repeats()
         s = SessionLog.query.get(sid)
         if s and s.ended_at is None:
             # Preveri če ima seja vsaj eno interakcijo
             has_interactions = InteractionLog.query.filter_by(session_id=s.id).first() is not None
             if has_interactions:
-                s.ended_at = datetime.utcnow()
-                db.session.commit()
+                end_session(s, "reset")
             else:
                 # Prazna seja - izbriši jo
+                forget_session(s.id)
                 db.session.delete(s)
-                db.session.commit()
+        db.session.commit()
 
     # Počisti flask session (NE ustvarjamo nove seje v bazi)
     flask_session.clear()
@@ -172,19 +341,39 @@ def force_end():
     sid = flask_session.get("session_id")
     if sid:
         session_obj = SessionLog.query.get(sid)
-        if session_obj and session_obj.ended_at is None:
-            session_obj.ended_at = datetime.utcnow()
-            db.session.commit()
+        flush_repeats()
+        if session_obj:
+            end_session(session_obj, "forced")
+        db.session.commit()
 
-    return jsonify({
+    return json_response({
         "conversation": conv,
         "current_state": fsm.state,
-        "state_info": fsm.get_state_info(),
+        "state_info": state_info_json(fsm),
         "statistics": fsm.get_statistics(),
         "is_final": True,
     })
 
 
+@main_bp.route("/api/session/<int:session_id>/resume", methods=["POST"])
+def resume(session_id):
+    """
+    Nadaljuje obstoječo sejo (npr. z druge naprave ali po izgubi piškotka).
+    FSM se rekonstruira iz InteractionLog.
+    """
+    if not resume_session(session_id):
+        return jsonify({"error": "Session not found"}), 404
+
+    fsm = get_fsm()
+    return json_response({
+        "conversation": get_conversation(),
+        "current_state": fsm.state,
+        "state_info": state_info_json(fsm),
+        "statistics": fsm.get_statistics(),
+        "is_final": fsm.is_final(),
+    })
+
+
 @main_bp.route("/statistics", methods=["GET"])
 def get_statistics():
     """
@@ -210,11 +399,24 @@ def evaluate_session():
         return jsonify({"error": "Session not found"}), 404
     
     # Shrani ocene (lahko so None če uporabnik ni ocenil)
+    previous = {field: getattr(session_obj, field) for field in RATING_FIELDS}
     session_obj.rating_supportive = data.get("supportive")
     session_obj.rating_understandable = data.get("understandable")
     session_obj.rating_non_intrusive = data.get("non_intrusive")
     session_obj.evaluated_at = datetime.utcnow()
+    record_rating(session_obj, previous)
     
     db.session.commit()
     
     return jsonify({"ok": True})
+
+
+@main_bp.route("/api/metrics/triggers", methods=["GET"])
+def trigger_metrics():
+    """
+    Števci debouncerja tega procesa: prejeti, sprejeti in združeni
+    (zavrženi) dogodki po triggerjih.
+    """
+    if debouncer is None:
+        return jsonify({"error": "Debounce disabled"}), 404
+    return json_response({"pid": os.getpid(), **debouncer.metrics()})
@@ -0,0 +1,192 @@
+# scripts/bench_async.py - Primerjava sinhronega (WSGI) in asinhronega (ASGI) strežnika pri mnogo robotih
+
+"""
+Registrira N robotov, zažene gunicorn z enakim številom workerjev enkrat kot
+WSGI (app:app, gthread) in enkrat kot ASGI (asgi:application, UvicornWorker)
+ter z N hkratnimi odjemalci (ena keep-alive povezava na robota) pošilja
+POST /api/fleet/robots/<id>/triggers. Vsakih --evaluate-every zahtevkov
+robot prebere še GET /api/session/<id>/evaluation svoje seje.
+
+Izpiše prepustnost, p50/p90/p99 zakasnitve in napake za vsak način.
+
+Brez --database-url se uporabi začasna SQLite baza - ta serializira
+pisalce, zato je za realno primerjavo priporočen PostgreSQL.
+
+Uporaba:
+    python scripts/bench_async.py --robots 300 --requests 20 --workers 2
+    python scripts/bench_async.py --database-url postgresql://... --mode async
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVERS = {
+    "sync": ["app:app"],
+    "async": ["-k", "uvicorn.workers.UvicornWorker", "asgi:application"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def register_robots(prefix: str, count: int) -> dict:
+    """{robot_id: žeton} (uvoz app ustvari shemo, če je baza prazna)."""
+    import app as app_module
+    from helpers.fleet import issue_token
+
+    with app_module.app.app_context():
+        return {f"{prefix}-{i}": issue_token(f"{prefix}-{i}") for i in range(count)}
+
+
+def start_server(mode: str, port: int, args, env) -> subprocess.Popen:
+    env = {**env, "PORT": str(port), "WEB_CONCURRENCY": str(args.workers), "GUNICORN_THREADS": str(args.threads)}
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", *SERVERS[mode]]
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Strežnik ({mode}) se ni zagnal.")
+
+
+class Connection:
+    """Najmanjši HTTP/1.1 odjemalec s keep-alive (ponovna povezava, če jo strežnik zapre)."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, headers: dict, body: bytes = b"") -> tuple:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        lines = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line, *header_lines = (await self.reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        response_headers = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                response_headers[name.strip().lower()] = value.strip()
+        data = await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+        if response_headers.get("connection", "").lower() == "close":
+            await self.close()
+        return int(status_line.split(" ")[1]), data
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+async def run_robot(port: int, robot_id: str, token: str, triggers: list, args, latencies: list, errors: list):
+    connection = Connection(port)
+    auth = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    rng = random.Random(robot_id)
+    session_id = None
+    try:
+        for i in range(args.requests):
+            if session_id is not None and args.evaluate_every and i % args.evaluate_every == args.evaluate_every - 1:
+                method, path, body = "GET", f"/api/session/{session_id}/evaluation", b""
+            else:
+                method, path = "POST", f"/api/fleet/robots/{robot_id}/triggers"
+                body = json.dumps({"trigger": rng.choice(triggers)}).encode()
+            t0 = time.perf_counter()
+            try:
+                status, data = await connection.request(method, path, auth, body)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                errors.append(e.__class__.__name__)
+                await connection.close()
+                continue
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                errors.append(status)
+            elif method == "POST":
+                session_id = json.loads(data).get("session_id")
+    finally:
+        await connection.close()
+
+
+async def drive(port: int, robots: dict, triggers: list, args) -> dict:
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_robot(port, robot_id, token, triggers, args, latencies, errors) for robot_id, token in robots.items()
+    ))
+    elapsed = time.perf_counter() - started
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 2),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(quantiles[49] * 1000, 1),
+        "p90_ms": round(quantiles[89] * 1000, 1),
+        "p99_ms": round(quantiles[98] * 1000, 1),
+        "error_kinds": sorted({str(e) for e in errors}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--robots", type=int, default=200, help="Hkratnih robotov (povezav).")
+    parser.add_argument("--requests", type=int, default=20, help="Zahtevkov na robota.")
+    parser.add_argument("--evaluate-every", type=int, default=10, help="Vsak N-ti zahtevek je evalvacija (0 = nikoli).")
+    parser.add_argument("--workers", type=int, default=1, help="Workerjev gunicorna (enako za oba načina).")
+    parser.add_argument("--threads", type=int, default=8, help="Niti na worker v sinhronem načinu.")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--database-url", default=None, help="Privzeto začasna SQLite baza.")
+    args = parser.parse_args()
+
+    if args.database_url:
+        database_url = args.database_url
+    else:
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="robot_fsm_bench_"), "bench.db")
+    env = {**os.environ, "DATABASE_URL": database_url, "SESSION_TIMEOUT_ENABLED": "0",
+           "ASYNC_WORKER_THREADS": str(args.threads)}
+    os.environ.update(env)
+
+    from core import RULES
+
+    triggers = sorted({r["Trigger"] for r in RULES})
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    print(f"Robotov: {args.robots}, zahtevkov na robota: {args.requests}, workerjev: {args.workers}, "
+          f"niti: {args.threads}, baza: {database_url.split('://')[0]}")
+
+    for mode in modes:
+        robots = register_robots(f"bench-{mode}-{int(time.time())}", args.robots)
+        port = free_port()
+        server = start_server(mode, port, args, env)
+        try:
+            result = asyncio.run(drive(port, robots, triggers, args))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        print(f"{mode:>5}: {result['rps']:>8} zaht./s  p50 {result['p50_ms']} ms  p90 {result['p90_ms']} ms  "
+              f"p99 {result['p99_ms']} ms  napak {result['errors']}"
+              + (f" ({', '.join(result['error_kinds'])})" if result["error_kinds"] else ""))
+
+
+if __name__ == "__main__":
+    main()
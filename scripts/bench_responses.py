@@ -0,0 +1,109 @@
+# scripts/bench_responses.py - Meritev serializacije in stiskanja velikih odgovorov
+
+"""
+Ustvari začasno SQLite bazo z eno veliko sejo in izmeri GET /api/session/<id>:
+čas odgovora in število bajtov za kombinacije JSON kodirnika (stdlib / orjson)
+in stiskanja (brez / gzip / deflate). Izmeri tudi samo serializacijo
+istega payloada z jsonify in z json_response.
+
+Uporaba:
+    python scripts/bench_responses.py --steps 5000 --runs 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def median_ms(fn, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="robot_fsm_bench_")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmpdir, "bench.db")
+    os.environ["SESSION_TIMEOUT_ENABLED"] = "0"
+
+    from sqlalchemy import insert
+    from flask import jsonify
+
+    import app as app_module
+    from core import RobotFSM, RULES
+    from db import db, SessionLog, InteractionLog
+    from helpers import responses
+
+    app = app_module.app
+    rules = app_module.rules
+    random.seed(7)
+    triggers = [r["Trigger"] for r in RULES]
+
+    with app.app_context():
+        session_obj = SessionLog(started_at=datetime(2026, 1, 1))
+        db.session.add(session_obj)
+        db.session.commit()
+        fsm, rows, ts = RobotFSM(), [], datetime(2026, 1, 1)
+        for _ in range(args.steps):
+            trigger = random.choice(triggers)
+            rule = rules.select_rule(trigger)
+            before = fsm.state
+            after = fsm.update_state(rule["inferred_intent"], trigger=trigger)
+            ts += timedelta(seconds=3)
+            rows.append({
+                "session_id": session_obj.id, "step_number": fsm.step_count, "timestamp": ts,
+                "state_before": before, "state_after": after, "trigger": trigger,
+                "inferred_intent": rule["inferred_intent"], "robot_speech_act": rule["speech_act"],
+                "robot_utterance": rule["robot_text"], "priority": rule["priority"],
+                "escalation_count": fsm.total_escalations(),
+            })
+        db.session.execute(insert(InteractionLog), rows)
+        db.session.commit()
+        session_id = session_obj.id
+
+    client = app.test_client()
+    url = f"/api/session/{session_id}"
+    client.get(url)  # evalvacija se izračuna in shrani ob prvem klicu
+
+    print(f"Seja z {args.steps} koraki, orjson: {'da' if responses.orjson else 'ne'}\n")
+    print(f"{'kodirnik':<9} {'stiskanje':<10} {'čas (ms)':>9} {'bajtov':>10}")
+    encoders = ["stdlib"] + (["auto"] if responses.orjson else [])
+    for encoder in encoders:
+        app.config["JSON_ENCODER"] = encoder
+        for encoding in ("identity", "gzip", "deflate"):
+            headers = {"Accept-Encoding": encoding}
+            size = len(client.get(url, headers=headers).data)
+            ms = median_ms(lambda: client.get(url, headers=headers), args.runs)
+            name = "orjson" if encoder == "auto" else encoder
+            print(f"{name:<9} {encoding:<10} {ms:>9.1f} {size:>10}")
+
+    # Samo serializacija (isti payload)
+    with app.test_request_context():
+        payload = {"interactions": [dict(r, timestamp=r["timestamp"].isoformat()) for r in rows]}
+        print("\nSamo serializacija payloada:")
+        print(f"  jsonify            {median_ms(lambda: jsonify(payload), args.runs):8.2f} ms")
+        app.config["JSON_ENCODER"] = "stdlib"
+        print(f"  json_response/std  {median_ms(lambda: responses.json_response(payload), args.runs):8.2f} ms")
+        if responses.orjson:
+            app.config["JSON_ENCODER"] = "auto"
+            print(f"  json_response/orj  {median_ms(lambda: responses.json_response(payload), args.runs):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# scripts/measure_startup.py - Meritev časa uvoza in časa do prvega odgovora
+
+"""
+Izmeri, koliko časa potrebuje nov proces za `import app` in za prvi
+odgovor na GET / (brez HTTP strežnika, prek Flask test clienta).
+
+Uporaba:
+    python scripts/measure_startup.py --runs 5
+    python scripts/measure_startup.py --schema-check always   # primerjava s starim načinom
+    python scripts/measure_startup.py --importtime             # top moduli iz -X importtime
+
+Vsak zagon teče v svežem procesu; če DATABASE_URL ni nastavljen, se
+uporabi začasna SQLite baza.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import app as app_module
+t1 = time.perf_counter()
+client = app_module.app.test_client()
+response = client.get("/")
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "first_request_s": t2 - t1,
+                  "total_s": t2 - t0, "status": response.status_code}))
+"""
+
+
+def run_probe(env):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def top_imports(env, limit):
+    """Vrne najdražje module iz `python -X importtime -c 'import app'`."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--schema-check", default=None, help="auto / always / skip")
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    tmpdir = None
+    if "DATABASE_URL" not in env:
+        tmpdir = tempfile.mkdtemp(prefix="robot_fsm_")
+        env["DATABASE_URL"] = "sqlite:///" + os.path.join(tmpdir, "startup.db")
+    if args.schema_check:
+        env["SCHEMA_CHECK"] = args.schema_check
+
+    # Prvi zagon ustvari shemo - ne štejemo ga
+    run_probe(env)
+
+    results = [run_probe(env) for _ in range(args.runs)]
+    for key in ("import_s", "first_request_s", "total_s"):
+        values = [r[key] for r in results]
+        print(f"{key:<16} median {statistics.median(values) * 1000:8.1f} ms   "
+              f"min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+
+    if args.importtime:
+        print(f"\nTop {args.top} modulov (kumulativno):")
+        for cumulative_us, self_us, name in top_imports(env, args.top):
+            print(f"{cumulative_us / 1000:8.1f} ms  {self_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
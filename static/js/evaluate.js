@@ -17,33 +17,70 @@ const SCENARIO_NAMES = {
     critical: "Kritična seja"
 };
 
-let sessions = [];
+// ============================================================
+// SEZNAM SEJ - neskončno drsenje s kazalcem (/api/sessions)
+// ============================================================
+
+const SESSIONS_PAGE_SIZE = 50;
+const DETAILS_CACHE_SIZE = 20;
+
+let sessionCount = 0;
+let nextCursor = null;
+let hasMoreSessions = true;
+let loadingSessions = false;
 let selectedSessionId = null;
 
-// Naloži seje
+// Predpomnilnik podrobnosti (prefetch ob hoverju) - največ DETAILS_CACHE_SIZE sej
+const detailsCache = new Map();
+
+function escapeHtml(value) {
+    return String(value ?? '').replace(/[&<>"']/g, ch => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    }[ch]));
+}
+
+// Naloži naslednjo stran sej
 async function loadSessions() {
+    if (loadingSessions || !hasMoreSessions) return;
+    loadingSessions = true;
+
     try {
-        const response = await fetch('/api/all-sessions');
-        sessions = await response.json();
-        renderSessionList();
+        const params = new URLSearchParams({ limit: SESSIONS_PAGE_SIZE });
+        if (nextCursor !== null) params.set('cursor', nextCursor);
+
+        const response = await fetch(`/api/sessions?${params}`);
+        const page = await response.json();
+
+        nextCursor = page.next_cursor;
+        hasMoreSessions = page.next_cursor !== null;
+        appendSessions(page.items);
     } catch (err) {
         console.error('Napaka pri nalaganju sej:', err);
-        document.getElementById('session-list').innerHTML = 
-            '<p class="error-text">Napaka pri nalaganju sej.</p>';
+        if (sessionCount === 0) {
+            document.getElementById('session-list').innerHTML =
+                '<p class="error-text">Napaka pri nalaganju sej.</p>';
+        }
+    } finally {
+        loadingSessions = false;
     }
 }
 
-function renderSessionList() {
+function appendSessions(items) {
     const list = document.getElementById('session-list');
-    
-    if (sessions.length === 0) {
-        list.innerHTML = '<p class="empty-text">Ni preteklih sej.</p>';
-        return;
+    const sentinel = document.getElementById('session-list-sentinel');
+
+    if (sessionCount === 0) {
+        list.querySelectorAll('.loading-text').forEach(el => el.remove());
+        if (items.length === 0) {
+            list.insertAdjacentHTML('afterbegin', '<p class="empty-text">Ni preteklih sej.</p>');
+            return;
+        }
     }
-    
-    list.innerHTML = sessions.map(s => `
+
+    // Dodamo samo novo stran - obstoječi elementi ostanejo nedotaknjeni
+    sentinel.insertAdjacentHTML('beforebegin', items.map(s => `
         <div class="session-item ${selectedSessionId === s.id ? 'selected' : ''}"
-             onclick="selectSession(${s.id})">
+             data-session-id="${s.id}">
             <div class="session-info">
                 <span class="session-id">Seja #${s.id}</span>
                 <span class="session-date">${formatDate(s.started_at)}</span>
@@ -52,28 +89,183 @@ function renderSessionList() {
                 <span class="scenario-name">${SCENARIO_NAMES[s.scenario_type] || 'Neznano'}</span>
             </div>
         </div>
-    `).join('');
+    `).join(''));
+    sessionCount += items.length;
+}
+
+function initSessionList() {
+    const list = document.getElementById('session-list');
+    list.insertAdjacentHTML('beforeend', '<div id="session-list-sentinel" class="list-sentinel"></div>');
+
+    // Klik in hover prek delegacije (en poslušalec za vse seje)
+    list.addEventListener('click', event => {
+        const item = event.target.closest('.session-item');
+        if (item) selectSession(Number(item.dataset.sessionId));
+    });
+    list.addEventListener('mouseover', event => {
+        const item = event.target.closest('.session-item');
+        if (item) prefetchSession(Number(item.dataset.sessionId));
+    });
+
+    // Naslednjo stran naložimo, še preden uporabnik pride do konca seznama
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(e => e.isIntersecting)) loadSessions();
+    }, { root: list, rootMargin: '600px 0px' });
+    observer.observe(document.getElementById('session-list-sentinel'));
+
+    loadSessions();
+}
+
+function fetchSessionDetails(sessionId) {
+    if (!detailsCache.has(sessionId)) {
+        const promise = fetch(`/api/session/${sessionId}`).then(r => {
+            if (!r.ok) throw new Error(`HTTP ${r.status}`);
+            return r.json();
+        });
+        promise.catch(() => detailsCache.delete(sessionId));
+        detailsCache.set(sessionId, promise);
+        if (detailsCache.size > DETAILS_CACHE_SIZE) {
+            detailsCache.delete(detailsCache.keys().next().value);
+        }
+    }
+    return detailsCache.get(sessionId);
+}
+
+function prefetchSession(sessionId) {
+    fetchSessionDetails(sessionId).catch(() => {});
+    // prva stran korakov je ob kliku takoj na voljo
+    prefetchInteractionPage(sessionId, 0);
 }
 
 async function selectSession(sessionId) {
     selectedSessionId = sessionId;
-    renderSessionList();
+    document.querySelectorAll('.session-item.selected').forEach(el => el.classList.remove('selected'));
+    const item = document.querySelector(`.session-item[data-session-id="${sessionId}"]`);
+    if (item) item.classList.add('selected');
     
     // Naloži podrobnosti
     try {
-        const response = await fetch(`/api/session/${sessionId}`);
-        const data = await response.json();
+        const data = await fetchSessionDetails(sessionId);
+        if (selectedSessionId !== sessionId) return;
         displaySessionDetails(data);
+        loadSimilar(sessionId);
     } catch (err) {
         console.error('Napaka pri nalaganju podrobnosti:', err);
     }
 }
 
+// ============================================================
+// POTEK SEJE - virtualno drsenje (/api/session/<id>/interactions)
+// ============================================================
+
+const TRACE_ROW_HEIGHT = 40;     // mora se ujemati z .trace-table tbody tr v evaluate.css
+const TRACE_PAGE_SIZE = 200;
+const TRACE_OVERSCAN = 10;
+
+const interactionPages = new Map();   // "sessionId:page" -> Promise<items>
+let trace = { sessionId: null, total: 0 };
+
+function prefetchInteractionPage(sessionId, page) {
+    const key = `${sessionId}:${page}`;
+    if (!interactionPages.has(key)) {
+        const params = new URLSearchParams({ offset: page * TRACE_PAGE_SIZE, limit: TRACE_PAGE_SIZE });
+        const promise = fetch(`/api/session/${sessionId}/interactions?${params}`)
+            .then(r => r.json())
+            .then(data => {
+                promise.resolved = data.items;
+                return data.items;
+            });
+        promise.catch(() => interactionPages.delete(key));
+        interactionPages.set(key, promise);
+    }
+    return interactionPages.get(key);
+}
+
+function getLoadedRow(index) {
+    const page = interactionPages.get(`${trace.sessionId}:${Math.floor(index / TRACE_PAGE_SIZE)}`);
+    return page && page.resolved ? page.resolved[index % TRACE_PAGE_SIZE] : undefined;
+}
+
+function showTrace(sessionId, total) {
+    // Strani prejšnjih sej sprostimo
+    for (const key of interactionPages.keys()) {
+        if (!key.startsWith(`${sessionId}:`)) interactionPages.delete(key);
+    }
+    trace = { sessionId, total };
+    const container = document.querySelector('.trace-container');
+    container.scrollTop = 0;
+    renderTraceWindow();
+}
+
+function renderTraceWindow() {
+    const container = document.querySelector('.trace-container');
+    const traceBody = document.getElementById('trace-body');
+    const { sessionId, total } = trace;
+
+    const first = Math.max(0, Math.floor(container.scrollTop / TRACE_ROW_HEIGHT) - TRACE_OVERSCAN);
+    const visible = Math.ceil(container.clientHeight / TRACE_ROW_HEIGHT) + 2 * TRACE_OVERSCAN;
+    const last = Math.min(total, first + visible);
+
+    // Naloži manjkajoče strani (in naslednjo vnaprej)
+    const firstPage = Math.floor(first / TRACE_PAGE_SIZE);
+    const lastPage = Math.floor(Math.max(first, last - 1) / TRACE_PAGE_SIZE);
+    for (let page = firstPage; page <= lastPage + 1; page++) {
+        if (page * TRACE_PAGE_SIZE >= total) break;
+        const promise = prefetchInteractionPage(sessionId, page);
+        if (!promise.resolved) {
+            promise.then(() => {
+                if (trace.sessionId === sessionId) renderTraceWindow();
+            }).catch(err => console.error('Napaka pri nalaganju korakov:', err));
+        }
+    }
+
+    const rows = [];
+    for (let idx = first; idx < last; idx++) {
+        const i = getLoadedRow(idx);
+        if (!i) {
+            rows.push(`<tr class="trace-placeholder"><td>${idx + 1}</td><td colspan="4">…</td></tr>`);
+            continue;
+        }
+        rows.push(`
+        <tr>
+            <td>${idx + 1}</td>
+            <td title="${escapeHtml(i.trigger)}">${escapeHtml(i.trigger)}${i.repeat_count > 1 ? ` <span class="repeat-badge">×${i.repeat_count}</span>` : ''}</td>
+            <td>${escapeHtml(i.inferred_intent || '-')}</td>
+            <td>
+                <span class="state-badge ${i.state_after === 'S4_FEEDBACK' ? 'final' : ''}">
+                    ${escapeHtml(i.state_after)}
+                </span>
+            </td>
+            <td>${i.escalation_count}</td>
+        </tr>`);
+    }
+
+    // Distančni vrstici zgoraj/spodaj ohranita pravo višino drsnika
+    const topPad = first * TRACE_ROW_HEIGHT;
+    const bottomPad = (total - last) * TRACE_ROW_HEIGHT;
+    traceBody.innerHTML =
+        (topPad ? `<tr class="trace-spacer" style="height:${topPad}px"><td colspan="5"></td></tr>` : '') +
+        rows.join('') +
+        (bottomPad ? `<tr class="trace-spacer" style="height:${bottomPad}px"><td colspan="5"></td></tr>` : '');
+}
+
+function initTrace() {
+    let scheduled = false;
+    document.querySelector('.trace-container').addEventListener('scroll', () => {
+        if (scheduled || trace.sessionId === null) return;
+        scheduled = true;
+        requestAnimationFrame(() => {
+            scheduled = false;
+            renderTraceWindow();
+        });
+    }, { passive: true });
+}
+
 function displaySessionDetails(data) {
     document.getElementById('no-selection').classList.add('hidden');
     document.getElementById('session-details').classList.remove('hidden');
     
-    const { session, interactions, statistics, functional_evaluation } = data;
+    const { session, statistics, functional_evaluation } = data;
     
     // FUNKCIONALNA EVALVACIJA
     if (functional_evaluation) {
@@ -123,21 +315,8 @@ function displaySessionDetails(data) {
         document.getElementById('no-evaluation').classList.remove('hidden');
     }
     
-    // Potek seje
-    const traceBody = document.getElementById('trace-body');
-    traceBody.innerHTML = interactions.map((i, idx) => `
-        <tr>
-            <td>${idx + 1}</td>
-            <td>${i.trigger}</td>
-            <td>${i.inferred_intent || '-'}</td>
-            <td>
-                <span class="state-badge ${i.state_after === 'S4_FEEDBACK' ? 'final' : ''}">
-                    ${i.state_after}
-                </span>
-            </td>
-            <td>${i.escalation_count}</td>
-        </tr>
-    `).join('');
+    // Potek seje - vrstice se nalagajo po straneh ob drsenju
+    showTrace(session.id, statistics.step_count);
     
     // Povzetek je zdaj inline v funkcionalni evalvaciji
 }
@@ -149,6 +328,129 @@ function renderStars(rating) {
     return `<span class="stars">${filled}${empty}</span> <span class="rating-num">(${rating}/5)</span>`;
 }
 
+// ============================================================
+// PODOBNE SEJE (/api/session/<id>/similar)
+// ============================================================
+
+const SIMILAR_COUNT = 8;
+
+async function loadSimilar(sessionId) {
+    const list = document.getElementById('similar-list');
+    const params = new URLSearchParams({ k: SIMILAR_COUNT });
+    const scenario = document.getElementById('similar-scenario').value;
+    if (scenario) params.set('scenario', scenario);
+
+    list.innerHTML = '<p class="loading-text">Iščem podobne seje...</p>';
+    try {
+        const response = await fetch(`/api/session/${sessionId}/similar?${params}`);
+        const data = await response.json();
+        if (selectedSessionId !== sessionId) return;
+
+        list.innerHTML = data.items.length === 0
+            ? '<p class="empty-text">Ni podobnih sej.</p>'
+            : data.items.map(s => `
+                <div class="session-item similar-item" data-session-id="${s.id}">
+                    <div class="session-info">
+                        <span class="session-id">Seja #${s.id}</span>
+                        <span class="session-date">${formatDate(s.started_at)}</span>
+                    </div>
+                    <div class="session-scenario">
+                        <span class="scenario-name">${SCENARIO_NAMES[s.scenario_type] || 'Neznano'}</span>
+                        <span class="similar-score">${Math.round(s.similarity * 100)}% · ${s.step_count} korakov</span>
+                    </div>
+                </div>
+            `).join('');
+    } catch (err) {
+        console.error('Napaka pri iskanju podobnih sej:', err);
+        list.innerHTML = '<p class="error-text">Napaka pri iskanju podobnih sej.</p>';
+    }
+}
+
+function initSimilar() {
+    const list = document.getElementById('similar-list');
+    list.addEventListener('click', event => {
+        const item = event.target.closest('.similar-item');
+        if (item) selectSession(Number(item.dataset.sessionId));
+    });
+    list.addEventListener('mouseover', event => {
+        const item = event.target.closest('.similar-item');
+        if (item) prefetchSession(Number(item.dataset.sessionId));
+    });
+    document.getElementById('similar-scenario').addEventListener('change', () => {
+        if (selectedSessionId !== null) loadSimilar(selectedSessionId);
+    });
+}
+
+// ============================================================
+// TRENDI - časovni agregati (/api/rollups)
+// ============================================================
+
+function isoDate(date) {
+    return date.toISOString().slice(0, 10);
+}
+
+async function loadTrends() {
+    const params = new URLSearchParams({
+        from: document.getElementById('trends-from').value,
+        to: document.getElementById('trends-to').value
+    });
+    const granularity = document.getElementById('trends-granularity').value;
+    if (granularity) params.set('granularity', granularity);
+
+    const chart = document.getElementById('trends-chart');
+    try {
+        const response = await fetch(`/api/rollups?${params}`);
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        renderTrends(await response.json());
+    } catch (err) {
+        console.error('Napaka pri nalaganju trendov:', err);
+        chart.innerHTML = '<p class="error-text">Napaka pri nalaganju trendov.</p>';
+    }
+}
+
+function renderTrends(data) {
+    const { totals, buckets } = data;
+    const avg = value => value === null ? '-' : value.toFixed(1);
+
+    document.getElementById('trend-sessions').textContent = totals.sessions;
+    document.getElementById('trend-completion').textContent =
+        totals.completion_rate === null ? '-' : `${Math.round(totals.completion_rate * 100)}%`;
+    document.getElementById('trend-escalations').textContent = avg(totals.avg_escalations);
+    document.getElementById('trend-supportive').textContent = avg(totals.ratings.supportive.avg);
+    document.getElementById('trend-understandable').textContent = avg(totals.ratings.understandable.avg);
+    document.getElementById('trend-non-intrusive').textContent = avg(totals.ratings.non_intrusive.avg);
+
+    // Stolpci: višina = število sej, zeleni del = uspešno zaključene
+    const chart = document.getElementById('trends-chart');
+    const maxSessions = Math.max(1, ...buckets.map(b => b.sessions));
+    chart.innerHTML = buckets.length === 0
+        ? '<p class="empty-text">V izbranem obdobju ni zaključenih sej.</p>'
+        : buckets.map(b => `
+            <div class="trend-bar" style="height:${(b.sessions / maxSessions) * 100}%"
+                 title="${formatDate(b.bucket)}: ${b.sessions} sej, ${b.completed} uspešnih, povp. eskalacij ${avg(b.avg_escalations)}">
+                <div class="trend-bar-completed" style="height:${b.sessions ? (b.completed / b.sessions) * 100 : 0}%"></div>
+            </div>
+        `).join('');
+
+    const scenarios = Object.entries(totals.scenarios).sort((a, b) => b[1] - a[1]);
+    document.getElementById('trends-scenarios').innerHTML = scenarios.map(([id, count]) => `
+        <span>${SCENARIO_NAMES[id] || escapeHtml(id)}: <strong>${count}</strong>
+            (${Math.round((count / totals.sessions) * 100)}%)</span>
+    `).join('');
+}
+
+function initTrends() {
+    const today = new Date();
+    const monthAgo = new Date(today.getTime() - 30 * 24 * 3600 * 1000);
+    document.getElementById('trends-from').value = isoDate(monthAgo);
+    document.getElementById('trends-to').value = isoDate(today);
+
+    ['trends-from', 'trends-to', 'trends-granularity'].forEach(id => {
+        document.getElementById(id).addEventListener('change', loadTrends);
+    });
+    loadTrends();
+}
+
 function formatDate(isoString) {
     if (!isoString) return '-';
     return new Date(isoString).toLocaleString('sl-SI', {
@@ -171,5 +473,10 @@ function formatDuration(start, end) {
 }
 
 // Inicializacija ob nalaganju strani
-document.addEventListener('DOMContentLoaded', loadSessions);
+document.addEventListener('DOMContentLoaded', () => {
+    initTrends();
+    initSessionList();
+    initTrace();
+    initSimilar();
+});
 